@@ -3,6 +3,7 @@ import json
 import os
 import re
 from os import path
+from multiprocessing.pool import ThreadPool
 from jats_scraper import jats_scraper
 import boto.s3
 from boto.s3.key import Key
@@ -11,12 +12,18 @@ from provider.execution_context import Session
 from provider.article_structure import ArticleInfo
 import provider.article_structure as article_structure
 import provider.s3lib as s3lib
-from elifetools import xmlio
+import provider.article_processing as article_processing
+import provider.article_document as article_document
 
 """
 ApplyVersionNumber.py activity
 """
 
+# S3 objects copied to their new names at the same time
+RENAME_THREADS = 8
+# S3 multi-object delete accepts at most 1000 keys per request
+DELETE_BATCH_SIZE = 1000
+
 
 class activity_ApplyVersionNumber(activity.activity):
     def __init__(self, settings, logger, conn=None, token=None, activity_task=None):
@@ -106,21 +113,42 @@ class activity_ApplyVersionNumber(activity.activity):
             self.logger.info('file_name_map: %s' %
                              json.dumps(file_name_map, sort_keys=True, indent=4))
 
-        # rename_s3_objects(old_name_new_name_dict)
-        self.rename_s3_objects(bucket, self.expanded_bucket_name, bucket_folder_name, file_name_map)
-
-        # rewrite_and_upload_article_xml()
+        # rewrite the article XML while the other objects are copied, from its old key
+        # which is only deleted after the copies, then upload it under its new name
         xml_filename = self.find_xml_filename_in_map(file_name_map)
-        self.download_file_from_bucket(bucket, bucket_folder_name, xml_filename)
-        self.rewrite_xml_file(xml_filename, file_name_map)
+        old_xml_filename = self.find_old_filename_in_map(file_name_map, xml_filename)
+        copy_map = dict((old_name, new_name) for old_name, new_name in file_name_map.iteritems()
+                        if old_name != old_xml_filename)
+        pool = ThreadPool(1)
+        try:
+            xml_rewrite = pool.apply_async(self.download_and_rewrite_xml_file,
+                                           (bucket, bucket_folder_name, old_xml_filename,
+                                            xml_filename, file_name_map))
+            old_s3_keys = self.copy_s3_objects(bucket, self.expanded_bucket_name,
+                                               bucket_folder_name, copy_map)
+            xml_rewrite.get()
+        finally:
+            pool.close()
+            pool.join()
         self.upload_file_to_bucket(bucket, bucket_folder_name, xml_filename)
 
-    def download_file_from_bucket(self, bucket, bucket_folder_name, filename):
+        if old_xml_filename != xml_filename:
+            old_s3_keys.append(bucket_folder_name + '/' + old_xml_filename)
+        self.delete_s3_objects(bucket, old_s3_keys)
+
+    def download_and_rewrite_xml_file(self, bucket, bucket_folder_name, old_xml_filename,
+                                      xml_filename, file_name_map):
+        self.download_file_from_bucket(bucket, bucket_folder_name, old_xml_filename,
+                                       xml_filename)
+        self.rewrite_xml_file(xml_filename, file_name_map)
+
+    def download_file_from_bucket(self, bucket, bucket_folder_name, filename,
+                                  local_filename=None):
 
         key_name = bucket_folder_name + '/' + filename
         key = Key(bucket)
         key.key = key_name
-        local_file = self.open_file_from_tmp_dir(filename, mode='wb')
+        local_file = self.open_file_from_tmp_dir(local_filename or filename, mode='wb')
         key.get_contents_to_file(local_file)
         local_file.close()
 
@@ -128,17 +156,8 @@ class activity_ApplyVersionNumber(activity.activity):
 
         local_xml_filename = path.join(self.get_tmp_dir(), xml_filename)
 
-        xmlio.register_xmlns()
-        root, doctype_dict = xmlio.parse(local_xml_filename, return_doctype_dict=True)
-
-        # Convert xlink href values
-        total = xmlio.convert_xlink_href(root, file_name_map)
-
-        # Start the file output
-        reparsed_string = xmlio.output(root, type=None, doctype_dict=doctype_dict)
-        f = open(local_xml_filename, 'wb')
-        f.write(reparsed_string)
-        f.close()
+        article_processing.convert_xml(local_xml_filename, file_name_map,
+                                       cache_dir=article_document.get_cache_dir(self.settings))
 
     def upload_file_to_bucket(self, bucket, bucket_folder_name, filename):
 
@@ -183,21 +202,51 @@ class activity_ApplyVersionNumber(activity.activity):
 
     def rename_s3_objects(self, bucket, bucket_name, bucket_folder_name, file_name_map):
         # Rename S3 bucket objects directly
+        old_s3_keys = self.copy_s3_objects(bucket, bucket_name, bucket_folder_name, file_name_map)
+        self.delete_s3_objects(bucket, old_s3_keys)
+
+    def copy_s3_objects(self, bucket, bucket_name, bucket_folder_name, file_name_map):
+        """
+        Copy objects to their new names concurrently, returning the old key names
+        which were copied and can be deleted. Raises an error, deleting nothing,
+        if any copy fails so the activity can be run again
+        """
+        renames = []
         for old_name, new_name in file_name_map.iteritems():
             # Do not need to rename if the old and new name are the same
-            if old_name == new_name:
-                continue
-
-            if new_name is not None:
-                old_s3_key = bucket_folder_name + '/' + old_name
-                new_s3_key = bucket_folder_name + '/' + new_name
-
-                # copy old key to new key
-                key = bucket.copy_key(new_s3_key, bucket_name, old_s3_key)
-                if isinstance(key, boto.s3.key.Key):
-                    # delete old key
-                    old_key = bucket.delete_key(old_s3_key)
-
+            if new_name is not None and old_name != new_name:
+                renames.append((bucket_folder_name + '/' + old_name,
+                                bucket_folder_name + '/' + new_name))
+        if not renames:
+            return []
+
+        def copy(rename):
+            old_s3_key, new_s3_key = rename
+            key = bucket.copy_key(new_s3_key, bucket_name, old_s3_key)
+            return isinstance(key, boto.s3.key.Key)
+
+        pool = ThreadPool(min(self.get_rename_threads(), len(renames)))
+        try:
+            copied = pool.map(copy, renames)
+        finally:
+            pool.close()
+            pool.join()
+        return [old_s3_key for (old_s3_key, new_s3_key), key_copied in zip(renames, copied)
+                if key_copied]
+
+    def delete_s3_objects(self, bucket, s3_key_names):
+        "delete keys with multi-object deletes of up to DELETE_BATCH_SIZE keys"
+        for start in range(0, len(s3_key_names), DELETE_BATCH_SIZE):
+            result = bucket.delete_keys(s3_key_names[start:start + DELETE_BATCH_SIZE], quiet=True)
+            if result.errors:
+                raise Exception("could not delete %s: %s" % (
+                    len(result.errors),
+                    ", ".join("%s (%s)" % (error.key, error.message) for error in result.errors)))
+
+    def get_rename_threads(self):
+        if hasattr(self.settings, 'rename_threads'):
+            return max(int(self.settings.rename_threads), 1)
+        return RENAME_THREADS
 
     def find_xml_filename_in_map(self, file_name_map):
         for old_name, new_name in file_name_map.iteritems():
@@ -205,6 +254,11 @@ class activity_ApplyVersionNumber(activity.activity):
             if info.file_type == 'ArticleXML':
                 return new_name
 
+    def find_old_filename_in_map(self, file_name_map, new_filename):
+        for old_name, new_name in file_name_map.iteritems():
+            if new_name == new_filename:
+                return old_name
+
 
     @staticmethod
     def get_article_xml_key(bucket, expanded_folder_name):
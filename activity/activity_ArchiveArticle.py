@@ -4,16 +4,22 @@ import json
 import boto
 import random
 import zipfile
+import threading
 from datetime import datetime
 import os
-from boto.s3.key import Key
-from boto.s3.connection import S3Connection
-import settings as settings_lib
+from multiprocessing.pool import ThreadPool
+from provider.storage_provider import StorageContext
 
 """
-activity_PostEIF.py activity
+activity_ArchiveArticle.py activity
 """
 
+# objects downloaded at the same time while the archive is written
+ARCHIVE_THREADS = 4
+# already compressed formats which are stored in the archive without deflating them again
+STORED_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif', 'mp4', 'm4v', 'mov', 'avi', 'webm',
+                     'zip', 'gz', 'pdf']
+
 
 class activity_ArchiveArticle(activity.activity):
     def __init__(self, settings, logger, conn=None, token=None, activity_task=None):
@@ -47,44 +53,14 @@ class activity_ArchiveArticle(activity.activity):
             updated_date = datetime.strptime(update_date_string, "%Y-%m-%dT%H:%M:%SZ")
             status = data['status'].lower()
 
-            # download expanded folder
-            conn = S3Connection(self.settings.aws_access_key_id,
-                                self.settings.aws_secret_access_key)
-            source_bucket = conn.get_bucket(self.settings.publishing_buckets_prefix +
-                                            self.settings.expanded_bucket)
-            tmp = self.get_tmp_dir()
             name = ("elife-" + id + '-' + status + '-v' + version
                     + '-' + updated_date.strftime('%Y%m%d%H%M%S'))
-            zip_dir = tmp + os.sep + name
-            os.makedirs(zip_dir)
-            folderlist = source_bucket.list(prefix=expanded_folder.replace(os.sep, '/'))
-            for key in folderlist:
-                save_path = zip_dir + os.sep + os.path.basename(key.name)
-                key.get_contents_to_filename(save_path)
-
-            # rename downloaded folder
-            zip_path = tmp + os.sep + name + '.zip'
-            # zip expanded folder
-            zf = zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True)
-            relroot = os.path.abspath(os.path.join(zip_dir, os.pardir))
-            for root, dirs, files in os.walk(zip_dir):
-                # add directory (needed for empty dirs)
-                zf.write(root, os.path.relpath(root, zip_dir))
-                for f in files:
-                    filename = os.path.join(root, f)
-                    if os.path.isfile(filename):
-                        # Archive file name, effectively make the
-                        # zip_dir the root directory by stripping it from the file name f
-                        arcname = root.rstrip(zip_dir) + f
-                        zf.write(filename, arcname)
-            zf.close()
-
-            # upload zip to archive bucket
-            output_bucket = self.settings.publishing_buckets_prefix + self.settings.archive_bucket
-            destination = conn.get_bucket(output_bucket)
-            destination_key = Key(destination)
-            destination_key.key = name + '.zip'
-            destination_key.set_contents_from_filename(zip_path)
+            expanded_resource = ("s3://" + self.settings.publishing_buckets_prefix +
+                                 self.settings.expanded_bucket + "/" +
+                                 expanded_folder.replace(os.sep, '/'))
+            archive_resource = ("s3://" + self.settings.publishing_buckets_prefix +
+                                self.settings.archive_bucket + "/" + name + '.zip')
+            self.archive_folder(expanded_resource, archive_resource)
 
             self.clean_tmp_dir()
 
@@ -100,7 +76,80 @@ class activity_ArchiveArticle(activity.activity):
                                 " for version " + version + " run " + data["run"])
         return activity.activity.ACTIVITY_SUCCESS
 
-def main(args):
+    def archive_folder(self, expanded_resource, archive_resource):
+        """
+        Zip the files of the expanded folder into the archive resource. The files
+        are downloaded concurrently and added to the zip as each one arrives,
+        then deleted, while the zip is uploaded in parts as they fill, so only
+        the files in flight and one part of the zip are on disk at a time
+        """
+        storage = StorageContext(self.settings)
+        resources = storage.list_resources_metadata(expanded_resource)
+        tmp = self.get_tmp_dir()
+        threads = self.get_archive_threads()
+        # limit the downloaded files waiting to be zipped
+        in_flight = threading.Semaphore(threads * 2)
+        stopped = threading.Event()
+
+        def download(resource):
+            path = os.path.join(tmp, resource["filename"])
+            try:
+                with open(path, 'wb') as open_file:
+                    storage.get_resource_to_file(
+                        expanded_resource + "/" + resource["filename"], open_file)
+            except Exception as exception:
+                return resource, path, exception
+            return resource, path, None
+
+        def throttled(resources):
+            for resource in resources:
+                in_flight.acquire()
+                if stopped.is_set():
+                    return
+                yield resource
+
+        # a multipart upload is stored with only the Content-Type it is given
+        writer = storage.get_resource_writer(archive_resource,
+                                             metadata={'Content-Type': 'application/zip'})
+        pool = ThreadPool(threads)
+        try:
+            zip_file = zipfile.ZipFile(writer, 'w', zipfile.ZIP_DEFLATED, allowZip64=True)
+            for resource, path, exception in pool.imap_unordered(download, throttled(resources)):
+                try:
+                    if exception is not None:
+                        raise exception
+                    zip_file.write(path, resource["filename"], compress_type(resource["filename"]))
+                finally:
+                    if os.path.exists(path):
+                        os.remove(path)
+                    in_flight.release()
+                writer.upload_parts()
+            zip_file.close()
+            writer.close()
+        except:
+            writer.abort()
+            raise
+        finally:
+            stopped.set()
+            in_flight.release()
+            pool.terminate()
+            pool.join()
+
+    def get_archive_threads(self):
+        if hasattr(self.settings, 'archive_threads'):
+            return max(int(self.settings.archive_threads), 1)
+        return ARCHIVE_THREADS
+
+
+def compress_type(filename):
+    "store files which are already compressed, deflate the others"
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def main(settings_lib, args):
 
     """
     This sets up dummy SWF activity data, creates an instance of this activity and runs it only for
@@ -125,4 +174,5 @@ def main(args):
 
 if __name__ == '__main__':
     import sys
-    main(sys.argv[1:])
+    import settings as settings_lib
+    main(settings_lib, sys.argv[1:])
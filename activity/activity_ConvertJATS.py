@@ -5,6 +5,7 @@ from jats_scraper import jats_scraper
 from boto.s3.key import Key
 from boto.s3.connection import S3Connection
 from provider.execution_context import Session
+from provider import connections
 from provider.article_structure import ArticleInfo
 
 """
@@ -48,8 +49,7 @@ class activity_ConvertJATS(activity.activity):
             expanded_folder_bucket = (self.settings.publishing_buckets_prefix
                                       + self.settings.expanded_bucket)
 
-            conn = S3Connection(self.settings.aws_access_key_id,
-                                self.settings.aws_secret_access_key)
+            conn = connections.s3_connection(self.settings)
             bucket = conn.get_bucket(expanded_folder_bucket)
 
             bucket_folder_name = expanded_folder_name
@@ -1,16 +1,20 @@
 import activity
 import json
+from collections import Counter
+from multiprocessing.pool import ThreadPool
 from provider.execution_context import Session
 from provider.storage_provider import StorageContext
 import provider.glencoe_check as glencoe_check
 import os
-import requests
 
 
 """
 activity_CopyGlencoeStillImages.py activity
 """
 
+# still images fetched from Glencoe and stored at the same time
+STORE_THREADS = glencoe_check.GLENCOE_POOL_SIZE
+
 
 class ValidationException(RuntimeError):
     pass
@@ -124,11 +128,17 @@ class activity_CopyGlencoeStillImages(activity.activity):
 
 
     def store_jpgs(self, glencoe_jpgs, article_id):
-        cdn_still_jpgs = []
-        for jpg in glencoe_jpgs:
-            jpg_filename = self.store_file(jpg, article_id)
-            cdn_still_jpgs.append(jpg_filename)
-        return cdn_still_jpgs
+        "fetch and store the still images concurrently, returning their CDN file names in order"
+        if not glencoe_jpgs:
+            return []
+        storage_context = StorageContext(self.settings)
+        pool = ThreadPool(min(STORE_THREADS, len(glencoe_jpgs)))
+        try:
+            return pool.map(lambda jpg: self.store_file(jpg, article_id, storage_context),
+                            glencoe_jpgs)
+        finally:
+            pool.close()
+            pool.join()
 
     def s3_resources(self, path, article_id):
         filename = os.path.split(path)[1]
@@ -138,18 +148,23 @@ class activity_CopyGlencoeStillImages(activity.activity):
                article_id + "/" + filename
         return cdn
 
-    def store_file(self, path, article_id):
-        storage_context = StorageContext(self.settings)
-        r = requests.get(path)
-        if r.status_code == 200:
+    def store_file(self, path, article_id, storage_context=None):
+        "stream a still image from Glencoe to the CDN bucket without holding it in memory"
+        if storage_context is None:
+            storage_context = StorageContext(self.settings)
+        r = glencoe_check.get_session().get(path, stream=True)
+        try:
+            if r.status_code != 200:
+                raise RuntimeError("Glencoe returned a %s status code for %s" % (r.status_code, path))
             resource = self.s3_resources(path, article_id)
             self.logger.info("S3 resource: " + resource)
             jpg_filename = os.path.split(resource)[-1]
-            storage_context.set_resource_from_string(resource, r.content,
-                                                     content_type=r.headers['content-type'])
+            r.raw.decode_content = True
+            storage_context.set_resource_from_stream(
+                resource, r.raw, metadata={'Content-Type': r.headers['content-type']})
             return jpg_filename
-        else:
-            raise RuntimeError("Glencoe returned a %s status code for %s" % (r.status_code, path))
+        finally:
+            r.close()
 
 
     def list_files_from_cdn(self, article_id):
@@ -167,10 +182,9 @@ class activity_CopyGlencoeStillImages(activity.activity):
         self.logger.info("cdn_still_jpgs_no_extension " + str(cdn_still_jpgs_no_extension))
         cdn_all_files_no_extension = self._remove_extension(cdn_all_files)
         self.logger.info("files_in_cdn_no_extention " + str(cdn_all_files_no_extension))
-        cdn_still_jpgs_without_video = []
-        for still in cdn_still_jpgs_no_extension:
-            if len(list(filter(lambda filename: filename == still, cdn_all_files_no_extension))) != 2:
-                cdn_still_jpgs_without_video.append(still)
+        cdn_file_counts = Counter(cdn_all_files_no_extension)
+        cdn_still_jpgs_without_video = [still for still in cdn_still_jpgs_no_extension
+                                        if cdn_file_counts[still] != 2]
 
         self.logger.info("cdn_still_jpgs_without_video " + str(cdn_still_jpgs_without_video))
         return cdn_still_jpgs_without_video
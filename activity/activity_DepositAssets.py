@@ -1,7 +1,8 @@
 import activity
+import time
 from boto.s3.connection import S3Connection
 from provider.execution_context import Session
-from provider.storage_provider import StorageContext
+from provider.storage_provider import StorageContext, failed_transfers
 from mimetypes import guess_type
 from provider import article_structure
 
@@ -47,7 +48,10 @@ class activity_DepositAssets(activity.activity):
             storage_provider = self.settings.storage_provider + "://"
 
             orig_resource = storage_provider + expanded_folder_bucket + "/" + expanded_folder_name
-            files_in_bucket = storage_context.list_resources(orig_resource)
+            resources_in_bucket = storage_context.list_resources_metadata(orig_resource)
+            files_in_bucket = [resource["filename"] for resource in resources_in_bucket]
+            file_sizes = dict((resource["filename"], resource["size"])
+                              for resource in resources_in_bucket)
 
             # filter figures that have already been copied (see DepositIngestAssets activity)
             pre_ingest_assets = article_structure.pre_ingest_assets(files_in_bucket)
@@ -59,14 +63,14 @@ class activity_DepositAssets(activity.activity):
 
             no_download_extensions = self.get_no_download_extensions(self.settings.no_download_extensions)
 
+            # plan every copy first, then copy them concurrently
+            copies = []
             for file_name in other_assets:
                 orig_resource = storage_provider + expanded_folder_bucket + "/" + expanded_folder_name + "/"
                 dest_resource = storage_provider + cdn_bucket_name + "/" + article_id + "/"
+                file_size = file_sizes.get(file_name)
 
-                storage_context.copy_resource(orig_resource + file_name, dest_resource + file_name)
-
-                if self.logger:
-                    self.logger.info("Uploaded file %s to %s" % (file_name, cdn_bucket_name))
+                copies.append((orig_resource + file_name, dest_resource + file_name, None, file_size))
 
                 file_name_no_extension, extension = file_name.rsplit('.', 1)
                 if extension not in no_download_extensions:
@@ -77,9 +81,25 @@ class activity_DepositAssets(activity.activity):
                     file_download = file_name_no_extension + "-download." + extension
 
                     # file is copied with additional metadata
-                    storage_context.copy_resource(orig_resource + file_name,
-                                                  dest_resource + file_download,
-                                                  additional_dict_metadata=dict_metadata)
+                    copies.append((orig_resource + file_name,
+                                   dest_resource + file_download,
+                                   dict_metadata, file_size))
+
+            start_time = time.time()
+            results = storage_context.copy_resources(copies)
+            if self.logger:
+                for copy in copies:
+                    if results.get(copy[1]) is True:
+                        self.logger.info("Uploaded file %s (%s bytes) to %s" %
+                                         (copy[1], copy[3], cdn_bucket_name))
+                    else:
+                        self.logger.info("Failed to upload file %s to %s: %s" %
+                                         (copy[1], cdn_bucket_name, results.get(copy[1])))
+                self.logger.info("Copied %s files for article %s in %.2f seconds" %
+                                 (len(copies), article_id, time.time() - start_time))
+            failures = failed_transfers(results)
+            if failures:
+                raise RuntimeError("Failed to copy %s" % failures)
 
             self.emit_monitor_event(self.settings, article_id, version, run,
                                     self.pretty_name, "end",
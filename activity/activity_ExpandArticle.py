@@ -5,14 +5,12 @@ import uuid
 import activity
 import re
 import os
-from os.path import isfile, join
-from os import listdir, makedirs
 from os import path
 import datetime
 from S3utility.s3_notification_info import S3NotificationInfo
 from provider.execution_context import Session
 import requests
-from provider.storage_provider import StorageContext
+from provider.storage_provider import StorageContext, failed_transfers
 from provider.article_structure import ArticleInfo
 import provider.lax_provider as lax_provider
 
@@ -83,26 +81,22 @@ class activity_ExpandArticle(activity.activity):
             storage_context.get_resource_to_file(storage_resource_origin, local_zip_file)
             local_zip_file.close()
 
-            # extract zip contents
-            folder_name = path.join(article_version_id, run)
-            content_folder = path.join(tmp, folder_name)
-            makedirs(content_folder)
+            # upload the zip contents, streamed from the zip without extracting them
             with ZipFile(path.join(tmp, filename_last_element)) as zf:
-                zf.extractall(content_folder)
-
-            upload_filenames = []
-            for f in listdir(content_folder):
-                if isfile(join(content_folder, f)) and f[0] != '.' and not f[0] == '_':
-                    upload_filenames.append(f)
+                upload_filenames = self.zip_member_filenames(zf)
             self.check_filenames(upload_filenames)
 
             bucket_folder_name = article_version_id + '/' + run
+            uploads = {}
             for filename in upload_filenames:
-                source_path = path.join(content_folder, filename)
                 dest_path = bucket_folder_name + '/' + filename
                 storage_resource_dest = self.settings.storage_provider + "://" + self.settings.publishing_buckets_prefix + \
                                         self.settings.expanded_bucket + "/" + dest_path
-                storage_context.set_resource_from_filename(storage_resource_dest, source_path)
+                uploads[storage_resource_dest] = filename
+            failures = failed_transfers(storage_context.set_resources_from_zip(
+                path.join(tmp, filename_last_element), uploads))
+            if failures:
+                raise RuntimeError("Failed to upload %s" % failures)
 
             self.clean_tmp_dir()
 
@@ -128,6 +122,14 @@ class activity_ExpandArticle(activity.activity):
             return "-1"
         return version
 
+    def zip_member_filenames(self, zf):
+        "names of the files at the top level of the zip, excluding hidden files"
+        filenames = []
+        for name in zf.namelist():
+            if '/' not in name and name[0] != '.' and not name[0] == '_':
+                filenames.append(name)
+        return filenames
+
     def check_filenames(self, filenames):
         xml_found = False
         for filename in filenames:
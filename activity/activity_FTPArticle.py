@@ -1,21 +1,17 @@
 import os
 import json
-import zipfile
 import glob
 import shutil
 
-from ftplib import FTP
-import ftplib
-
 import activity
 
 from boto.s3.connection import S3Connection
 
 import provider.s3lib as s3lib
+import provider.ftp as ftp_provider
 import provider.sftp as sftplib
 import provider.article_processing as article_processing
-
-from elifetools import parseJATS as parser
+import provider.article_document as article_document
 
 """
 FTPArticle activity
@@ -240,38 +236,38 @@ class activity_FTPArticle(activity.activity):
 
 
     def repackage_archive_zip_to_pmc_zip(self, doi_id):
-        "repackage the zip file in the TMP_DIR to a PMC zip format"
-        # unzip contents
+        """
+        repackage the zip file in the TMP_DIR to a PMC zip format, copying the
+        compressed files into the new zip and extracting only the XML to convert
+        """
         zip_input_dir = os.path.join(self.get_tmp_dir(), self.TMP_DIR)
-        zip_extracted_dir = os.path.join(self.get_tmp_dir(), self.JUNK_DIR)
         zip_renamed_files_dir = os.path.join(self.get_tmp_dir(), self.RENAME_DIR)
         pmc_zip_output_dir = os.path.join(self.get_tmp_dir(), self.INPUT_DIR)
         archive_zip_name = glob.glob(zip_input_dir + "/*.zip")[0]
-        with zipfile.ZipFile(archive_zip_name, 'r') as myzip:
-            myzip.extractall(zip_extracted_dir)
         # rename the files and profile the files
-        file_name_map = article_processing.rename_files_remove_version_number(
-            files_dir = zip_extracted_dir,
-            output_dir = zip_renamed_files_dir
-        )
+        member_names = article_processing.zip_member_names(archive_zip_name)
+        file_name_map = article_processing.file_name_map_remove_version_number(
+            member_names, self.logger)
         if self.logger:
             self.logger.info("FTPArticle running %s workflow for article %s, file_name_map"
                              % (self.workflow, self.doi_id))
             self.logger.info(file_name_map)
         # convert the XML
-        article_xml_file = glob.glob(zip_renamed_files_dir + "/*.xml")[0]
-        article_processing.convert_xml(xml_file=article_xml_file,
-                         file_name_map=file_name_map)
+        xml_member_name = article_processing.filter_member_names(member_names, ["*.xml"])[0]
+        article_xml_file = article_processing.extract_zip_member(
+            archive_zip_name, xml_member_name, zip_renamed_files_dir,
+            file_name_map[xml_member_name])
+        document = article_processing.convert_xml(
+            xml_file=article_xml_file, file_name_map=file_name_map,
+            cache_dir=article_document.get_cache_dir(self.settings))
         # rezip the files into PMC zip format
-        soup = parser.parse_document(article_xml_file)
-        volume = parser.volume(soup)
+        volume = document.volume
         pmc_zip_file_name = article_processing.new_pmc_zip_filename(self.journal, volume, doi_id)
-        with zipfile.ZipFile(os.path.join(pmc_zip_output_dir, pmc_zip_file_name), 'w',
-                             zipfile.ZIP_DEFLATED, allowZip64=True) as new_zipfile:
-            dirfiles = article_processing.file_list(zip_renamed_files_dir)
-            for df in dirfiles:
-                filename = df.split(os.sep)[-1]
-                new_zipfile.write(df, filename)
+        member_map = dict(file_name_map)
+        del member_map[xml_member_name]
+        with article_processing.new_zip(os.path.join(pmc_zip_output_dir, pmc_zip_file_name)) as new_zipfile:
+            article_processing.copy_zip_members(archive_zip_name, new_zipfile, member_map)
+            new_zipfile.write(article_xml_file, file_name_map[xml_member_name])
         return True
 
 
@@ -326,34 +322,27 @@ class activity_FTPArticle(activity.activity):
 
         # Repackage or move the zip depending on the workflow type
         if workflow == 'Cengage' or workflow == 'Scopus' or workflow == 'WoS':
-            # Extract the zip and build a new zip
+            # Copy the xml and pdf files of the zips into a new zip
             file_type = "/*.zip"
             zipfiles = glob.glob(self.get_tmp_dir() + os.sep + self.INPUT_DIR + file_type)
-            to_dir = self.get_tmp_dir() + os.sep + self.TMP_DIR
-            for filename in zipfiles:
-                myzip = zipfile.ZipFile(filename, 'r')
-                myzip.extractall(to_dir)
 
             # Create the new zip
             zip_file_name = 'elife-' + str(doi_id).zfill(5) + '-xml-pdf.zip'
             zip_dir = self.get_tmp_dir() + os.sep + self.ZIP_DIR
-            new_zipfile = zipfile.ZipFile(zip_dir + os.sep + zip_file_name, 'w',
-                                          zipfile.ZIP_DEFLATED, allowZip64=True)
-            # Add files
-            ignore_name_fragments = ["-supp", "-data", "-code"]
-            file_types = ["/*.pdf", "/*.xml"]
-            for file_type in file_types:
-                files = glob.glob(to_dir + file_type)
-                for file in files:
-                    # Ignore some files that are PDF we do not want to include
-                    for ignore in ignore_name_fragments:
-                        if ignore in file:
-                            continue
-                    filename = file.split(os.sep)[-1]
-                    new_zipfile.write(file, filename)
-
-            # Close zip
-            new_zipfile.close()
+            file_types = ["*.pdf", "*.xml"]
+            added = set()
+            with article_processing.new_zip(zip_dir + os.sep + zip_file_name) as new_zipfile:
+                # only the files at the top of the zips are added, and a file in more
+                # than one zip is taken from the last, as when the zips were extracted
+                for filename in reversed(zipfiles):
+                    member_names = article_processing.filter_member_names(
+                        article_processing.zip_member_names(filename), file_types)
+                    member_map = {}
+                    for member_name in member_names:
+                        if member_name not in added:
+                            member_map[member_name] = member_name
+                            added.add(member_name)
+                    article_processing.copy_zip_members(filename, new_zipfile, member_map)
 
             # Move the zip
             shutil.move(zip_dir + os.sep + zip_file_name, self.get_tmp_dir() + os.sep +
@@ -367,53 +356,13 @@ class activity_FTPArticle(activity.activity):
                 shutil.move(filename, self.get_tmp_dir() + os.sep +
                             self.FTP_TO_SOMEWHERE_DIR + os.sep)
 
-    def ftp_upload(self, ftp, file):
-        ext = os.path.splitext(file)[1]
-        #print file
-        uploadname = file.split(os.sep)[-1]
-        if ext in (".txt", ".htm", ".html"):
-            ftp.storlines("STOR " + file, open(file))
-        else:
-            #print "uploading " + uploadname
-            ftp.storbinary("STOR " + uploadname, open(file, "rb"), 1024)
-            #print "uploaded " + uploadname
-
-    def ftp_cwd_mkd(self, ftp, sub_dir):
+    def ftp_to_endpoint(self, uploadfiles, sub_dir_list=None, passive=True):
         """
-        Given an FTP connection and a sub_dir name
-        try to cwd to the directory. If the directory
-        does not exist, create it, then cwd again
+        Upload the files over the FTP sessions this worker keeps open to the endpoint
         """
-        cwd_success = None
-        try:
-            ftp.cwd(sub_dir)
-            cwd_success = True
-        except ftplib.error_perm:
-            # Directory probably does not exist, create it
-            ftp.mkd(sub_dir)
-            cwd_success = False
-        if cwd_success is not True:
-            ftp.cwd(sub_dir)
-
-        return cwd_success
-
-    def ftp_to_endpoint(self, uploadfiles, sub_dir_list=None, passive=True):
-        for uploadfile in uploadfiles:
-            ftp = FTP()
-            if passive is False:
-                ftp.set_pasv(False)
-            ftp.connect(self.FTP_URI)
-            ftp.login(self.FTP_USERNAME, self.FTP_PASSWORD)
-
-            self.ftp_cwd_mkd(ftp, "/")
-            if self.FTP_CWD != "":
-                self.ftp_cwd_mkd(ftp, self.FTP_CWD)
-            if sub_dir_list is not None:
-                for sub_dir in sub_dir_list:
-                    self.ftp_cwd_mkd(ftp, sub_dir)
-
-            self.ftp_upload(ftp, uploadfile)
-            ftp.quit()
+        manager = ftp_provider.get_session_manager(self.FTP_URI, self.FTP_USERNAME,
+                                                   self.FTP_PASSWORD, passive, self.logger)
+        manager.upload_files(uploadfiles, ftp_provider.remote_dir(self.FTP_CWD, sub_dir_list))
 
     def sftp_to_endpoint(self, uploadfiles, sub_dir=None):
         """
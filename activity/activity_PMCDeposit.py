@@ -4,13 +4,9 @@ import json
 
 import datetime
 import time
-import zipfile
 import shutil
 import re
 
-from ftplib import FTP
-import ftplib
-
 import activity
 
 import boto.s3
@@ -18,9 +14,9 @@ from boto.s3.connection import S3Connection
 
 import provider.s3lib as s3lib
 import provider.simpleDB as dblib
-
-from elifetools import parseJATS as parser
-from elifetools import xmlio
+import provider.ftp as ftp_provider
+import provider.article_processing as article_processing
+import provider.article_document as article_document
 
 
 """
@@ -50,6 +46,12 @@ class activity_PMCDeposit(activity.activity):
         self.TIF_DIR = self.get_tmp_dir() + os.sep + "tif_dir"
         self.OUTPUT_DIR = self.get_tmp_dir() + os.sep + "output_dir"
 
+        # Article zips whose files are copied into the new zip without extracting them
+        self.article_zips = []
+        self.file_name_map = {}
+        # ArticleDocument of the article XML, parsed once by profile_article
+        self.article_document = None
+
         # Data provider where email body is saved
         self.db = dblib.SimpleDB(settings)
 
@@ -172,56 +174,18 @@ class activity_PMCDeposit(activity.activity):
         self.FTP_PASSWORD = self.settings.PMC_FTP_PASSWORD
         self.FTP_CWD = self.settings.PMC_FTP_CWD
 
-    def ftp_upload(self, ftp, file):
-        ext = os.path.splitext(file)[1]
-        #print file
-        uploadname = file.split(os.sep)[-1]
-        if ext in (".txt", ".htm", ".html"):
-            ftp.storlines("STOR " + file, open(file))
-        else:
-            #print "uploading " + uploadname
-            ftp.storbinary("STOR " + uploadname, open(file, "rb"), 1024)
-            #print "uploaded " + uploadname
-
-    def ftp_cwd_mkd(self, ftp, sub_dir):
+    def ftp_to_endpoint(self, uploadfiles, sub_dir_list=None, passive=True):
         """
-        Given an FTP connection and a sub_dir name
-        try to cwd to the directory. If the directory
-        does not exist, create it, then cwd again
+        Upload the files over the FTP sessions this worker keeps open to the endpoint
         """
-        cwd_success = None
         try:
-            ftp.cwd(sub_dir)
-            cwd_success = True
-        except ftplib.error_perm:
-            # Directory probably does not exist, create it
-            ftp.mkd(sub_dir)
-            cwd_success = False
-        if cwd_success is not True:
-            ftp.cwd(sub_dir)
-
-        return cwd_success
-
-    def ftp_to_endpoint(self, uploadfiles, sub_dir_list=None, passive=True):
-        try:
-            for uploadfile in uploadfiles:
-                ftp = FTP()
-                if passive is False:
-                    ftp.set_pasv(False)
-                ftp.connect(self.FTP_URI)
-                ftp.login(self.FTP_USERNAME, self.FTP_PASSWORD)
-
-                self.ftp_cwd_mkd(ftp, "/")
-                if self.FTP_CWD != "":
-                    self.ftp_cwd_mkd(ftp, self.FTP_CWD)
-                if sub_dir_list is not None:
-                    for sub_dir in sub_dir_list:
-                        self.ftp_cwd_mkd(ftp, sub_dir)
-
-                self.ftp_upload(ftp, uploadfile)
-                ftp.quit()
-                return True
+            manager = ftp_provider.get_session_manager(self.FTP_URI, self.FTP_USERNAME,
+                                                       self.FTP_PASSWORD, passive, self.logger)
+            manager.upload_files(uploadfiles, ftp_provider.remote_dir(self.FTP_CWD, sub_dir_list))
+            return True
         except:
+            if self.logger:
+                self.logger.exception("error sending files by FTP: %s" % uploadfiles)
             return False
 
 
@@ -317,15 +281,18 @@ class activity_PMCDeposit(activity.activity):
 
     def unzip_or_move_file(self, file_name, to_dir, do_unzip=True):
         """
-        If file extension is zip, then unzip contents
+        If file extension is zip, then unzip the XML, the rest of the
+        zip contents are copied into the new zip by create_new_zip
         If file the extension
         """
         if self.file_extension(file_name) == 'zip' and do_unzip is True:
             # Unzip
             if self.logger:
-                self.logger.info("going to unzip " + file_name + " to " + to_dir)
-            myzip = zipfile.ZipFile(file_name, 'r')
-            myzip.extractall(to_dir)
+                self.logger.info("going to unzip the XML of " + file_name + " to " + to_dir)
+            self.article_zips.append(file_name)
+            member_names = article_processing.zip_member_names(file_name)
+            for member_name in article_processing.filter_member_names(member_names, ["*.xml"]):
+                article_processing.extract_zip_member(file_name, member_name, to_dir)
 
         elif self.file_extension(file_name):
             # Copy
@@ -340,6 +307,7 @@ class activity_PMCDeposit(activity.activity):
 
     def unzip_article_files(self, file_list):
 
+        self.article_zips = []
         for file_name in file_list:
             if self.approve_file(file_name):
                 if self.logger:
@@ -354,36 +322,19 @@ class activity_PMCDeposit(activity.activity):
         Pre-PPP files will not have a version number, for before PPP is launched
         """
 
-        file_name_map = {}
-
-        # Get a list of all files
-        dirfiles = self.file_list(self.TMP_DIR)
+        # Get a list of all files, those in the article zips are renamed in the new zip
+        filenames = [df.split(os.sep)[-1] for df in self.file_list(self.TMP_DIR)]
+        for zip_file_name in self.article_zips:
+            for member_name in article_processing.zip_member_names(zip_file_name):
+                if member_name not in filenames:
+                    filenames.append(member_name)
 
-        for df in dirfiles:
-            filename = df.split(os.sep)[-1]
-
-            # Get the new file name
-            file_name_map[filename] = None
-
-            # TODO strip the -v1 from it
-            file_extension = filename.split('.')[-1]
-            if '-v' in filename:
-                # Use part before the -v number
-                part_without_version = filename.split('-v')[0]
-            else:
-                # No -v found, use the file name minus the extension
-                part_without_version = ''.join(filename.split('.')[0:-1])
-
-            renamed_filename = part_without_version + '.' + file_extension
-
-            if renamed_filename:
-                file_name_map[filename] = renamed_filename
-            else:
-                if self.logger:
-                    self.logger.info('there is no renamed file for ' + filename)
+        file_name_map = article_processing.file_name_map_remove_version_number(
+            filenames, self.logger)
+        self.file_name_map = file_name_map
 
         for old_name, new_name in file_name_map.iteritems():
-            if new_name is not None:
+            if new_name is not None and os.path.isfile(self.TMP_DIR + os.sep + old_name):
                 shutil.move(self.TMP_DIR + os.sep + old_name, self.OUTPUT_DIR + os.sep + new_name)
 
         return file_name_map
@@ -408,21 +359,10 @@ class activity_PMCDeposit(activity.activity):
 
     def convert_xml(self, xml_file, file_name_map):
 
-        # Register namespaces
-        xmlio.register_xmlns()
-
-        root, doctype_dict = xmlio.parse(xml_file, return_doctype_dict=True)
-
-        # Convert xlink href values
-        total = xmlio.convert_xlink_href(root, file_name_map)
-        # TODO - compare whether all file names were converted
-
-        # Start the file output
-        reparsed_string = xmlio.output(root, type=None, doctype_dict=doctype_dict)
-
-        f = open(xml_file, 'wb')
-        f.write(reparsed_string)
-        f.close()
+        # The XML was moved after profile_article parsed it, so its document is reused
+        self.article_document = article_processing.convert_xml(
+            xml_file, file_name_map, self.article_document,
+            article_document.get_cache_dir(self.settings))
 
     def zip_revision_number(self, fid):
         """
@@ -471,16 +411,25 @@ class activity_PMCDeposit(activity.activity):
         if self.logger:
             self.logger.info("creating new PMC zip file named " + zip_file_name)
 
-        new_zipfile = zipfile.ZipFile(self.ZIP_DIR + os.sep + zip_file_name,
-                                      'w', zipfile.ZIP_DEFLATED, allowZip64=True)
+        with article_processing.new_zip(self.ZIP_DIR + os.sep + zip_file_name) as new_zipfile:
 
-        dirfiles = self.file_list(self.OUTPUT_DIR)
+            dirfiles = self.file_list(self.OUTPUT_DIR)
 
-        for df in dirfiles:
-            filename = df.split(os.sep)[-1]
-            new_zipfile.write(df, filename)
+            added = set()
+            for df in dirfiles:
+                filename = df.split(os.sep)[-1]
+                new_zipfile.write(df, filename)
+                added.add(filename)
 
-        new_zipfile.close()
+            # Copy the other renamed files of the article zips without recompressing them
+            for article_zip in self.article_zips:
+                member_map = {}
+                for member_name in article_processing.zip_member_names(article_zip):
+                    new_name = self.file_name_map.get(member_name)
+                    if new_name is not None and new_name not in added:
+                        member_map[member_name] = new_name
+                        added.add(new_name)
+                article_processing.copy_zip_members(article_zip, new_zipfile, member_map)
 
 
     def profile_article(self, document):
@@ -490,13 +439,13 @@ class activity_PMCDeposit(activity.activity):
         """
         # Temporary setting of version values from directory names
 
-        soup = self.article_soup(self.article_xml_file())
+        self.article_document = self.article_document_from_file(self.article_xml_file())
 
         # elife id / doi id / manuscript id
-        fid = parser.doi(soup).split('.')[-1]
+        fid = self.article_document.doi_id
 
         # article status
-        if parser.is_poa(soup) is True:
+        if self.article_document.is_poa is True:
             status = 'poa'
         else:
             status = 'vor'
@@ -505,7 +454,7 @@ class activity_PMCDeposit(activity.activity):
         version = self.version_number(document)
 
         # volume
-        volume = parser.volume(soup)
+        volume = self.article_document.volume
 
         return (fid, status, version, volume)
 
@@ -532,8 +481,8 @@ class activity_PMCDeposit(activity.activity):
 
         return file_name
 
-    def article_soup(self, xml_filename):
-        return parser.parse_document(xml_filename)
+    def article_document_from_file(self, xml_filename):
+        return article_document.load(xml_filename, article_document.get_cache_dir(self.settings))
 
     def add_email_to_queue(self, journal, volume, fid, revision, file_name, file_size):
         """
@@ -12,10 +12,11 @@ from boto.s3.connection import S3Connection
 import provider.simpleDB as dblib
 import provider.article as articlelib
 import provider.s3lib as s3lib
+import provider.article_processing as article_processing
+import provider.connections as connections
 import provider.blacklist as blacklist
 import provider.lax_provider as lax_provider
 
-import dateutil.parser
 """
 PubRouterDeposit activity
 """
@@ -51,9 +52,11 @@ class activity_PubRouterDeposit(activity.activity):
         # Bucket settings for source files of FTPArticle workflows
         self.pmc_zip_bucket = settings.poa_packaging_bucket
         self.pmc_zip_folder = "pmc/zip/"
+        self.pmc_zip_index = None
 
         # Bucket settings for source files of PMCDeposit workflows
         self.archive_bucket = self.settings.publishing_buckets_prefix + self.settings.archive_bucket
+        self.archive_zip_index = None
 
         # Track the success of some steps
         self.activity_status = None
@@ -231,11 +234,21 @@ class activity_PubRouterDeposit(activity.activity):
         """
         Get the file name of the most recent archive zip from the archive bucket
         """
+        return article_processing.latest_archive_zip_revision_from_index(
+            article.doi_id, self.get_archive_zip_index(), self.journal, status)
+
+    def get_archive_zip_index(self):
+        """
+        Index of the latest zip of each article in the archive bucket,
+        listed once per activity run
+        """
+        if self.archive_zip_index is not None:
+            return self.archive_zip_index
+
         bucket_name = self.archive_bucket
 
         # Connect to S3 and bucket
-        s3_conn = S3Connection(self.settings.aws_access_key_id,
-                               self.settings.aws_secret_access_key)
+        s3_conn = connections.s3_connection(self.settings)
         bucket = s3_conn.lookup(bucket_name)
 
         s3_keys_in_bucket = s3lib.get_s3_keys_from_bucket(bucket=bucket)
@@ -244,36 +257,8 @@ class activity_PubRouterDeposit(activity.activity):
         for key in s3_keys_in_bucket:
             s3_keys.append({"name": key.name, "last_modified": key.last_modified})
 
-        return self.latest_archive_zip_revision(article.doi_id, s3_keys, self.journal, status)
-
-    def latest_archive_zip_revision(self, doi_id, s3_keys, journal, status):
-        """
-        Get the most recent version of the article zip file from the
-        list of bucket key names
-        """
-        s3_key_name = None
-
-        name_prefix_to_match = (journal + '-' + str(doi_id).zfill(5)
-                                + '-' + status + '-v')
-
-        highest = 0
-        for key in s3_keys:
-            if key["name"].startswith(name_prefix_to_match):
-                version_and_date = None
-                try:
-                    parts = key["name"].split(name_prefix_to_match)
-                    version = parts[1].split('-')[0]
-                    date_formatted = dateutil.parser.parse(key["last_modified"])
-                    date_part = date_formatted.strftime('%Y%m%d%H%M%S')
-                    version_and_date = int(version + date_part)
-                except:
-                    pass
-                if version_and_date and version_and_date > highest:
-                    s3_key_name = key["name"]
-                    highest = version_and_date
-
-        return s3_key_name
-
+        self.archive_zip_index = article_processing.archive_zip_index(s3_keys)
+        return self.archive_zip_index
 
     def start_pmc_deposit_workflow(self, article, zip_file_name):
         """
@@ -423,6 +408,9 @@ class activity_PubRouterDeposit(activity.activity):
         # Create a blank article object to use its functions
         blank_article = self.create_article()
         # Remove based on published status
+        # Look up the Lax versions of all the articles at once, the checks below reuse them
+        lax_provider.article_versions_many([article.doi_id for article in articles],
+                                           self.settings)
 
         for article in articles:
             # Check whether the DOI was ever POA
@@ -594,24 +582,33 @@ class activity_PubRouterDeposit(activity.activity):
         """
 
         """
+        s3_key_name = self.get_pmc_zip_index().get(int(doi_id))
+
+        if s3_key_name:
+            return True
+        else:
+            return False
+
+    def get_pmc_zip_index(self):
+        """
+        Map of article doi_id to its latest PMC zip, listed once per activity run
+        """
+        if self.pmc_zip_index is not None:
+            return self.pmc_zip_index
+
         bucket_name = self.pmc_zip_bucket
         prefix = self.pmc_zip_folder
 
         # Connect to S3 and bucket
-        s3_conn = S3Connection(self.settings.aws_access_key_id,
-                               self.settings.aws_secret_access_key)
+        s3_conn = connections.s3_connection(self.settings)
         bucket = s3_conn.lookup(bucket_name)
 
         s3_key_names = s3lib.get_s3_key_names_from_bucket(
             bucket=bucket,
             prefix=prefix)
 
-        s3_key_name = s3lib.latest_pmc_zip_revision(doi_id, s3_key_names)
-
-        if s3_key_name:
-            return True
-        else:
-            return False
+        self.pmc_zip_index = s3lib.pmc_zip_index(s3_key_names)
+        return self.pmc_zip_index
 
 
     def send_admin_email(self):
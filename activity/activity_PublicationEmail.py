@@ -65,6 +65,11 @@ class activity_PublicationEmail(activity.activity):
         # Default is do not send duplicate emails
         self.allow_duplicates = False
 
+        # (doi_id, email_type, recipient_email) of emails already queued for the
+        #  articles in queued_email_doi_ids, loaded in one pass for duplicate checks
+        self.queued_email_doi_ids = set()
+        self.queued_emails = set()
+
         # Article types for which not to send emails
         self.article_types_do_not_send = []
         self.article_types_do_not_send.append('editorial')
@@ -113,6 +118,10 @@ class activity_PublicationEmail(activity.activity):
 
                 self.articles_approved_prepared = self.prepare_articles(self.articles_approved)
 
+                if self.allow_duplicates is not True:
+                    self.load_queued_emails(
+                        [article.doi_id for article in self.articles_approved_prepared])
+
                 if self.logger:
                     log_info = "Total parsed articles: " + str(len(self.articles))
                     log_info += "\n" + "Total approved articles " + str(len(self.articles_approved))
@@ -488,6 +497,10 @@ class activity_PublicationEmail(activity.activity):
                     self.logger.info(log_info)
                 remove_article_doi.append(article.doi)
 
+        # Look up the Lax versions of all the articles at once, the checks below reuse them
+        lax_provider.article_versions_many([article.doi_id for article in articles],
+                                           self.settings)
+
         for article in articles:
             # Check whether the DOI was ever POA
             article.was_ever_poa = lax_provider.was_ever_poa(article.doi_id, self.settings)
@@ -705,6 +718,27 @@ class activity_PublicationEmail(activity.activity):
             doi_id=doi_id,
             date_scheduled_timestamp=date_scheduled_timestamp)
 
+        if doi_id in self.queued_email_doi_ids:
+            self.queued_emails.add((doi_id, headers["email_type"], author.e_mail))
+
+    def load_queued_emails(self, doi_ids):
+        """
+        Load the emails already in the queue for all the doi_ids with a few
+        SimpleDB selects, so is_duplicate_email checks them without a query each
+        """
+        try:
+            items = self.db.elife_get_email_queue_items_by_doi_ids(doi_ids)
+        except:
+            # Duplicates are checked with a query for each email instead
+            if self.logger:
+                self.logger.exception("Error loading queued emails for duplicate checks")
+            return
+
+        for item in items:
+            self.queued_emails.add(
+                (item.get("doi_id"), item.get("email_type"), item.get("recipient_email")))
+        self.queued_email_doi_ids.update(doi_ids)
+
     def is_duplicate_email(self, doi_id, email_type, recipient_email):
         """
         Use the SimpleDB provider to count the number of emails
@@ -714,6 +748,9 @@ class activity_PublicationEmail(activity.activity):
           No matching emails: return False
           Is a matching email in the queue: return True
         """
+        if doi_id in self.queued_email_doi_ids:
+            return (doi_id, email_type, recipient_email) in self.queued_emails
+
         duplicate = None
         try:
             count = 0
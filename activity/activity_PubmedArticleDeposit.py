@@ -233,6 +233,10 @@ class activity_PubmedArticleDeposit(activity.activity):
         # For each VoR article, set was_ever_poa property
         published_articles = []
 
+        # Look up the Lax versions of all the articles at once, the checks below reuse them
+        lax_provider.article_versions_many(
+            [self.article.get_doi_id(article.doi) for article in articles], self.settings)
+
         for article in articles:
 
             xml_file_name = self.xml_file_to_doi_map[article.doi]
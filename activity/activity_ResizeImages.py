@@ -1,6 +1,7 @@
-import StringIO
 import json
 import random
+import time
+from multiprocessing.pool import ThreadPool
 from mimetypes import guess_type
 import activity
 import boto.swf
@@ -12,6 +13,7 @@ from boto.s3.connection import S3Connection
 from boto.s3.key import Key
 from provider.article_structure import ArticleInfo
 from provider.execution_context import Session
+from provider import connections
 from provider.storage_provider import StorageContext
 
 """
@@ -63,16 +65,26 @@ class activity_ResizeImages(activity.activity):
             bucket, file_infos = self.get_file_infos(bucket_folder_name)
 
             image_count = 0
+            keys = []
             for file_info in file_infos:
                 image_count += 1
                 key = bucket.get_key(file_info.key)
                 # see : http://stackoverflow.com/questions/9954521/s3-boto-list-keys-sometimes-returns-directory-key
                 if not key.name.endswith("/"):
-                    # process each key in the folder
-                    self.process_key(key, cdn_path)
+                    keys.append(key)
+
+            start_time = time.time()
+            # process each key in the folder
+            self.process_keys(keys, cdn_path)
+            elapsed_time = time.time() - start_time
+            if self.logger:
+                self.logger.info("Resized images for article %s in %.2f seconds" %
+                                 (article_id, elapsed_time))
+
             self.emit_monitor_event(self.settings, article_id, version, run, "Resize Images", "end",
                                     "Finished converting images for " + article_id + ": " +
-                                    str(image_count) + " images processed ")
+                                    str(image_count) + " images processed in " +
+                                    ("%.2f" % elapsed_time) + " seconds")
 
             self.clean_tmp_dir()
 
@@ -87,9 +99,7 @@ class activity_ResizeImages(activity.activity):
 
     def get_file_infos(self, folder_name):
         # connect to S3 and obtain the expanded article bucket
-        self.conn = S3Connection(self.settings.aws_access_key_id,
-                                 self.settings.aws_secret_access_key,
-                                 host=self.settings.s3_hostname)
+        self.conn = connections.s3_connection(self.settings, host=self.settings.s3_hostname)
         bucket = self.conn.get_bucket(self.settings.publishing_buckets_prefix +
                                       self.settings.expanded_bucket)
 
@@ -97,6 +107,38 @@ class activity_ResizeImages(activity.activity):
         file_infos = bucket.list(folder_name + "/", "/")
         return bucket, file_infos
 
+    def get_concurrency(self):
+        """
+        Number of threads to download, resize and upload the images with, from
+        the settings, defaulting to one. Resizing in more processes is left to
+        running more worker processes, a pool forked here from a worker which
+        already runs threads could copy a held lock into its children
+        """
+        threads = 1
+        if hasattr(self.settings, 'resize_images_threads'):
+            threads = max(int(self.settings.resize_images_threads), 1)
+        return threads
+
+    def process_keys(self, keys, cdn_path):
+        "Process the keys concurrently on a pool of threads"
+        threads = self.get_concurrency()
+        # create the tmp dir before the threads share it
+        self.get_tmp_dir()
+        thread_pool = ThreadPool(threads)
+        try:
+            results = [thread_pool.apply_async(self.process_key, (key, cdn_path))
+                       for key in keys]
+            for result in results:
+                # raises the exception of a failed key
+                result.get()
+        except:
+            thread_pool.terminate()
+            raise
+        else:
+            thread_pool.close()
+        finally:
+            thread_pool.join()
+
     def process_key(self, key, cdn_path):
         # determine filename (without folder) and obtain ArticleInfo instance
         filename = key.name.rsplit('/', 1)[1]
@@ -130,17 +172,14 @@ class activity_ResizeImages(activity.activity):
     def generate_images(self, formats, fp, info, cdn_path):
         # delegate this to module
         try:
-            for format_spec_name in formats:
-                format_spec = formats[format_spec_name]
-                # if sources not present or includes file extension for this image
-                if 'sources' not in format_spec or info.extension in [
-                        x.strip() for x in format_spec['sources'].split(',')]:
-                    download = 'download' in format_spec and format_spec['download']
-                    fp.seek(0)  # rewind the tape
-                    filename, image = resizer.resize(format_spec, fp, info, self.logger)
-                    if filename is not None and image is not None:
-                        self.store_in_cdn(filename, image, cdn_path, download)
-                        self.logger.info("Stored image %s as %s" % (filename, cdn_path))
+            # the image is decoded once and each rendition stored as soon as it is encoded
+            renditions = resizer.resize_all(resizer.source_formats(formats, info), fp, info,
+                                            self.logger)
+            for format_spec, filename, image in renditions:
+                download = 'download' in format_spec and format_spec['download']
+                if filename is not None and image is not None:
+                    self.store_in_cdn(filename, image, cdn_path, download)
+                    self.logger.info("Stored image %s as %s" % (filename, cdn_path))
         finally:
             fp.close()
 
@@ -4,6 +4,8 @@ import random
 import datetime
 import calendar
 import time
+import Queue
+from multiprocessing.pool import ThreadPool
 
 import activity
 
@@ -12,6 +14,7 @@ import boto.s3
 from boto.s3.connection import S3Connection
 
 import provider.simpleDB as dblib
+import provider.connections as connections
 
 """
 S3Monitor activity
@@ -34,6 +37,9 @@ class activity_S3Monitor(activity.activity):
         # Data provider
         self.db = dblib.SimpleDB(settings)
 
+        # Existing S3File items by prefix, when bulk syncing
+        self.existing_items = {}
+
     def do_activity(self, data=None):
         """
         S3Monitor activity, do the work
@@ -52,24 +58,20 @@ class activity_S3Monitor(activity.activity):
         db_conn = self.db.connect()
 
         # Connect to S3
-        s3_conn = S3Connection(self.settings.aws_access_key_id,
-                               self.settings.aws_secret_access_key)
+        s3_conn = connections.s3_connection(self.settings)
 
         # Lookup bucket
         bucket = s3_conn.lookup(bucket_name)
 
-        (keys, folders) = self.get_keys_and_folders(bucket, prefix)
-
-        self.update_keys_and_folder_items(keys, folders, bucket_name,
-                                          _runtime_timestamp, prefix, delimiter)
+        if self.bulk_sync():
+            update_items = self.sync_keys_and_folder_items
+        else:
+            update_items = self.update_keys_and_folder_items
 
-        # Map one more level of directories - a quick hack before parallel execution
-        (keys, folders) = self.get_keys_and_folders(bucket, prefix)
-        for folder in folders:
-            prefix = folder.name
-            (keys2, folders2) = self.get_keys_and_folders(bucket, prefix)
-            self.update_keys_and_folder_items(keys2, folders2, bucket_name,
-                                              _runtime_timestamp, prefix, delimiter)
+        # Map the directories concurrently, updating items as each listing arrives
+        crawl = self.crawl_keys_and_folders(bucket, prefix, delimiter, self.get_crawl_depth())
+        for (folder_prefix, keys, folders) in crawl:
+            update_items(keys, folders, bucket_name, _runtime_timestamp, folder_prefix, delimiter)
 
         return True
 
@@ -174,6 +176,104 @@ class activity_S3Monitor(activity.activity):
                         item.add_value(k, v)
                 item.save()
 
+    def bulk_sync(self):
+        "whether to sync items in bulk, from the s3_monitor_bulk_sync setting"
+        if hasattr(self.settings, 's3_monitor_bulk_sync'):
+            return bool(self.settings.s3_monitor_bulk_sync)
+        return False
+
+    def sync_keys_and_folder_items(self, keys, folders, bucket_name,
+                                   _runtime_timestamp=None, prefix='', delimiter='/'):
+        """
+        Bulk version of update_keys_and_folder_items. The existing DB items under the
+        prefix are read with one select, compared in memory by etag and last_modified,
+        and only new or changed items are written, in batches, along with their log items.
+        Unchanged items are not rewritten, so their _runtime values are not refreshed.
+        """
+        existing_items = self.get_existing_items(bucket_name, prefix, delimiter)
+
+        base_item_attrs = {}
+        base_item_attrs['bucket_name'] = bucket_name
+        if _runtime_timestamp:
+            date_attrs = self.get_expanded_date_attributes(
+                base_name='_runtime', date_format="%Y-%m-%dT%H:%M:%S.000Z",
+                timestamp=_runtime_timestamp, date_string=None)
+            for k, v in date_attrs.items():
+                base_item_attrs[k] = v
+
+        items = {}
+        log_items = {}
+
+        for folder in folders:
+            item_name = bucket_name + delimiter + folder.name
+            if item_name not in existing_items:
+                item_attrs = dict(base_item_attrs)
+                item_attrs['item_name'] = item_name
+                items[item_name] = item_attrs
+
+        for key in keys:
+            item_name = bucket_name + delimiter + key.name
+            item_attrs = self.get_key_item_attrs(key, item_name, base_item_attrs)
+            if self.item_changed(existing_items.get(item_name), item_attrs):
+                items[item_name] = item_attrs
+                log_item_name = self.get_log_item_name(item_name, item_attrs)
+                log_item_attrs = dict(item_attrs)
+                log_item_attrs['log_item_name'] = log_item_name
+                log_items[log_item_name] = log_item_attrs
+
+        if items:
+            self.db.batch_put_attributes("S3File", items)
+        if log_items:
+            self.db.batch_put_attributes("S3FileLog", log_items)
+
+        # Keep the prefetched items current for later prefixes of this run
+        for item_name in items:
+            existing_items[item_name] = items[item_name]
+
+    def get_existing_items(self, bucket_name, prefix='', delimiter='/'):
+        """
+        Existing S3File items for the prefix, selected once per run and reused
+        for the prefixes below it
+        """
+        prefix = prefix or ''
+        for fetched_prefix in self.existing_items:
+            if fetched_prefix[0] == bucket_name and prefix.startswith(fetched_prefix[1]):
+                return self.existing_items[fetched_prefix]
+        items = self.db.elife_get_S3_file_items_by_prefix(bucket_name, prefix, delimiter)
+        self.existing_items[(bucket_name, prefix)] = items
+        return items
+
+    def get_key_item_attrs(self, key, item_name, base_item_attrs):
+        "DB item attributes for an S3 key"
+        item_attrs = dict(base_item_attrs)
+        item_attrs['item_name'] = item_name
+
+        # Standard attributes returned from a standard boto list call
+        attr_list = ['name', 'content_type', 'etag', 'last_modified',
+                     'owner', 'storage_class', 'size']
+        for attr_name in attr_list:
+            raw_value = getattr(key, attr_name)
+            if raw_value:
+                item_attrs[attr_name] = str(raw_value)
+
+        if item_attrs.get('last_modified'):
+            date_attrs = self.get_expanded_date_attributes(
+                base_name='last_modified', date_format="%Y-%m-%dT%H:%M:%S.000Z",
+                timestamp=None, date_string=item_attrs['last_modified'])
+            for k, v in date_attrs.items():
+                item_attrs[k] = v
+
+        return item_attrs
+
+    def item_changed(self, item, item_attrs):
+        "whether the key attributes differ from the existing DB item, if any"
+        if item is None:
+            return True
+        for attr_name in ['etag', 'last_modified']:
+            if item.get(attr_name) != item_attrs.get(attr_name):
+                return True
+        return False
+
     def get_expanded_date_attributes(self, base_name='', date_format="%Y-%m-%dT%H:%M:%S.000Z",
                                      timestamp=None, date_string=None):
         """
@@ -261,6 +361,63 @@ class activity_S3Monitor(activity.activity):
             self.db.put_attributes("S3FileLog", log_item_name, item_attrs)
 
 
+    def get_crawl_depth(self):
+        """
+        Levels of directories to map from the s3_monitor_crawl_depth setting, where
+        None maps every level, by default the prefix and the folders directly below it
+        """
+        if hasattr(self.settings, 's3_monitor_crawl_depth'):
+            return self.settings.s3_monitor_crawl_depth
+        return 2
+
+    def get_crawl_threads(self):
+        if hasattr(self.settings, 's3_monitor_crawl_threads'):
+            return max(int(self.settings.s3_monitor_crawl_threads), 1)
+        return 8
+
+    def crawl_keys_and_folders(self, bucket, prefix=None, delimiter='/', max_depth=None):
+        """
+        Walk the bucket breadth-first from the prefix to max_depth levels, listing folders
+        on a bounded pool of threads, and yield (prefix, keys, folders) as each listing
+        arrives. A folder is listed as soon as its parent listing returns, so the time
+        taken follows the deepest path rather than the number of folders
+        """
+        results = Queue.Queue()
+        pool = ThreadPool(self.get_crawl_threads())
+
+        def list_folder(folder_prefix, depth):
+            pool.apply_async(self.list_folder, (bucket, folder_prefix, delimiter, depth),
+                             callback=results.put)
+
+        try:
+            list_folder(prefix, 1)
+            pending = 1
+            while pending:
+                (folder_prefix, depth, listing, exception) = results.get()
+                pending -= 1
+                if exception is not None:
+                    raise exception
+                (keys, folders) = listing
+                if max_depth is None or depth < max_depth:
+                    for folder in folders:
+                        list_folder(folder.name, depth + 1)
+                        pending += 1
+                yield folder_prefix, keys, folders
+        except:
+            pool.terminate()
+            raise
+        else:
+            pool.close()
+        finally:
+            pool.join()
+
+    def list_folder(self, bucket, prefix, delimiter, depth):
+        "list a folder for the crawler, returning rather than raising an exception"
+        try:
+            return prefix, depth, self.get_keys_and_folders(bucket, prefix, delimiter), None
+        except Exception as exception:
+            return prefix, depth, None, exception
+
     def get_keys_and_folders(self, bucket, prefix=None, delimiter='/', headers=None):
         # Get "keys" and "folders" from the bucket, with optional
         # prefix for the "folder" of interest
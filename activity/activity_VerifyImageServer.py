@@ -4,7 +4,6 @@ from provider.execution_context import Session
 from provider.storage_provider import StorageContext
 import provider.article_structure as article_structure
 import provider.iiif as iiif
-import requests
 
 """
 activity_VerifyImageServer.py activity
@@ -78,5 +77,27 @@ class activity_VerifyImageServer(activity.activity):
             return activity.activity.ACTIVITY_PERMANENT_FAILURE
 
     def retrieve_endpoints_check(self, original_figures, iiif_path_for_article):
-        return list(map(lambda fig: iiif.try_endpoint(iiif.endpoint(self.settings, iiif_path_for_article, fig), self.logger),
-                        original_figures))
\ No newline at end of file
+        """
+        Check the IIIF endpoint of every figure concurrently, logging the status,
+        attempts and time taken for each, and return (success, endpoint) tuples
+        """
+        endpoints = [iiif.endpoint(self.settings, iiif_path_for_article, fig)
+                     for fig in original_figures]
+        reports = iiif.check_endpoints(endpoints, self.logger, self.get_iiif_threads(),
+                                       deadline=self.get_iiif_retry_deadline())
+        for report in reports:
+            self.logger.info("IIIF endpoint %s: success %s, status code %s, %s attempts, %.2f seconds",
+                             report['endpoint'], report['success'], report['status_code'],
+                             report['attempts'], report['seconds'])
+        return [(report['success'], report['endpoint']) for report in reports]
+
+    def get_iiif_threads(self):
+        "at most iiif.IIIF_THREADS, the connections the shared IIIF session keeps open"
+        if hasattr(self.settings, 'iiif_threads'):
+            return min(max(int(self.settings.iiif_threads), 1), iiif.IIIF_THREADS)
+        return iiif.IIIF_THREADS
+
+    def get_iiif_retry_deadline(self):
+        if hasattr(self.settings, 'iiif_retry_deadline'):
+            return self.settings.iiif_retry_deadline
+        return iiif.RETRY_DEADLINE
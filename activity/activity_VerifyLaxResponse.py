@@ -1,6 +1,7 @@
 import activity
 import json
 from provider.execution_context import Session
+import provider.lax_provider as lax_provider
 from uuid import UUID
 
 """
@@ -41,6 +42,9 @@ class activity_VerifyLaxResponse(activity.activity):
         run = data['run']
         version = data['version']
 
+        # Lax has changed the versions of the article
+        lax_provider.invalidate_article_versions(article_id)
+
         self.emit_monitor_event(self.settings, article_id, version, run, self.pretty_name, "start",
                                 "Starting verification of Lax response " + article_id)
 
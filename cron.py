@@ -10,6 +10,7 @@ import boto.s3
 from boto.s3.connection import S3Connection
 
 import provider.swfmeta as swfmetalib
+import provider.connections as connections
 import starter
 
 import newrelic.agent
@@ -199,7 +200,7 @@ def workflow_conditional_start(settings, starter_name, start_seconds, data=None,
             outbox_folder = "pubmed/outbox/"
 
             # Connect to S3 and bucket
-            s3_conn = S3Connection(settings.aws_access_key_id, settings.aws_secret_access_key)
+            s3_conn = connections.s3_connection(settings)
             bucket = s3_conn.lookup(bucket_name)
 
             s3_key_names = get_s3_key_names_from_bucket(
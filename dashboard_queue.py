@@ -1,13 +1,29 @@
-import boto.sqs
 from boto.sqs.message import Message
+from provider import connections
 import json
+import fcntl
+import logging
+import threading
+import time
 import uuid
 
+# SQS accepts at most 10 messages in a write_batch call
+BATCH_SIZE = 10
+# seconds the background thread waits for a batch to fill before sending
+FLUSH_INTERVAL = 1.0
+SPOOL_FILE = "event_monitor_spool.json"
+# seconds between attempts of the background thread to send spooled messages again
+SPOOL_RETRY_INTERVAL = 60
+
+_emitter = None
+
 
 def send_message(message, settings):
-    conn = boto.sqs.connect_to_region(settings.sqs_region,
-                                      aws_access_key_id=settings.aws_access_key_id,
-                                      aws_secret_access_key=settings.aws_secret_access_key)
+    if _emitter is not None:
+        _emitter.send(message)
+        return
+
+    conn = connections.sqs_connection(settings)
     queue = conn.get_queue(settings.event_monitor_queue)
 
     m = Message()
@@ -15,6 +31,178 @@ def send_message(message, settings):
     queue.write(m)
 
 
+def start_emitter(settings, logger=None):
+    """
+    Buffer the messages given to send_message in this process and send them
+    in batches from a background thread, see DashboardEmitter
+    """
+    global _emitter
+    if _emitter is None:
+        _emitter = DashboardEmitter(settings, logger)
+        _emitter.start()
+    return _emitter
+
+
+def stop_emitter():
+    "send any buffered messages and go back to sending each message as it is given"
+    global _emitter
+    if _emitter is not None:
+        emitter = _emitter
+        _emitter = None
+        emitter.stop()
+
+
+def flush():
+    "send any buffered messages now, for example when an activity completes"
+    if _emitter is not None:
+        _emitter.flush()
+
+
+class DashboardEmitter(object):
+    """
+    Buffers dashboard messages and writes them to the event monitor queue in
+    batches of up to BATCH_SIZE. Messages which cannot be written are appended
+    to a local spool file, one JSON message per line, so monitoring never fails
+    the activity which reported it; they are sent again when an emitter starts
+    and every spool_retry_interval seconds. The spool file can be shared by the
+    processes of a worker, each reads and writes it holding a lock on it.
+    """
+
+    def __init__(self, settings, logger=None, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL, spool_file=None,
+                 spool_retry_interval=SPOOL_RETRY_INTERVAL):
+        self.settings = settings
+        self.logger = logger or logging.getLogger('elife-bot')
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        if spool_file is None:
+            spool_file = (settings.event_monitor_spool_file
+                          if hasattr(settings, 'event_monitor_spool_file') else SPOOL_FILE)
+        self.spool_file = spool_file
+        self.spool_retry_interval = spool_retry_interval
+        self.spool_read = None
+
+        self.queue = None
+        self.buffer = []
+        self.running = False
+        self.thread = None
+        self.condition = threading.Condition()
+        # held while messages taken from the buffer are being written
+        self.send_lock = threading.Lock()
+
+    def start(self):
+        self.retry_spool()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="DashboardEmitter")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.flush()
+
+    def send(self, message):
+        with self.condition:
+            self.buffer.append(message)
+            if len(self.buffer) >= self.batch_size:
+                self.condition.notify()
+
+    def flush(self):
+        "write every buffered message, waiting for any batch already being written"
+        with self.send_lock:
+            with self.condition:
+                messages = self.buffer
+                self.buffer = []
+            self.write_messages(messages)
+
+    def run(self):
+        while True:
+            with self.condition:
+                if self.running and len(self.buffer) < self.batch_size:
+                    self.condition.wait(self.flush_interval)
+                if not self.running:
+                    return
+            try:
+                if time.time() - self.spool_read >= self.spool_retry_interval:
+                    self.retry_spool()
+                self.flush()
+            except Exception:
+                self.logger.exception("error sending dashboard messages")
+
+    def retry_spool(self):
+        "buffer the spooled messages to be sent again"
+        self.spool_read = time.time()
+        messages = self.read_spool()
+        if messages:
+            with self.condition:
+                self.buffer.extend(messages)
+
+    def get_queue(self):
+        if self.queue is None:
+            conn = connections.sqs_connection(self.settings)
+            self.queue = conn.get_queue(self.settings.event_monitor_queue)
+        return self.queue
+
+    def write_messages(self, messages):
+        for start in range(0, len(messages), self.batch_size):
+            self.write_batch(messages[start:start + self.batch_size])
+
+    def write_batch(self, messages):
+        if not messages:
+            return
+        entries = []
+        for index, message in enumerate(messages):
+            m = Message()
+            m.set_body(json.dumps(message))
+            entries.append((str(index), m.get_body_encoded(), 0))
+        try:
+            result = self.get_queue().write_batch(entries)
+        except Exception:
+            self.logger.exception("error writing %s dashboard messages, spooling them to %s" %
+                                  (len(messages), self.spool_file))
+            self.queue = None
+            self.spool(messages)
+            return
+        failed = [messages[int(error['id'])] for error in result.errors]
+        if failed:
+            self.logger.error("SQS rejected %s dashboard messages, spooling them to %s" %
+                              (len(failed), self.spool_file))
+            self.spool(failed)
+
+    def spool(self, messages):
+        try:
+            with open(self.spool_file, 'a') as open_file:
+                # the lock is released when the file is closed
+                fcntl.flock(open_file, fcntl.LOCK_EX)
+                for message in messages:
+                    open_file.write(json.dumps(message) + "\n")
+        except (IOError, OSError):
+            self.logger.exception("error spooling %s dashboard messages" % len(messages))
+
+    def read_spool(self):
+        "messages left in the spool file by an earlier emitter, emptying the file"
+        try:
+            with open(self.spool_file, 'r+') as open_file:
+                fcntl.flock(open_file, fcntl.LOCK_EX)
+                lines = open_file.readlines()
+                open_file.seek(0)
+                open_file.truncate()
+        except (IOError, OSError):
+            return []
+        messages = []
+        for line in lines:
+            try:
+                messages.append(json.loads(line))
+            except ValueError:
+                self.logger.error("ignoring unreadable spooled dashboard message %s" % line)
+        return messages
+
+
 def build_event_message(item_identifier, version, run, event_type, timestamp, status, message):
     message = {
         'message_type': 'event',
@@ -41,4 +229,3 @@ def build_property_message(item_identifier, version, name, value, property_type)
         'message_id': str(uuid.uuid4())
     }
     return message
-
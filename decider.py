@@ -3,11 +3,13 @@ import settings as settingsLib
 import log
 import json
 import random
-import importlib
 import os
+import signal
 import time
 from optparse import OptionParser
 from provider import process
+from provider import connections
+from provider.class_registry import ClassRegistry, get_class_reload_on_change
 
 import workflow
 import newrelic.agent
@@ -29,8 +31,15 @@ def decide(ENV, flag):
     #logFile = None
     logger = log.logger(logFile, settings.setLevel, identity)
 
+    # Share AWS connections between the workflows run by this process
+    connections.init()
+
+    # Workflow classes are imported once, and reloaded when their files change or on SIGHUP
+    workflow_classes = ClassRegistry("workflow", get_class_reload_on_change(settings))
+    signal.signal(signal.SIGHUP, workflow_classes.request_reload)
+
     # Simple connect
-    conn = boto.swf.layer1.Layer1(settings.aws_access_key_id, settings.aws_secret_access_key)
+    conn = connections.swf_connection(settings)
 
     token = None
     application = newrelic.agent.application()
@@ -65,16 +74,16 @@ def decide(ENV, flag):
 
                         logger.info('workflowType: %s' % workflowType)
 
-                        # Instantiate and object for the workflow using eval
+                        # Instantiate an object for the workflow from its class
                         # Build a string for the object name
                         workflow_name = get_workflow_name(workflowType)
 
                         # Attempt to import the module for the workflow
-                        if import_workflow_class(workflow_name):
+                        workflow_class = get_workflow_class(workflow_classes, workflow_name, logger)
+                        if workflow_class is not None:
                             # Instantiate the workflow object
-                            workflow_object = get_workflow_object(workflow_name, settings,
-                                                                  logger, conn, token, decision,
-                                                                  maximum_page_size)
+                            workflow_object = workflow_class(settings, logger, conn, token,
+                                                             decision, maximum_page_size)
 
                             # Process the workflow
                             try:
@@ -172,40 +181,15 @@ def get_workflow_name(workflowType):
     """
     return "workflow_" + workflowType
 
-def import_workflow_class(workflow_name):
-    """
-    Given an workflow subclass name as workflow_name,
-    attempt to lazy load the class when needed
-    """
-    try:
-        module_name = "workflow." + workflow_name
-        importlib.import_module(module_name)
-        # Reload the module, in case it was imported before
-        reload_module(module_name)
-        return True
-    except ImportError:
-        return False
-
-def reload_module(module_name):
-    """
-    Given an module name,
-    attempt to reload the module
-    """
-    try:
-        reload(eval(module_name))
-    except NameError:
-        pass
-
-def get_workflow_object(workflow_name, settings, logger, conn, token, decision, maximum_page_size):
+def get_workflow_class(workflow_classes, workflow_name, logger):
     """
-    Given a workflow_name, and if the module class is already
-    imported, create an object an return it
+    Given an workflow subclass name as workflow_name, get the class from the
+    registry, recording the seconds it took as a metric
     """
-    full_path = "workflow." + workflow_name + "." + workflow_name
-    f = eval(full_path)
-    # Create the object
-    workflow_object = f(settings, logger, conn, token, decision, maximum_page_size)
-    return workflow_object
+    workflow_class, seconds = workflow_classes.get_class_timed(workflow_name)
+    logger.info('resolved class %s in %.4f seconds' % (workflow_name, seconds))
+    newrelic.agent.record_custom_metric('Custom/ClassResolution/' + workflow_name, seconds)
+    return workflow_class
 
 
 if __name__ == "__main__":
@@ -24,6 +24,13 @@ def logger(logFile = None, setLevel = "INFO", identity = ""):
     logger.setLevel(eval("logging." + setLevel))
     return logger
 
+def reset():
+    """
+    Remove the handlers of the logger, for example in a forked child process
+    which logs with its own identity
+    """
+    del logging.getLogger('elife-bot').handlers[:]
+
 def identity(process_name):
     return "%s_%s" % (process_name, int(random.random() * 1000))
 
@@ -1,4 +1,5 @@
 import calendar
+import json
 import time
 import os
 import re
@@ -10,6 +11,7 @@ from boto.s3.connection import S3Connection
 
 import provider.simpleDB as dblib
 import provider.s3lib as s3lib
+import provider.connections as connections
 from elifetools import parseJATS as parser
 from provider.article_structure import ArticleInfo
 from provider.storage_provider import StorageContext
@@ -19,6 +21,9 @@ Article data provider
 From article XML, get some data for use in workflows and templates
 """
 
+# folder in a bucket holding the indexes of its published folders
+PUBLISHED_FOLDER_INDEX_FOLDER = "published_index/"
+
 class article(object):
 
     def __init__(self, settings=None, tmp_dir=None):
@@ -59,8 +64,7 @@ class article(object):
         """
         Connect to S3 using the settings
         """
-        s3_conn = S3Connection(self.settings.aws_access_key_id,
-                               self.settings.aws_secret_access_key)
+        s3_conn = connections.s3_connection(self.settings)
         self.s3_conn = s3_conn
         return self.s3_conn
 
@@ -279,7 +283,6 @@ class article(object):
         if force is False and self.article_bucket_published_dates is not None:
             return self.article_bucket_published_dates
 
-        article_bucket_published_dates = {}
         poa_published_folder = "pubmed/published/"
 
         file_extensions = []
@@ -287,60 +290,15 @@ class article(object):
 
         bucket_name = self.settings.poa_packaging_bucket
 
-        if folder_names is None:
-            # Get the folder names from live s3 bucket if no test data supplied
-            folder_names = self.get_folder_names_from_bucket(
-                bucket_name=bucket_name,
-                prefix=poa_published_folder)
-
-        if s3_key_names is None:
-            # Get the s3 key names from live s3 bucket if no test data supplied
-            s3_key_names = []
-            for folder_name in folder_names:
-
-                key_names = self.get_s3_key_names_from_bucket(
-                    bucket_name=bucket_name,
-                    prefix=folder_name,
-                    file_extensions=file_extensions)
-
-                for key_name in key_names:
-                    s3_key_names.append(key_name)
-
-        # Extract just the doi_id portion
-        for s3_key_name in s3_key_names:
-            # Try to get DOI from a POA key name first
-            doi_id = self.get_doi_id_from_poa_s3_key_name(s3_key_name)
-            if doi_id is not None:
-                pub_date_type = "poa"
-            else:
-                doi_id = self.get_doi_id_from_s3_key_name(s3_key_name)
-                if doi_id is not None:
-                    pub_date_type = "vor"
+        published_dates = self.published_dates_from_published_folder(
+            bucket_name, poa_published_folder, file_extensions, folder_names, s3_key_names)
 
-            if doi_id:
-
-                # Create the dict if it does not exist
-                try:
-                    article_bucket_published_dates[doi_id]
-                except KeyError:
-                    article_bucket_published_dates[doi_id] = {}
-
-                # Parse and save the date from the folder name
-                date_string = self.get_date_string_from_s3_key_name(
-                    s3_key_name, poa_published_folder)
-
-                date_obj = time.strptime(date_string, "%Y%m%d")
-
-                # Compare so we have the earliest date saved
-                current_date_obj = None
-                try:
-                    current_date_obj = article_bucket_published_dates[doi_id][pub_date_type]
-                except KeyError:
-                    current_date_obj = None
-
-                if current_date_obj is None or date_obj < current_date_obj:
-                    # No date yet or it is previous to the current date, use this date
-                    article_bucket_published_dates[doi_id][pub_date_type] = date_obj
+        article_bucket_published_dates = {}
+        for doi_id, pub_dates in published_dates.items():
+            article_bucket_published_dates[doi_id] = {}
+            for pub_date_type, date_string in pub_dates.items():
+                article_bucket_published_dates[doi_id][pub_date_type] = time.strptime(
+                    date_string, "%Y%m%d")
 
         # Cache it
         self.article_bucket_published_dates = article_bucket_published_dates
@@ -481,15 +439,24 @@ class article(object):
         get a list of files by file extensions, and then parse out the article id
           folder_names and s3_key_names is only supplied for when running automated tests
         """
-        ids = []
+        published_dates = self.published_dates_from_published_folder(
+            bucket_name, published_folder, file_extensions, folder_names, s3_key_names)
 
+        ids = sorted(published_dates.keys())
 
-        if folder_names is None:
-            # Get the folder names from live s3 bucket if no test data supplied
-            folder_names = self.get_folder_names_from_bucket(
-                bucket_name=bucket_name,
-                prefix=published_folder)
+        return ids
 
+    def published_dates_from_published_folder(self, bucket_name, published_folder,
+                                              file_extensions, folder_names=None,
+                                              s3_key_names=None):
+        """
+        For each article id in the dated subfolders of the published folder, the earliest
+        folder date string its POA and VOR files are in, e.g. {2419: {"poa": "20140508"}}
+        Read from the published folder index unless test data is supplied
+          folder_names and s3_key_names is only supplied for when running automated tests
+        """
+        if folder_names is None and s3_key_names is None:
+            return self.published_folder_index(bucket_name, published_folder, file_extensions)
 
         if s3_key_names is None:
             # Get the s3 key names from live s3 bucket if no test data supplied
@@ -504,21 +471,97 @@ class article(object):
                 for key_name in key_names:
                     s3_key_names.append(key_name)
 
-        # Extract just the doi_id portion
+        published_dates = {}
+        self.add_published_dates(published_dates, s3_key_names, published_folder)
+        return published_dates
+
+    def published_folder_index(self, bucket_name, published_folder, file_extensions):
+        """
+        Published dates of the articles in the published folder, kept in an index
+        in the bucket so each run only lists the keys of the folders added since the
+        last one it indexed. The last indexed folder is listed again because workflows
+        which run again on the same day add files to it
+        """
+        index_resource = self.published_folder_index_resource(bucket_name, published_folder)
+        index = self.load_published_folder_index(index_resource)
+        last_folder = index.get("last_folder")
+
+        folder_names = sorted(self.get_folder_names_from_bucket(
+            bucket_name=bucket_name,
+            prefix=published_folder))
+        new_folder_names = [folder_name for folder_name in folder_names
+                            if last_folder is None or folder_name >= last_folder]
+
+        for folder_name in new_folder_names:
+            key_names = self.get_s3_key_names_from_bucket(
+                bucket_name=bucket_name,
+                prefix=folder_name,
+                file_extensions=file_extensions)
+            self.add_published_dates(index["published_dates"], key_names, published_folder)
+
+        if new_folder_names:
+            index["last_folder"] = new_folder_names[-1]
+            self.save_published_folder_index(index_resource, index)
+
+        return index["published_dates"]
+
+    def published_folder_index_resource(self, bucket_name, published_folder):
+        return (self.settings.storage_provider + "://" + bucket_name + "/" +
+                PUBLISHED_FOLDER_INDEX_FOLDER + published_folder + "index.json")
+
+    def load_published_folder_index(self, index_resource):
+        index = {"last_folder": None, "published_dates": {}}
+        try:
+            storage = StorageContext(self.settings)
+            data = json.loads(storage.get_resource_as_string(index_resource))
+        except Exception:
+            # No index yet, or it cannot be read, it is rebuilt from all the folders
+            return index
+
+        index["last_folder"] = data.get("last_folder")
+        for doi_id, pub_dates in data.get("published_dates", {}).items():
+            index["published_dates"][int(doi_id)] = pub_dates
+        return index
+
+    def save_published_folder_index(self, index_resource, index):
+        try:
+            storage = StorageContext(self.settings)
+            storage.set_resource_from_string(index_resource, json.dumps(index),
+                                             content_type="application/json")
+        except Exception:
+            # An index which is not saved only means the next run lists more folders
+            pass
+
+    def add_published_dates(self, published_dates, s3_key_names, published_folder):
+        """
+        Add the article ids in the s3_key_names of the published folder to the
+        published_dates, keeping the earliest date of each type (POA or VOR)
+        """
         for s3_key_name in s3_key_names:
+            # Try to get DOI from a POA key name first
             doi_id = self.get_doi_id_from_poa_s3_key_name(s3_key_name)
-            if not doi_id:
-                # Try again as vor name
+            if doi_id is not None:
+                pub_date_type = "poa"
+            else:
                 doi_id = self.get_doi_id_from_vor_s3_key_name(s3_key_name)
+                pub_date_type = "vor"
 
-            if doi_id:
-                ids.append(doi_id)
-
-        # Remove duplicates and sort it
-        ids = list(set(ids))
-        ids.sort()
-
-        return ids
+            if not doi_id:
+                continue
+            pub_dates = published_dates.setdefault(doi_id, {})
+
+            # Parse and save the date from the folder name
+            date_string = self.get_date_string_from_s3_key_name(
+                s3_key_name, published_folder)
+            try:
+                time.strptime(date_string, "%Y%m%d")
+            except (TypeError, ValueError):
+                continue
+
+            current_date_string = pub_dates.get(pub_date_type)
+            if current_date_string is None or date_string < current_date_string:
+                # No date yet or it is previous to the current date, use this date
+                pub_dates[pub_date_type] = date_string
 
     def get_folder_names_from_bucket(self, bucket_name, prefix):
         """
@@ -528,8 +571,7 @@ class article(object):
         """
         folder_names = None
         # Connect to S3 and bucket
-        s3_conn = S3Connection(self.settings.aws_access_key_id,
-                               self.settings.aws_secret_access_key)
+        s3_conn = connections.s3_connection(self.settings)
         bucket = s3_conn.lookup(bucket_name)
 
         # Step one, get all the subfolder names
@@ -548,8 +590,7 @@ class article(object):
         """
         s3_key_names = None
         # Connect to S3 and bucket
-        s3_conn = S3Connection(self.settings.aws_access_key_id,
-                               self.settings.aws_secret_access_key)
+        s3_conn = connections.s3_connection(self.settings)
         bucket = s3_conn.lookup(bucket_name)
 
         s3_key_names = s3lib.get_s3_key_names_from_bucket(
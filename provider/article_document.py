@@ -0,0 +1,274 @@
+import os
+import json
+import hashlib
+import calendar
+import tempfile
+from xml.dom import minidom
+from lxml import etree
+from elifetools import xmlio
+from elifetools import utils as etoolsutils
+
+"""
+ArticleDocument parses article JATS XML once, with lxml, for the values the
+activities read from it, and to rewrite its file names and output it again.
+The values are saved in a cache folder named by the hash of the XML, so the
+XML of an article which was read before is not parsed again to get them
+"""
+
+XLINK_HREF = '{http://www.w3.org/1999/xlink}href'
+# tags whose xlink:href can name an article file, as in xmlio.convert_xlink_href
+XLINK_HREF_TAGS = ['graphic', 'media', 'inline-graphic', 'self-uri', 'ext-link']
+CACHE_DIR = os.path.join(tempfile.gettempdir(), 'article_document_cache')
+# change when the cached values change, so older cache files are not read
+CACHE_VERSION = 2
+
+
+def get_cache_dir(settings):
+    "the cache folder named by the settings, or else CACHE_DIR"
+    if hasattr(settings, 'article_document_cache_dir'):
+        return settings.article_document_cache_dir
+    return CACHE_DIR
+
+
+def load(xml_file, cache_dir=CACHE_DIR):
+    "ArticleDocument of an XML file"
+    with open(xml_file, 'rb') as open_file:
+        return ArticleDocument(open_file.read(), cache_dir)
+
+
+def node_text(tag):
+    "text of a tag including the text of its child tags, or None"
+    if tag is None:
+        return None
+    return u''.join(tag.itertext())
+
+
+def first(tags):
+    return tags[0] if tags else None
+
+
+class ArticleDocument(object):
+
+    def __init__(self, xml, cache_dir=CACHE_DIR):
+        self.xml = xml
+        self.cache_dir = cache_dir
+        self._root = None
+        self._doctype_dict = None
+        self._fields = None
+
+    @property
+    def root(self):
+        "root element of the XML, parsed the first time it is used"
+        if self._root is None:
+            # comments and processing instructions are dropped as they are by xmlio.parse
+            parser = etree.XMLParser(remove_comments=True, remove_pis=True,
+                                     resolve_entities=False, load_dtd=False,
+                                     no_network=True, huge_tree=True)
+            root = etree.fromstring(self.xml, parser)
+            docinfo = root.getroottree().docinfo
+            self._doctype_dict = {
+                'name': docinfo.root_name if docinfo.doctype else None,
+                'pubid': docinfo.public_id,
+                'system': docinfo.system_url
+            }
+            self._root = root
+        return self._root
+
+    @property
+    def doctype_dict(self):
+        self.root
+        return self._doctype_dict
+
+    def convert_xlink_href(self, name_map):
+        """
+        Rename the files in the xlink:href of the tags in XLINK_HREF_TAGS,
+        from the keys to the values of name_map, returning how many were changed
+        """
+        count = 0
+        for tag in self.root.iter(*XLINK_HREF_TAGS):
+            href = tag.get(XLINK_HREF)
+            if not href:
+                continue
+            for old_name, new_name in name_map.iteritems():
+                # Try to match the exact name first, and if not then
+                #  try to match it without the file extension
+                if href == old_name:
+                    tag.set(XLINK_HREF, new_name)
+                    count += 1
+                elif href == old_name.split('.')[0]:
+                    tag.set(XLINK_HREF, new_name.split('.')[0])
+                    count += 1
+        if count:
+            self.xml = None
+            self._fields = None
+        return count
+
+    def to_xml(self):
+        "the XML, output in the format of xmlio.output once it is changed"
+        if self.xml is None:
+            # only the namespaces in use are declared, as ElementTree outputs them
+            etree.cleanup_namespaces(self.root)
+            reparsed = minidom.parseString(etree.tostring(self.root, encoding='UTF-8'))
+            if self.doctype_dict.get('name'):
+                doctype = xmlio.build_doctype(
+                    self.doctype_dict.get('name'), self.doctype_dict.get('pubid'),
+                    self.doctype_dict.get('system'))
+                reparsed.insertBefore(doctype, reparsed.documentElement)
+            self.xml = reparsed.toxml(encoding='UTF-8')
+        return self.xml
+
+    def write(self, xml_file):
+        with open(xml_file, 'wb') as open_file:
+            open_file.write(self.to_xml())
+
+    @property
+    def content_hash(self):
+        return hashlib.sha1(self.to_xml()).hexdigest()
+
+    def cache_file(self):
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, '%s-v%s.json' % (self.content_hash, CACHE_VERSION))
+
+    @property
+    def fields(self):
+        "values read from the XML, from the cache file when there is one"
+        if self._fields is None:
+            cache_file = self.cache_file()
+            if cache_file and os.path.exists(cache_file):
+                try:
+                    with open(cache_file, 'rb') as open_file:
+                        self._fields = json.load(open_file)
+                except ValueError:
+                    self._fields = None
+            if self._fields is None:
+                self._fields = self.parse_fields()
+                if cache_file:
+                    self.save_fields(cache_file, self._fields)
+        return self._fields
+
+    def save_fields(self, cache_file, fields):
+        "write the cache file under a temporary name so it is never read half written"
+        if not os.path.isdir(self.cache_dir):
+            try:
+                os.makedirs(self.cache_dir)
+            except OSError:
+                if not os.path.isdir(self.cache_dir):
+                    raise
+        handle, temp_name = tempfile.mkstemp(dir=self.cache_dir)
+        with os.fdopen(handle, 'wb') as open_file:
+            json.dump(fields, open_file)
+        os.rename(temp_name, cache_file)
+
+    def parse_fields(self):
+        article_meta = first(self.root.findall('.//article-meta'))
+        if article_meta is None:
+            article_meta = etree.Element('article-meta')
+        return {
+            'doi': self.parse_doi(article_meta),
+            'volume': node_text(first(article_meta.findall('.//volume'))),
+            'article_type': self.root.get('article-type'),
+            'title': node_text(first(article_meta.findall('title-group/article-title'))),
+            'collection_year': self.parse_collection_year(article_meta),
+            'pub_date': self.parse_pub_date(article_meta),
+            'authors': self.parse_authors(article_meta),
+            'related_articles': self.parse_related_articles(article_meta),
+            'xlink_hrefs': [tag.get(XLINK_HREF) for tag in self.root.iter(*XLINK_HREF_TAGS)
+                            if tag.get(XLINK_HREF)]
+        }
+
+    def parse_doi(self, article_meta):
+        tag = first(article_meta.findall('article-id[@pub-id-type="doi"]'))
+        return etoolsutils.doi_uri_to_doi(node_text(tag))
+
+    def parse_collection_year(self, article_meta):
+        pub_date = first(article_meta.findall('.//pub-date[@pub-type="collection"]'))
+        if pub_date is None:
+            return None
+        year = node_text(first(pub_date.findall('.//year')))
+        return int(year) if year else None
+
+    def parse_pub_date(self, article_meta):
+        "year, month and day of the pub-date of date-type pub, or else publication"
+        for date_type in ['pub', 'publication']:
+            pub_date = first(article_meta.findall('.//pub-date[@date-type="%s"]' % date_type))
+            if pub_date is not None:
+                return [node_text(first(pub_date.findall('.//' + name)))
+                        for name in ['year', 'month', 'day']]
+        return None
+
+    def parse_authors(self, article_meta):
+        "authors of the article, with the keys parseJATS uses for their names"
+        authors = []
+        for contrib in article_meta.findall('.//contrib[@contrib-type="author"]'):
+            author = {}
+            for key, path in [('surname', 'name/surname'),
+                              ('given-names', 'name/given-names'),
+                              ('suffix', 'name/suffix'),
+                              ('collab', 'collab')]:
+                value = node_text(first(contrib.findall(path)))
+                if value is not None:
+                    author[key] = value
+            if contrib.get('corresp') == 'yes':
+                author['corresponding'] = True
+            if author:
+                authors.append(author)
+        return authors
+
+    def parse_related_articles(self, article_meta):
+        return [{'ext_link_type': tag.get('ext-link-type'),
+                 'related_article_type': tag.get('related-article-type'),
+                 'xlink_href': tag.get(XLINK_HREF)}
+                for tag in article_meta.findall('related-article')]
+
+    @property
+    def doi(self):
+        return self.fields['doi']
+
+    @property
+    def doi_id(self):
+        "the manuscript id at the end of the doi"
+        if self.doi:
+            return self.doi.split('.')[-1]
+
+    @property
+    def volume(self):
+        return self.fields['volume']
+
+    @property
+    def article_type(self):
+        return self.fields['article_type']
+
+    @property
+    def title(self):
+        return self.fields['title']
+
+    @property
+    def is_poa(self):
+        "POA XML has no collection pub-date year"
+        return self.fields['collection_year'] is None
+
+    @property
+    def pub_date(self):
+        "the pub date as a time.struct_time, in UTC, or None"
+        if not self.fields['pub_date']:
+            return None
+        year, month, day = self.fields['pub_date']
+        return etoolsutils.date_struct(year, month, day)
+
+    @property
+    def pub_date_timestamp(self):
+        if self.pub_date is not None:
+            return calendar.timegm(self.pub_date)
+
+    @property
+    def authors(self):
+        return self.fields['authors']
+
+    @property
+    def related_articles(self):
+        return self.fields['related_articles']
+
+    @property
+    def xlink_hrefs(self):
+        return self.fields['xlink_hrefs']
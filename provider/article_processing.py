@@ -1,14 +1,29 @@
 import os
+import re
 import shutil
+import struct
+import zipfile
+from fnmatch import fnmatch
 import dateutil.parser
-from elifetools import xmlio
 from provider import utils
+from provider import article_document
 
 """
 Functions for processing article zip and XML for reuse by different activities
 Originally refactoring them from the PMCDeposit activity for reuse into FTPArticle
 """
 
+# archive zip names, e.g. elife-16747-vor-v1-20160831000000.zip, as journal, doi_id, status, version
+ARCHIVE_ZIP_NAME_PATTERN = r'^(.+?)-(\d+)-([^-]+)-v([^-]*)'
+# bytes of compressed member data read at a time when copying between zips
+ZIP_COPY_CHUNK_SIZE = 1024 * 1024
+# general purpose flag bit of a member whose sizes follow its data
+ZIP_DATA_DESCRIPTOR_FLAG = 0x08
+# fields of a local file header unpacked with zipfile.structFileHeader, by the zip format
+FILE_HEADER_SIGNATURE = 0
+FILE_HEADER_FILENAME_LENGTH = 10
+FILE_HEADER_EXTRA_FIELD_LENGTH = 11
+
 def list_dir(dir_name):
     dir_list = os.listdir(dir_name)
     dir_list = map(lambda item: dir_name + os.sep + item, dir_list)
@@ -25,13 +40,24 @@ def rename_files_remove_version_number(files_dir, output_dir, logger=None):
     Pre-PPP files will not have a version number, for before PPP is launched
     """
 
-    file_name_map = {}
-
     # Get a list of all files
     dirfiles = file_list(files_dir)
 
-    for df in dirfiles:
-        filename = df.split(os.sep)[-1]
+    file_name_map = file_name_map_remove_version_number(
+        [df.split(os.sep)[-1] for df in dirfiles], logger)
+
+    for old_name, new_name in file_name_map.iteritems():
+        if new_name is not None:
+            shutil.move(files_dir + os.sep + old_name, output_dir + os.sep + new_name)
+
+    return file_name_map
+
+
+def file_name_map_remove_version_number(filenames, logger=None):
+    "map of each file name to its name without the version number"
+    file_name_map = {}
+
+    for filename in filenames:
 
         # Get the new file name
         file_name_map[filename] = None
@@ -53,30 +79,124 @@ def rename_files_remove_version_number(files_dir, output_dir, logger=None):
             if logger:
                 logger.info('there is no renamed file for ' + filename)
 
-    for old_name, new_name in file_name_map.iteritems():
-        if new_name is not None:
-            shutil.move(files_dir + os.sep + old_name, output_dir + os.sep + new_name)
-
     return file_name_map
 
 
-def convert_xml(xml_file, file_name_map):
+def zip_member_names(zip_file_name):
+    """
+    names of the files at the top of a zip, the files which were read after
+    extracting it, leaving out its folders and the files inside them
+    """
+    with zipfile.ZipFile(zip_file_name, 'r') as open_zip:
+        return [name for name in open_zip.namelist() if '/' not in name]
+
 
-    # Register namespaces
-    xmlio.register_xmlns()
+def filter_member_names(names, patterns):
+    "the names matching one of the fnmatch patterns, for example *.pdf"
+    return [name for name in names if any(fnmatch(name, pattern) for pattern in patterns)]
 
-    root, doctype_dict = xmlio.parse(xml_file, return_doctype_dict=True)
+
+def new_zip(zip_file_name):
+    "open a new zip for writing in the format of the repackaged article zips"
+    return zipfile.ZipFile(zip_file_name, 'w', zipfile.ZIP_DEFLATED, allowZip64=True)
+
+
+def extract_zip_member(zip_file_name, member_name, to_dir, filename=None):
+    "extract one file of a zip into to_dir, named filename if specified, returning its path"
+    file_path = os.path.join(to_dir, filename or member_name.split('/')[-1])
+    with zipfile.ZipFile(zip_file_name, 'r') as open_zip:
+        with open_zip.open(member_name) as source, open(file_path, 'wb') as destination:
+            shutil.copyfileobj(source, destination, ZIP_COPY_CHUNK_SIZE)
+    return file_path
+
+
+def copy_zip_members(zip_file_name, new_zipfile, member_map):
+    """
+    Copy the files of a zip named by the keys of member_map into the open
+    new_zipfile, named by their values, without decompressing them: the
+    compressed data of each file is copied as it is along with its CRC
+    """
+    with zipfile.ZipFile(zip_file_name, 'r') as open_zip:
+        for zinfo in open_zip.infolist():
+            new_name = member_map.get(zinfo.filename)
+            if new_name is not None:
+                copy_zip_member(open_zip, zinfo, new_zipfile, new_name)
+
+
+def copy_zip_member(open_zip, zinfo, new_zipfile, new_name):
+    "copy the compressed data of one zip member into new_zipfile as new_name"
+    if zinfo.flag_bits & 0x01:
+        raise zipfile.BadZipfile("cannot copy encrypted file %s" % zinfo.filename)
+
+    new_zinfo = zipfile.ZipInfo(new_name, zinfo.date_time)
+    new_zinfo.compress_type = zinfo.compress_type
+    new_zinfo.create_system = zinfo.create_system
+    new_zinfo.external_attr = zinfo.external_attr
+    new_zinfo.CRC = zinfo.CRC
+    new_zinfo.compress_size = zinfo.compress_size
+    new_zinfo.file_size = zinfo.file_size
+    # the sizes are known, so they are written in the local header and not after the data
+    new_zinfo.flag_bits = zinfo.flag_bits & ~ZIP_DATA_DESCRIPTOR_FLAG
+
+    write_compressed_member(new_zipfile, new_zinfo, read_compressed_member(open_zip, zinfo))
+
+
+def read_compressed_member(open_zip, zinfo):
+    "the compressed data of a zip member, in chunks"
+    # skip the local header of the member to the start of its data
+    open_zip.fp.seek(zinfo.header_offset)
+    file_header = open_zip.fp.read(zipfile.sizeFileHeader)
+    if len(file_header) != zipfile.sizeFileHeader:
+        raise zipfile.BadZipfile("truncated file header of %s" % zinfo.filename)
+    file_header = struct.unpack(zipfile.structFileHeader, file_header)
+    if file_header[FILE_HEADER_SIGNATURE] != zipfile.stringFileHeader:
+        raise zipfile.BadZipfile("bad magic number for file header of %s" % zinfo.filename)
+    open_zip.fp.seek(file_header[FILE_HEADER_FILENAME_LENGTH] +
+                     file_header[FILE_HEADER_EXTRA_FIELD_LENGTH], os.SEEK_CUR)
+
+    remaining = zinfo.compress_size
+    while remaining > 0:
+        data = open_zip.fp.read(min(ZIP_COPY_CHUNK_SIZE, remaining))
+        if not data:
+            raise zipfile.BadZipfile("truncated data of %s" % zinfo.filename)
+        remaining -= len(data)
+        yield data
+
+
+def write_compressed_member(new_zipfile, zinfo, chunks):
+    """
+    Add a member to the open new_zipfile from chunks of its data which are
+    already compressed, with its CRC and sizes set in zinfo
+    """
+    # ZipFile has no public method to add compressed data. These are the steps
+    # of ZipFile.write in Python 2.7, with its private _writecheck and
+    # _didModify, so the member is checked, and listed in the central directory
+    # on close, the same as a written one. Keep them together in this function
+    zip64 = zinfo.file_size > zipfile.ZIP64_LIMIT or zinfo.compress_size > zipfile.ZIP64_LIMIT
+    new_zipfile._writecheck(zinfo)
+    new_zipfile._didModify = True
+    zinfo.header_offset = new_zipfile.fp.tell()
+    new_zipfile.fp.write(zinfo.FileHeader(zip64))
+    for data in chunks:
+        new_zipfile.fp.write(data)
+    new_zipfile.filelist.append(zinfo)
+    new_zipfile.NameToInfo[zinfo.filename] = zinfo
+
+
+def convert_xml(xml_file, file_name_map, document=None, cache_dir=article_document.CACHE_DIR):
+    """
+    Rename the files in the XML and write it to xml_file, returning the
+    ArticleDocument, which is parsed from xml_file unless it is specified
+    """
+    if document is None:
+        document = article_document.load(xml_file, cache_dir)
 
     # Convert xlink href values
-    total = xmlio.convert_xlink_href(root, file_name_map)
+    total = document.convert_xlink_href(file_name_map)
     # TODO - compare whether all file names were converted
 
-    # Start the file output
-    reparsed_string = xmlio.output(root, type=None, doctype_dict=doctype_dict)
-
-    f = open(xml_file, 'wb')
-    f.write(reparsed_string)
-    f.close()
+    document.write(xml_file)
+    return document
 
 
 def verify_rename_files(file_name_map):
@@ -125,9 +245,7 @@ def latest_archive_zip_revision(doi_id, s3_keys, journal, status):
             try:
                 parts = key["name"].split(name_prefix_to_match)
                 version = parts[1].split('-')[0]
-                date_formatted = dateutil.parser.parse(key["last_modified"])
-                date_part = date_formatted.strftime(utils.S3_DATE_FORMAT)
-                version_and_date = int(version + date_part)
+                version_and_date = archive_zip_version_and_date(version, key["last_modified"])
             except:
                 pass
             if version_and_date and version_and_date > highest:
@@ -137,5 +255,39 @@ def latest_archive_zip_revision(doi_id, s3_keys, journal, status):
     return s3_key_name
 
 
+def archive_zip_version_and_date(version, last_modified):
+    "sortable integer of the version and the last modified date of an archive zip"
+    date_formatted = dateutil.parser.parse(last_modified)
+    date_part = date_formatted.strftime(utils.S3_DATE_FORMAT)
+    return int(version + date_part)
+
+
+def archive_zip_index(s3_keys):
+    """
+    Index a listing of the archive bucket by (journal, padded doi_id, status),
+    keeping the (version_and_date, name) of the most recent zip for each,
+    so the latest revision of many articles is found with one bucket listing
+    """
+    index = {}
+    for key in s3_keys:
+        match = re.match(ARCHIVE_ZIP_NAME_PATTERN, key["name"])
+        if not match:
+            continue
+        journal, doi_id, status, version = match.groups()
+        try:
+            version_and_date = archive_zip_version_and_date(version, key["last_modified"])
+        except:
+            continue
+        index_key = (journal, doi_id, status)
+        if version_and_date and version_and_date > index.get(index_key, (0, None))[0]:
+            index[index_key] = (version_and_date, key["name"])
+    return index
+
+
+def latest_archive_zip_revision_from_index(doi_id, index, journal, status):
+    "the name of the most recent article zip in an archive_zip_index"
+    return index.get((journal, utils.pad_msid(doi_id), status), (0, None))[1]
+
+
 if __name__ == '__main__':
     main()
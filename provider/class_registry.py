@@ -0,0 +1,104 @@
+import os
+import time
+import pkgutil
+import importlib
+import threading
+
+"""
+Resolves the activity and workflow classes run by the worker and decider by
+name. Each module is imported once, then only reloaded when its source file
+changes, or after request_reload, for example on a SIGHUP
+"""
+
+
+def source_mtime(module):
+    "modification time of the source file of a module, or None"
+    file_name = getattr(module, '__file__', None)
+    if not file_name:
+        return None
+    if file_name.endswith(('.pyc', '.pyo')):
+        file_name = file_name[:-1]
+    try:
+        return os.path.getmtime(file_name)
+    except OSError:
+        return None
+
+
+def package_class_names(package, prefix):
+    "names of the modules of a package which start with prefix, each named after its class"
+    return sorted(name for _, name, is_package in pkgutil.iter_modules(package.__path__)
+                  if name.startswith(prefix) and not is_package)
+
+
+def get_class_reload_on_change(settings):
+    "whether to reload a module when its file changes, from the class_reload_on_change setting"
+    if hasattr(settings, 'class_reload_on_change'):
+        return settings.class_reload_on_change
+    return True
+
+
+class ClassRegistry(object):
+
+    def __init__(self, package, reload_on_change=True):
+        self.package = package
+        self.reload_on_change = reload_on_change
+        # class name to a tuple of the class, its module, source mtime and generation
+        self.classes = {}
+        # incremented to reload every module the next time its class is resolved
+        self.generation = 0
+        # held while resolving, so threads sharing the registry do not import or reload at once
+        self.lock = threading.RLock()
+
+    def request_reload(self, *args):
+        """
+        Reload the modules when their classes are next resolved, it only sets a
+        counter so it can be a signal handler
+        """
+        self.generation += 1
+
+    def preload(self, class_names):
+        """
+        Resolve the classes now, for example before forking worker processes so
+        they share the imported modules, returning the names of those resolved
+        """
+        resolved = []
+        for class_name in class_names:
+            try:
+                if self.get_class(class_name) is not None:
+                    resolved.append(class_name)
+            except Exception:
+                # a module which fails to import is left to fail when its task runs
+                pass
+        return resolved
+
+    def get_class(self, class_name):
+        """
+        The class named class_name from the module of the same name in the
+        package, or None when the module cannot be imported
+        """
+        with self.lock:
+            return self.resolve(class_name)
+
+    def get_class_timed(self, class_name):
+        "get_class and the seconds it took, as a tuple"
+        start = time.time()
+        class_object = self.get_class(class_name)
+        return class_object, time.time() - start
+
+    def resolve(self, class_name):
+        cached = self.classes.get(class_name)
+        try:
+            if cached is None:
+                module = importlib.import_module(self.package + '.' + class_name)
+            else:
+                class_object, module, mtime, generation = cached
+                if generation == self.generation and (
+                        not self.reload_on_change or source_mtime(module) == mtime):
+                    return class_object
+                module = reload(module)
+            class_object = getattr(module, class_name)
+        except (ImportError, AttributeError):
+            self.classes.pop(class_name, None)
+            return None
+        self.classes[class_name] = (class_object, module, source_mtime(module), self.generation)
+        return class_object
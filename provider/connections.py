@@ -0,0 +1,116 @@
+import threading
+
+import requests
+import boto.sdb
+import boto.sqs
+import boto.swf.layer1
+from boto.s3.connection import S3Connection
+
+"""
+Process wide registry of AWS connections
+Long running processes (worker.py, decider.py and the queue daemons) call init() once,
+after which activities and providers borrow the same connection for a service, region
+and credentials instead of opening a new one, and its TLS sessions, on every call.
+Until init() is called every request returns a new connection, as before.
+The requests sessions of get_requests_session are always shared in the process.
+"""
+
+_registry = None
+_sessions = {}
+_lock = threading.Lock()
+
+
+def init():
+    "share connections between callers in this process"
+    global _registry
+    with _lock:
+        if _registry is None:
+            _registry = {}
+
+
+def reset():
+    """
+    Forget the shared connections and sessions, for example in a forked child
+    process which must not reuse the sockets of its parent
+    """
+    global _registry
+    with _lock:
+        if _registry is not None:
+            _registry = {}
+        _sessions.clear()
+
+
+def is_shared():
+    return _registry is not None
+
+
+def get_connection(service, region, aws_access_key_id, aws_secret_access_key, connect):
+    """
+    Return the registered connection for the service, region and credentials,
+    calling connect() to create it the first time
+    """
+    if _registry is None:
+        return connect()
+    registry_key = (service, region, aws_access_key_id, aws_secret_access_key)
+    with _lock:
+        if registry_key not in _registry:
+            _registry[registry_key] = connect()
+        return _registry[registry_key]
+
+
+def get_requests_session(name, pool_maxsize):
+    """
+    The requests session of this process named name, for example after the
+    service it calls, keeping up to pool_maxsize connections open to each host
+    so that many threads can share it
+    """
+    with _lock:
+        if name not in _sessions:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=pool_maxsize)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _sessions[name] = session
+        return _sessions[name]
+
+
+def s3_connection(settings, host=None):
+    def connect():
+        if host is not None:
+            return S3Connection(settings.aws_access_key_id, settings.aws_secret_access_key,
+                                host=host)
+        return S3Connection(settings.aws_access_key_id, settings.aws_secret_access_key)
+    return get_connection("s3", host, settings.aws_access_key_id,
+                          settings.aws_secret_access_key, connect)
+
+
+def sqs_connection(settings, region=None):
+    if region is None:
+        region = settings.sqs_region
+
+    def connect():
+        return boto.sqs.connect_to_region(region,
+                                          aws_access_key_id=settings.aws_access_key_id,
+                                          aws_secret_access_key=settings.aws_secret_access_key)
+    return get_connection("sqs", region, settings.aws_access_key_id,
+                          settings.aws_secret_access_key, connect)
+
+
+def sdb_connection(settings, region=None):
+    if region is None:
+        region = settings.simpledb_region or "us-east-1"
+
+    def connect():
+        return boto.sdb.connect_to_region(region,
+                                          aws_access_key_id=settings.aws_access_key_id,
+                                          aws_secret_access_key=settings.aws_secret_access_key)
+    return get_connection("sdb", region, settings.aws_access_key_id,
+                          settings.aws_secret_access_key, connect)
+
+
+def swf_connection(settings):
+    def connect():
+        return boto.swf.layer1.Layer1(settings.aws_access_key_id,
+                                      settings.aws_secret_access_key)
+    return get_connection("swf", None, settings.aws_access_key_id,
+                          settings.aws_secret_access_key, connect)
@@ -0,0 +1,252 @@
+from ftplib import FTP
+from multiprocessing.pool import ThreadPool
+import ftplib
+import os
+import posixpath
+import socket
+import threading
+
+"""
+FTP transfers which keep the logged in sessions to an endpoint open for the life
+of the worker process, remember which remote directories exist, and upload
+several files at once, resuming a file from where it stopped when a transfer fails
+"""
+
+# bytes read from a local file per send
+FTP_BLOCKSIZE = 1024 * 1024
+# sessions opened to one endpoint, and so files uploaded to it at once
+FTP_SESSIONS = 3
+FTP_TIMEOUT = 120
+TRANSFER_ATTEMPTS = 3
+TEXT_EXTENSIONS = (".txt", ".htm", ".html")
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_session_manager(uri, username, password, passive=True, logger=None):
+    "the FTPSessionManager of this process for the endpoint and login"
+    manager_key = (uri, username, password, passive)
+    with _managers_lock:
+        if manager_key not in _managers:
+            _managers[manager_key] = FTPSessionManager(uri, username, password, passive)
+        manager = _managers[manager_key]
+    if logger is not None:
+        manager.logger = logger
+    return manager
+
+
+def remote_dir(ftp_cwd, sub_dir_list=None):
+    "absolute path of the sub_dir_list folders below ftp_cwd"
+    return posixpath.join("/", ftp_cwd or "", *(sub_dir_list or []))
+
+
+def reset():
+    """
+    Forget the session managers without closing their sessions, for example in
+    a forked child process which must not use the sockets of its parent
+    """
+    with _managers_lock:
+        _managers.clear()
+
+
+class FTPSessionManager(object):
+
+    def __init__(self, uri, username, password, passive=True, sessions=FTP_SESSIONS,
+                 blocksize=FTP_BLOCKSIZE, logger=None):
+        self.uri = uri
+        self.username = username
+        self.password = password
+        self.passive = passive
+        self.sessions = sessions
+        self.blocksize = blocksize
+        self.logger = logger
+        self.idle = []
+        # remote directories known to exist
+        self.directories = set(["/"])
+        self.lock = threading.Lock()
+
+    def connect(self):
+        ftp = FTP(timeout=FTP_TIMEOUT)
+        if self.passive is False:
+            ftp.set_pasv(False)
+        ftp.connect(self.uri)
+        ftp.login(self.username, self.password)
+        return ftp
+
+    def get_session(self):
+        "an idle session which is still logged in, or a new one"
+        while True:
+            with self.lock:
+                if not self.idle:
+                    break
+                ftp = self.idle.pop()
+            try:
+                ftp.voidcmd("NOOP")
+                return ftp
+            except (ftplib.Error, socket.error, EOFError):
+                self.discard_session(ftp)
+        return self.connect()
+
+    def release_session(self, ftp):
+        with self.lock:
+            self.idle.append(ftp)
+
+    def discard_session(self, ftp):
+        try:
+            ftp.close()
+        except (ftplib.Error, socket.error, EOFError):
+            pass
+
+    def close(self):
+        "log out of the idle sessions"
+        with self.lock:
+            idle = self.idle
+            self.idle = []
+        for ftp in idle:
+            try:
+                ftp.quit()
+            except (ftplib.Error, socket.error, EOFError):
+                self.discard_session(ftp)
+
+    def ensure_directory(self, ftp, remote_dir):
+        "create remote_dir and its parents unless they are known to exist"
+        path = "/"
+        for part in remote_dir.strip("/").split("/"):
+            if not part:
+                continue
+            path = posixpath.join(path, part)
+            with self.lock:
+                if path in self.directories:
+                    continue
+            try:
+                ftp.cwd(path)
+            except ftplib.error_perm:
+                # Directory probably does not exist, create it
+                ftp.mkd(path)
+            with self.lock:
+                self.directories.add(path)
+
+    def forget_directory(self, remote_dir):
+        "forget that remote_dir and its parents exist, for example after they were removed"
+        path = remote_dir.rstrip("/")
+        with self.lock:
+            while path:
+                self.directories.discard(path)
+                path = posixpath.dirname(path).rstrip("/")
+
+    def upload_files(self, uploadfiles, remote_dir):
+        "upload the files to remote_dir, several at a time"
+        if not uploadfiles:
+            return
+        ftp = self.get_session()
+        try:
+            self.ensure_directory(ftp, remote_dir)
+        except:
+            self.discard_session(ftp)
+            raise
+        self.release_session(ftp)
+
+        pool = ThreadPool(min(self.sessions, len(uploadfiles)))
+        try:
+            pool.map(lambda uploadfile: self.upload(uploadfile, remote_dir), uploadfiles)
+        finally:
+            pool.close()
+            pool.join()
+
+    def upload(self, uploadfile, remote_dir):
+        """
+        Upload a file to remote_dir on a session of the pool. When the transfer
+        fails the file is sent again on another session, appending what the
+        server did not receive only when the size of the remote file is what this
+        upload sent, so a file left by an earlier delivery is replaced. When the
+        server refuses the file, remote_dir is created again in case it was
+        removed since it was found, and the file sent once more
+        """
+        remote_file = posixpath.join(remote_dir, uploadfile.split(os.sep)[-1])
+        attempt = 1
+        # bytes of the file this upload has sent, from its start
+        sent = [0]
+        directory_checked = False
+        while True:
+            ftp = None
+            try:
+                ftp = self.get_session()
+                offset = self.resume_offset(ftp, remote_file, sent[0])
+                sent[0] = offset
+
+                def count_sent(block):
+                    sent[0] += len(block)
+                self.send(ftp, uploadfile, remote_file, offset, count_sent)
+            except (ftplib.error_temp, ftplib.error_reply, socket.error, EOFError) as exception:
+                if ftp is not None:
+                    self.discard_session(ftp)
+                if attempt >= TRANSFER_ATTEMPTS:
+                    raise
+                if self.logger:
+                    self.logger.info("retrying FTP upload of %s to %s after %s" %
+                                     (uploadfile, remote_file, exception))
+                attempt += 1
+                continue
+            except ftplib.error_perm as exception:
+                if ftp is None or directory_checked or attempt >= TRANSFER_ATTEMPTS:
+                    if ftp is not None:
+                        self.discard_session(ftp)
+                    raise
+                if self.logger:
+                    self.logger.info("checking %s exists again after FTP upload of %s failed: %s" %
+                                     (remote_dir, uploadfile, exception))
+                attempt += 1
+                directory_checked = True
+                self.forget_directory(remote_dir)
+                try:
+                    self.ensure_directory(ftp, remote_dir)
+                except:
+                    self.discard_session(ftp)
+                    raise
+                self.release_session(ftp)
+                continue
+            except:
+                if ftp is not None:
+                    self.discard_session(ftp)
+                raise
+            self.release_session(ftp)
+            return
+
+    def resume_offset(self, ftp, remote_file, sent):
+        """
+        where to send the file from: sent, when this upload sent some of it and
+        the remote file is that size, or else 0 to send all of it again
+        """
+        if sent > 0 and self.remote_size(ftp, remote_file) == sent:
+            return sent
+        return 0
+
+    def remote_size(self, ftp, remote_file):
+        "size of the remote file, or 0 when the server does not report it"
+        try:
+            ftp.voidcmd("TYPE I")
+            return ftp.size(remote_file) or 0
+        except ftplib.Error:
+            return 0
+
+    def send(self, ftp, uploadfile, remote_file, offset=0, callback=None):
+        """
+        send the file from offset, a position the caller knows the remote file
+        reached, calling callback with each block of a binary file sent
+        """
+        if os.path.splitext(uploadfile)[1] in TEXT_EXTENSIONS:
+            # text files are always sent whole
+            with open(uploadfile) as open_file:
+                ftp.storlines("STOR " + remote_file, open_file)
+            return
+        size = os.path.getsize(uploadfile)
+        if offset == size and size > 0:
+            # all of the file was sent and arrived, only the reply to the transfer was lost
+            return
+        with open(uploadfile, "rb") as open_file:
+            if 0 < offset < size:
+                open_file.seek(offset)
+                ftp.storbinary("APPE " + remote_file, open_file, self.blocksize, callback)
+            else:
+                ftp.storbinary("STOR " + remote_file, open_file, self.blocksize, callback)
@@ -2,6 +2,10 @@ import sys, json
 import requests
 import re
 from functional import seq
+from provider import connections
+
+# connections kept open to the Glencoe CDN for fetching files concurrently
+GLENCOE_POOL_SIZE = 8
 
 '''
 glencoe_resp = {
@@ -64,6 +68,11 @@ def metadata(msid, settings):
     return resp.json()
 
 
+def get_session():
+    "requests session shared by the Glencoe file fetches of this process"
+    return connections.get_requests_session('glencoe', GLENCOE_POOL_SIZE)
+
+
 def jpg_href_values(metadata):
 
     return list((seq(metadata.items())
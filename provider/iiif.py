@@ -1,26 +1,82 @@
-import requests
+import time
+from multiprocessing.pool import ThreadPool
+from provider import connections
+
+# endpoints checked at the same time, at most, as the shared session keeps
+# this many connections open to the image server
+IIIF_THREADS = 8
+# a 404 or 504 while the image server prepares an image is retried, waiting
+# RETRY_DELAY seconds then doubling the wait, at most RETRY_ATTEMPTS times
+# and not after RETRY_DEADLINE seconds from the first request
+RETRY_ATTEMPTS = 8
+RETRY_DELAY = 0.5
+RETRY_MAX_DELAY = 10
+RETRY_DEADLINE = 60
+# seconds a request waits for a response at least, even once the deadline is near
+MIN_REQUEST_TIMEOUT = 1
+
+
+def get_session():
+    "requests session shared by the IIIF checks of this process"
+    return connections.get_requests_session('iiif', IIIF_THREADS)
 
-class ShortRetryException(RuntimeError):
-    pass
 
 def endpoint(settings, iiif_path_for_article, figure):
     iiif_path_for_figure = iiif_path_for_article.replace('{article_fig}', figure)
     return settings.path_to_iiif_server + iiif_path_for_figure
 
-def try_endpoint(endpoint, logger):
+
+def try_endpoint(endpoint, logger, attempts=RETRY_ATTEMPTS, deadline=RETRY_DEADLINE):
+    report = check_endpoint(endpoint, logger, attempts, deadline)
+    return report['success'], endpoint
+
+
+def check_endpoint(endpoint, logger, attempts=RETRY_ATTEMPTS, deadline=RETRY_DEADLINE):
+    """
+    HEAD request the endpoint, retrying 404 and 504 responses with exponential
+    backoff, each request timing out when the deadline is reached, and return
+    a report dict of endpoint, success, status_code, attempts and seconds taken
+    """
+    start = time.time()
+    report = {'endpoint': endpoint, 'success': False, 'status_code': None, 'attempts': 0}
+    delay = RETRY_DELAY
     try:
-        response = requests.head(endpoint)
-        if response.status_code == 504:
-            raise ShortRetryException("Response code was %s" % response.status_code)
-        if response.status_code == 404:
-            raise ShortRetryException("Response code was %s" % response.status_code)
-        if response.status_code != 200:
-            logger.error("Error status code != 200. Status code: %s for URL %s\nContent:\n%s", response.status_code, endpoint, response.content)
-            return False, endpoint
-        return True, endpoint
-    except ShortRetryException as e:
-        logger.info('short retry because %s', e)
-        return try_endpoint(endpoint, logger)
+        while True:
+            report['attempts'] += 1
+            timeout = max(deadline - (time.time() - start), MIN_REQUEST_TIMEOUT)
+            response = get_session().head(endpoint, timeout=timeout)
+            report['status_code'] = response.status_code
+            if response.status_code == 200:
+                report['success'] = True
+                break
+            # Loris exposes 404 on images it cannot retrieve yet, even if the original error is a 500
+            if response.status_code not in (404, 504):
+                logger.error("Error status code != 200. Status code: %s for URL %s\nContent:\n%s",
+                             response.status_code, endpoint, response.content)
+                break
+            elapsed = time.time() - start
+            if report['attempts'] >= attempts or elapsed + delay > deadline:
+                logger.error("Giving up on %s after %s attempts in %.1f seconds, response code was %s",
+                             endpoint, report['attempts'], elapsed, response.status_code)
+                break
+            logger.info('short retry because Response code was %s', response.status_code)
+            time.sleep(delay)
+            delay = min(delay * 2, RETRY_MAX_DELAY)
     except Exception as e:
         logger.exception(str(e))
-        return False, endpoint
+    report['seconds'] = time.time() - start
+    return report
+
+
+def check_endpoints(endpoints, logger, threads=IIIF_THREADS, attempts=RETRY_ATTEMPTS,
+                    deadline=RETRY_DEADLINE):
+    "check_endpoint each of the endpoints concurrently, returning their reports in order"
+    if not endpoints:
+        return []
+    pool = ThreadPool(min(threads, len(endpoints)))
+    try:
+        return pool.map(lambda endpoint: check_endpoint(endpoint, logger, attempts, deadline),
+                        endpoints)
+    finally:
+        pool.close()
+        pool.join()
@@ -5,19 +5,15 @@ from mimetypes import guess_type
 
 def generate_images(settings, formats, fp, info, publish_locations, logger):
         try:
-            for format_spec_name in formats:
-                format_spec = formats[format_spec_name]
-                # if sources not present or includes file extension for this image
-                if 'sources' not in format_spec or info.extension in [
-                        x.strip() for x in format_spec['sources'].split(',')]:
-                    download = 'download' in format_spec and format_spec['download']
-                    fp.seek(0)  # rewind the tape
-                    filename, image = resizer.resize(format_spec, fp, info, logger)
-                    if filename is not None and image is not None:
-                        store_in_publish_locations(settings, filename, image, publish_locations, download)
-                        logger.info("Stored image %s as %s" % (filename, str(publish_locations)))
-                    else:
-                        raise RuntimeError("filename or image is None. resizer.resize problem.")
+            # the image is decoded once and each rendition stored as soon as it is encoded
+            renditions = resizer.resize_all(resizer.source_formats(formats, info), fp, info, logger)
+            for format_spec, filename, image in renditions:
+                download = 'download' in format_spec and format_spec['download']
+                if filename is not None and image is not None:
+                    store_in_publish_locations(settings, filename, image, publish_locations, download)
+                    logger.info("Stored image %s as %s" % (filename, str(publish_locations)))
+                else:
+                    raise RuntimeError("filename or image is None. resizer.resize problem.")
         finally:
             fp.close()
 
@@ -5,44 +5,129 @@ from wand.image import Image
 
 def resize(format, filep, info, logger):
 
-    image_buffer = None
     try:
-
         with Image(file=filep, resolution=96) as tiff:
-            image_format = format.get('format')
-            if image_format is not None:
-                image = tiff.convert(image_format)
-            else:
-                image = tiff
-
-            target_height = format.get('height')
-            target_width = format.get('width')
-
-            target_resolution = format.get('resolution')
-            if target_resolution is not None:
-                image.resolution = (target_resolution, target_resolution)
-
-            if target_height is None and target_width is None:
-                target_height = image.height
-                target_width = image.width
-            elif target_width is None:
-                scale = float(target_height) / image.height
-                target_width = int(image.width * scale)
-            elif target_height is None:
-                scale = float(target_width) / image.width
-                target_height = int(image.height * scale)
-
-            if target_height is not image.height or target_width is not image.width:
-                image.resize(width=target_width, height=target_height)
-
-            image_buffer = StringIO.StringIO()
-            image.save(file=image_buffer)
+            image = render(format, tiff)
+            image_buffer = encode(image)
+            if image is not tiff:
+                image.close()
 
     except Exception as e:
         message = "error resizing image %s" % info.filename
         logger.error(message, exc_info=True)
         raise RuntimeError("%s (%s)" % (message, e.message))
 
+    return rendition_filename(format, info), image_buffer
+
+
+def resize_all(formats, filep, info, logger):
+    """
+    Decode the image in filep once and generate every format from it in memory,
+    largest first, each rendition downscaled from the previous one where it is
+    large enough. Yields (format, filename, image_buffer) as each rendition is
+    encoded so it can be stored before the next one is made
+    """
+    try:
+        with Image(file=filep, resolution=96) as source:
+            previous = None
+            previous_format = None
+            try:
+                for format in by_target_width(formats, source):
+                    target_width, target_height = target_size(format, source)
+                    base = source
+                    if (previous is not None and previous_format == format.get('format')
+                            and previous.width >= target_width
+                            and previous.height >= target_height):
+                        base = previous
+                    image = render(format, base, source)
+                    image_buffer = encode(image)
+                    if image is not source:
+                        if previous is not None and previous is not image:
+                            previous.close()
+                        previous = image
+                        previous_format = format.get('format')
+                    yield format, rendition_filename(format, info), image_buffer
+            finally:
+                if previous is not None:
+                    previous.close()
+
+    except Exception as e:
+        message = "error resizing image %s" % info.filename
+        logger.error(message, exc_info=True)
+        raise RuntimeError("%s (%s)" % (message, e.message))
+
+
+def source_formats(formats, info):
+    "the format specs in formats which apply to the file extension of info"
+    format_specs = []
+    for format_spec_name in formats:
+        format_spec = formats[format_spec_name]
+        # if sources not present or includes file extension for this image
+        if 'sources' not in format_spec or info.extension in [
+                x.strip() for x in format_spec['sources'].split(',')]:
+            format_specs.append(format_spec)
+    return format_specs
+
+
+def by_target_width(formats, source):
+    "order formats by the width of the rendition they produce, largest first"
+    return sorted(formats, key=lambda format: target_size(format, source)[0], reverse=True)
+
+
+def target_size(format, source):
+    """
+    Width and height of the rendition of the format, keeping the aspect ratio
+    of the source image when only one of them is specified
+    """
+    target_height = format.get('height')
+    target_width = format.get('width')
+
+    if target_height is None and target_width is None:
+        target_height = source.height
+        target_width = source.width
+    elif target_width is None:
+        scale = float(target_height) / source.height
+        target_width = int(source.width * scale)
+    elif target_height is None:
+        scale = float(target_width) / source.width
+        target_height = int(source.height * scale)
+    return target_width, target_height
+
+
+def render(format, image, source=None):
+    """
+    Apply the format to an already decoded image, returning a new image
+    if it is converted or resized. source is the originally decoded image
+    when image is a rendition derived from it
+    """
+    if source is None:
+        source = image
+    image_format = format.get('format')
+    target_resolution = format.get('resolution')
+    target_width, target_height = target_size(format, source)
+    needs_resize = target_height != image.height or target_width != image.width
+
+    if image_format is not None:
+        image = image.convert(image_format)
+    elif needs_resize or target_resolution is not None or image is not source:
+        # the decoded source is shared by every rendition, so it is never changed
+        image = image.clone()
+
+    if target_resolution is not None:
+        image.resolution = (target_resolution, target_resolution)
+
+    if needs_resize:
+        image.resize(width=target_width, height=target_height)
+    return image
+
+
+def encode(image):
+    image_buffer = StringIO.StringIO()
+    image.save(file=image_buffer)
+    return image_buffer
+
+
+def rendition_filename(format, info):
     filename = info.filename
     if format.get('prefix') is not None:
         filename = format.get('prefix') + filename
@@ -54,4 +139,4 @@ def resize(format, filep, info, logger):
         filename = filename + "." + format['format']
     else:
         filename += '.tiff'
-    return filename, image_buffer
+    return filename
@@ -1,6 +1,8 @@
-import requests
+import threading
 import time
+from multiprocessing.pool import ThreadPool
 from . import article
+from provider import connections
 import base64
 import json
 from dateutil.parser import parse
@@ -11,13 +13,106 @@ identity = "process_%s" % os.getpid()
 logger = log.logger("lax_provider.log", 'INFO', identity)
 
 
+# seconds a Lax versions response is reused for
+LAX_VERSIONS_CACHE_TTL = 30
+# concurrent Lax requests of article_versions_many
+LAX_THREADS = 8
+
+_versions_cache = {}
+_versions_pending = {}
+_versions_lock = threading.Lock()
+
+
 class ErrorCallingLaxException(Exception):
     pass
 
 
+def get_session():
+    "requests session shared by the Lax lookups of this process"
+    return connections.get_requests_session('lax', LAX_THREADS)
+
+
+def get_versions_cache_ttl(settings):
+    if hasattr(settings, 'lax_versions_cache_ttl'):
+        return settings.lax_versions_cache_ttl
+    return LAX_VERSIONS_CACHE_TTL
+
+
+def invalidate_article_versions(article_id=None):
+    """
+    Forget the cached versions of an article, or of every article if article_id
+    is None, for example after sending the article to Lax to ingest or publish
+    """
+    with _versions_lock:
+        if article_id is None:
+            _versions_cache.clear()
+        else:
+            for cache_key in _versions_cache.keys():
+                if normalise_article_id(cache_key[0]) == normalise_article_id(article_id):
+                    del _versions_cache[cache_key]
+
+
+def normalise_article_id(article_id):
+    "compare article ids with or without zero padding"
+    try:
+        return str(int(article_id))
+    except (TypeError, ValueError):
+        return str(article_id)
+
+
 def article_versions(article_id, settings):
+    """
+    The Lax versions of an article, as (status_code, versions), cached for a
+    short time (lax_versions_cache_ttl seconds) so the helpers below which each
+    need them cost one request. Concurrent lookups of the same article wait for
+    the request already being made instead of making another
+    """
+    cache_key = (str(article_id), settings.lax_article_versions)
+    while True:
+        with _versions_lock:
+            cached = _versions_cache.get(cache_key)
+            if cached is not None and cached[0] > time.time():
+                return cached[1]
+            pending = _versions_pending.get(cache_key)
+            if pending is None:
+                pending = threading.Event()
+                _versions_pending[cache_key] = pending
+                break
+        pending.wait()
+        with _versions_lock:
+            cached = _versions_cache.get(cache_key)
+        if cached is not None:
+            return cached[1]
+        # the request being waited on failed, make one
+
+    try:
+        result = fetch_article_versions(article_id, settings)
+        with _versions_lock:
+            _versions_cache[cache_key] = (time.time() + get_versions_cache_ttl(settings), result)
+        return result
+    finally:
+        with _versions_lock:
+            del _versions_pending[cache_key]
+        pending.set()
+
+
+def article_versions_many(article_ids, settings):
+    """
+    Look up the Lax versions of many articles in parallel, returning a dict of
+    article_id to (status_code, versions) and populating the versions cache
+    """
+    pool = ThreadPool(min(LAX_THREADS, max(len(article_ids), 1)))
+    try:
+        results = pool.map(lambda article_id: article_versions(article_id, settings), article_ids)
+    finally:
+        pool.close()
+        pool.join()
+    return dict(zip(article_ids, results))
+
+
+def fetch_article_versions(article_id, settings):
     url = settings.lax_article_versions.replace('{article_id}', article_id)
-    response = requests.get(url, verify=settings.verify_ssl)
+    response = get_session().get(url, verify=settings.verify_ssl)
     logger.info("Request to lax: GET %s", url)
     logger.info("Response from lax: %s\n%s", response.status_code, response.content)
     status_code = response.status_code
@@ -141,6 +236,8 @@ def published_considering_poa_status(article_id, settings, is_poa, was_ever_poa)
 
 
 def prepare_action_message(settings, article_id, run, expanded_folder, version, status, eif_location, action, force=False):
+        # the versions of the article in Lax are about to change
+        invalidate_article_versions(article_id)
         xml_bucket = settings.publishing_buckets_prefix + settings.expanded_bucket
         xml_file_name = get_xml_file_name(settings, expanded_folder, xml_bucket)
         xml_path = 'https://s3-external-1.amazonaws.com/' + xml_bucket + '/' + expanded_folder + '/' + xml_file_name
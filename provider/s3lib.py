@@ -105,3 +105,20 @@ def latest_pmc_zip_revision(doi_id, s3_key_names):
     return s3_key_name
 
 
+def pmc_zip_index(s3_key_names):
+    """
+    Given a list of zip file names from the PMC zip folder on S3, map each
+    article doi_id to the name of its latest revision, as latest_pmc_zip_revision,
+    so many articles can be looked up from one listing of the folder
+    """
+    names_by_doi_id = {}
+    for key_name in s3_key_names:
+        for doi_id_match in re.findall(r'-(\d{5,})', key_name):
+            names_by_doi_id.setdefault(int(doi_id_match), []).append(key_name)
+
+    index = {}
+    for doi_id, key_names in names_by_doi_id.items():
+        index[doi_id] = latest_pmc_zip_revision(doi_id, key_names)
+    return index
+
+
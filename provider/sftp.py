@@ -1,10 +1,35 @@
 import paramiko
 import os
+import socket
+import threading
 
 """
-
+SFTP uploads. The connected clients and the remote directories known to exist
+are kept for the life of the worker process, so an endpoint is logged in to once
 """
 
+# bytes read from a local file per write
+SFTP_BLOCKSIZE = 1024 * 1024
+TRANSFER_ATTEMPTS = 3
+
+_clients = {}
+# id of each connected client to its key in _clients, to connect it again
+_client_keys = {}
+_directories = {}
+_lock = threading.Lock()
+
+
+def reset():
+    """
+    Forget the connected clients without closing them, for example in a forked
+    child process which must not use the sockets of its parent
+    """
+    with _lock:
+        _clients.clear()
+        _client_keys.clear()
+        _directories.clear()
+
+
 class SFTP(object):
 
     def __init__(self, logger=None):
@@ -13,8 +38,15 @@ class SFTP(object):
 
     def sftp_connect(self, uri, username, password, port=22):
         """
-        Connect to SFTP server without a host key
+        Connect to SFTP server without a host key, reusing the client of an
+        earlier connection to the server while its transport is active
         """
+        client_key = (uri, port, username, password)
+        with _lock:
+            sftp = _clients.get(client_key)
+        if sftp is not None and sftp.get_channel().get_transport().is_active():
+            return sftp
+
         #print "trying to SFTP now"
 
         transport = paramiko.Transport((uri, port))
@@ -29,8 +61,36 @@ class SFTP(object):
             return None
 
         sftp = paramiko.SFTPClient.from_transport(transport)
+        with _lock:
+            inactive = _clients.get(client_key)
+            if inactive is not None:
+                _client_keys.pop(id(inactive), None)
+                _directories.pop(id(inactive), None)
+            _clients[client_key] = sftp
+            _client_keys[id(sftp)] = client_key
+            _directories[id(sftp)] = set()
         return sftp
 
+    def sftp_reconnect(self, sftp_client):
+        """
+        Forget a client whose transfer failed and connect to its server again,
+        returning the new client, or None when it was not connected by sftp_connect
+        or cannot connect again
+        """
+        with _lock:
+            client_key = _client_keys.pop(id(sftp_client), None)
+            _directories.pop(id(sftp_client), None)
+            if client_key is not None and _clients.get(client_key) is sftp_client:
+                del _clients[client_key]
+        if client_key is None:
+            return None
+        try:
+            sftp_client.close()
+        except Exception:
+            pass
+        uri, port, username, password = client_key
+        return self.sftp_connect(uri, username, password, port)
+
     def sftp_to_endpoint(self, sftp_client, uploadfiles, sftp_cwd='', sub_dir=None):
         """
         Given a paramiko SFTP client, upload files to it
@@ -39,10 +99,7 @@ class SFTP(object):
         if sub_dir:
             # Making the sub directory if it does or does not exist
             absolute_sub_dir = sftp_cwd + '/' + sub_dir
-            try:
-                sftp_client.mkdir(absolute_sub_dir)
-            except IOError:
-                pass
+            self.sftp_mkdir(sftp_client, absolute_sub_dir)
 
         for uploadfile in uploadfiles:
             remote_file = uploadfile.split(os.sep)[-1]
@@ -53,4 +110,80 @@ class SFTP(object):
             if self.logger:
                 self.logger.info("putting file by sftp " + uploadfile +
                                  " to remote_file " + remote_file)
-            result = sftp_client.put(uploadfile, remote_file)
+            sftp_client = self.sftp_upload(sftp_client, uploadfile, remote_file)
+
+    def sftp_mkdir(self, sftp_client, remote_dir):
+        "make the remote directory unless this client already made or found it"
+        with _lock:
+            directories = _directories.setdefault(id(sftp_client), set())
+            if remote_dir in directories:
+                return
+        try:
+            sftp_client.mkdir(remote_dir)
+        except IOError:
+            pass
+        with _lock:
+            directories.add(remote_dir)
+
+    def sftp_upload(self, sftp_client, uploadfile, remote_file):
+        """
+        Write the file in SFTP_BLOCKSIZE blocks with pipelined requests. When the
+        transfer fails the client is connected again and the transfer resumed
+        from what this upload wrote, as far as the remote file has it, or else
+        the whole file written again, so a file left by an earlier delivery is
+        replaced. Returns the client, which is a new one after a reconnection
+        """
+        size = os.path.getsize(uploadfile)
+        attempt = 1
+        offset = 0
+        # bytes of the file this upload has written, from its start
+        written = [0]
+
+        def count_written(data):
+            written[0] += len(data)
+        while True:
+            try:
+                written[0] = offset
+                self.sftp_write(sftp_client, uploadfile, remote_file, offset, count_written)
+                remote_size = sftp_client.stat(remote_file).st_size
+                if remote_size != size:
+                    raise IOError("size mismatch in put!  %d != %d" % (remote_size, size))
+                return sftp_client
+            except (IOError, socket.error, paramiko.SSHException) as exception:
+                if attempt >= TRANSFER_ATTEMPTS:
+                    raise
+                if self.logger:
+                    self.logger.info("resuming sftp of %s to %s after %s" %
+                                     (uploadfile, remote_file, exception))
+                attempt += 1
+                # the failed client may be left with a broken channel
+                sftp_client = self.sftp_reconnect(sftp_client) or sftp_client
+                offset = 0
+                if written[0] > 0:
+                    # the remote file was opened by this upload, so it holds what arrived
+                    try:
+                        offset = min(written[0], sftp_client.stat(remote_file).st_size)
+                    except (IOError, socket.error, paramiko.SSHException):
+                        offset = 0
+
+    def sftp_write(self, sftp_client, uploadfile, remote_file, offset=0, callback=None):
+        """
+        write the file from offset, a position the caller knows the remote file
+        reached, calling callback with each block before it is written
+        """
+        with open(uploadfile, 'rb') as local_file:
+            if offset > 0:
+                local_file.seek(offset)
+                remote = sftp_client.open(remote_file, 'r+b')
+                remote.seek(offset)
+            else:
+                remote = sftp_client.open(remote_file, 'wb')
+            with remote:
+                remote.set_pipelined(True)
+                while True:
+                    data = local_file.read(SFTP_BLOCKSIZE)
+                    if not data:
+                        break
+                    if callback is not None:
+                        callback(data)
+                    remote.write(data)
@@ -6,12 +6,19 @@ import boto.sdb
 
 import boto.s3
 from boto.s3.connection import S3Connection
+import provider.connections as connections
 
 """
 SimpleDB S3 data provider
 A home for SimpleDB functions so code is not duplicated
 """
 
+# SimpleDB accepts at most 25 items in a batch_put_attributes call
+BATCH_PUT_SIZE = 25
+# values compared in one SimpleDB select in() expression
+SELECT_IN_SIZE = 20
+
+
 class SimpleDB(object):
 
     def __init__(self, settings):
@@ -67,6 +74,24 @@ class SimpleDB(object):
         dom = self.domains[domain_name]
         dom.put_attributes(item_name, item_attrs)
 
+    def batch_put_attributes(self, domain_name, items):
+        """
+        Put the attributes of many items, items is a dict of item_name to item_attrs,
+        with one boto.sdb batch_put_attributes call per BATCH_PUT_SIZE items
+        """
+        try:
+            self.is_domain(domain_name)
+        except:
+            pass
+
+        dom = self.domains[domain_name]
+        item_names = sorted(items.keys())
+        for i in range(0, len(item_names), BATCH_PUT_SIZE):
+            batch = {}
+            for item_name in item_names[i:i + BATCH_PUT_SIZE]:
+                batch[item_name] = items[item_name]
+            dom.batch_put_attributes(batch)
+
     def is_domain(self, domain_name):
         """
         Given a domain name, check if the domain is connected,
@@ -107,8 +132,11 @@ class SimpleDB(object):
 
     def connect_to_sdb(self, region="us-east-1",
                        aws_access_key_id=None, aws_secret_access_key=None):
-        return boto.sdb.connect_to_region(region, aws_access_key_id=aws_access_key_id,
-                                          aws_secret_access_key=aws_secret_access_key)
+        def connect():
+            return boto.sdb.connect_to_region(region, aws_access_key_id=aws_access_key_id,
+                                              aws_secret_access_key=aws_secret_access_key)
+        return connections.get_connection("sdb", region, aws_access_key_id,
+                                          aws_secret_access_key, connect)
 
     def sdb_domain_exists(self, domain_name_env):
         exists = None
@@ -248,6 +276,40 @@ class SimpleDB(object):
 
         return query
 
+    def elife_get_S3_file_items_by_prefix(self, bucket_name, prefix='', delimiter='/'):
+        """
+        From the SimpleDB domain for the S3File, return a dict of item_name to item
+        for every item of the bucket whose key starts with the prefix, in one select
+        """
+        domain_name = "S3File"
+
+        items = {}
+
+        domain_name_env = self.get_domain_name(domain_name)
+        query = self.elife_get_S3_file_prefix_query(domain_name_env, bucket_name, prefix,
+                                                    delimiter)
+
+        dom = self.get_domain(domain_name)
+
+        rs = dom.select(query, consistent_read=True)
+        for j in rs:
+            items[j.name] = j
+
+        return items
+
+    def elife_get_S3_file_prefix_query(self, domain_name, bucket_name, prefix='',
+                                       delimiter='/'):
+        """
+        Build a query for SimpleDB to get the S3File items
+        of a bucket under a prefix
+        """
+        item_name_prefix = self.escape(bucket_name + delimiter + (prefix or ''))
+
+        query = 'select * from ' + domain_name + ''
+        query = query + " where item_name like '" + item_name_prefix + "%'"
+
+        return query
+
     def elife_get_article_S3_file_items(self, file_data_type=None, doi_id=None,
                                         last_updated_since=None, latest=None):
         """
@@ -464,6 +526,41 @@ class SimpleDB(object):
 
         return item_list
 
+    def elife_get_email_queue_items_by_doi_ids(self, doi_ids):
+        """
+        From the SimpleDB domain for the EmailQueue, return the doi_id, email_type and
+        recipient_email of every item for the doi_ids, of any sent status, with one select
+        per SELECT_IN_SIZE doi_ids
+        """
+        domain_name = "EmailQueue"
+
+        item_list = []
+
+        domain_name_env = self.get_domain_name(domain_name)
+        dom = self.get_domain(domain_name)
+
+        doi_ids = sorted(set(doi_ids))
+        for i in range(0, len(doi_ids), SELECT_IN_SIZE):
+            query = self.elife_get_email_queue_doi_ids_query(
+                domain_name_env, doi_ids[i:i + SELECT_IN_SIZE])
+            rs = dom.select(query)
+            for j in rs:
+                item_list.append(j)
+
+        return item_list
+
+    def elife_get_email_queue_doi_ids_query(self, domain_name, doi_ids):
+        """
+        Build a query for SimpleDB to get the duplicate checking attributes
+        of the EmailQueue items of a list of doi_ids
+        """
+        doi_id_values = ", ".join(["'" + self.escape(doi_id) + "'" for doi_id in doi_ids])
+
+        query = 'select doi_id, email_type, recipient_email from ' + domain_name + ''
+        query = query + " where doi_id in (" + doi_id_values + ")"
+
+        return query
+
     def elife_get_email_queue_query(self, date_format, domain_name, query_type="items",
                                     sort_by=None, limit=None, sent_status=None,
                                     email_type=None, doi_id=None, date_scheduled_before=None,
@@ -727,8 +824,7 @@ class SimpleDB(object):
 
         # Connect to S3 and the bucket
         bucket_name = self.email_body_bucket
-        s3_conn = S3Connection(self.settings.aws_access_key_id,
-                               self.settings.aws_secret_access_key)
+        s3_conn = connections.s3_connection(self.settings)
         bucket = s3_conn.lookup(bucket_name)
         s3key = boto.s3.key.Key(bucket)
         # Create the key and save to body to it
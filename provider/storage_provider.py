@@ -1,10 +1,39 @@
 from pydoc import locate
+from multiprocessing.pool import ThreadPool
 from boto.s3.key import Key
 from boto.s3.connection import S3Connection
 from boto.s3.bucket import Bucket
+from boto.exception import BotoServerError
+from zipfile import ZipFile
+import StringIO
+import tempfile
+import shutil
+import httplib
+import socket
+import threading
+import mimetypes
+from provider import connections
+import time
 import re
 import os
 
+# defaults for the batch transfer methods
+TRANSFER_THREADS = 8
+TRANSFER_ATTEMPTS = 3
+TRANSFER_RETRY_DELAY = 1
+# part size of streamed multipart uploads, S3 requires at least 5 MB
+MULTIPART_PART_SIZE = 8 * 1024 * 1024
+# objects at least this size are copied in parts, concurrently
+MULTIPART_COPY_THRESHOLD = 64 * 1024 * 1024
+MULTIPART_COPY_PART_SIZE = 32 * 1024 * 1024
+COPY_PART_THREADS = 4
+# seconds a folder listing is reused for, 0 to list every time
+LISTING_CACHE_TTL = 0
+
+# folder listings shared by the storage contexts of this process
+_listing_cache = {}
+_listing_lock = threading.Lock()
+
 
 def StorageContext(*args):
     return S3StorageContext(args[0])
@@ -53,6 +82,7 @@ class S3StorageContext:
         key = Key(bucket)
         key.key = s3_key
         key.set_contents_from_filename(file)
+        self.invalidate_listings(resource)
 
     def set_resource_from_file(self, resource, file, metadata=None):
         bucket, s3_key = self.s3_storage_objects(resource)
@@ -64,6 +94,39 @@ class S3StorageContext:
                 key.metadata[mdk] = metadata[mdk]
 
         key.set_contents_from_file(file)
+        self.invalidate_listings(resource)
+
+    def set_resource_from_stream(self, resource, stream, metadata=None,
+                                 part_size=MULTIPART_PART_SIZE):
+        """
+        Upload from a file-like object which may not seek, for example a zip member,
+        holding at most one part of it in memory. Streams larger than part_size
+        are sent as a multipart upload
+        """
+        bucket, s3_key = self.s3_storage_objects(resource)
+        chunk = read_part(stream, part_size)
+        if len(chunk) < part_size:
+            self.set_resource_from_file(resource, StringIO.StringIO(chunk), metadata)
+            return
+
+        multipart = bucket.initiate_multipart_upload(s3_key, metadata=metadata)
+        try:
+            part_num = 0
+            while chunk:
+                part_num += 1
+                multipart.upload_part_from_file(StringIO.StringIO(chunk), part_num)
+                chunk = read_part(stream, part_size)
+            multipart.complete_upload()
+        except:
+            multipart.cancel_upload()
+            raise
+        self.invalidate_listings(resource)
+
+    def get_resource_writer(self, resource, metadata=None, part_size=MULTIPART_PART_SIZE):
+        "a file-like object which uploads what is written to it, see MultipartUploadWriter"
+        bucket, s3_key = self.s3_storage_objects(resource)
+        return MultipartUploadWriter(bucket, s3_key, metadata, part_size,
+                                     on_close=lambda: self.invalidate_listings(resource))
 
     def set_resource_from_string(self, resource, data, content_type=None):
         bucket, s3_key = self.s3_storage_objects(resource)
@@ -73,6 +136,7 @@ class S3StorageContext:
             key.content_type = content_type
 
         key.set_contents_from_string(data)
+        self.invalidate_listings(resource)
 
     def get_resource_to_file_pointer(self, resource, file_path):
         bucket, s3_key = self.s3_storage_objects(resource)
@@ -91,16 +155,56 @@ class S3StorageContext:
         return fp
 
     def list_resources(self, folder):
+        return [resource["filename"] for resource in self.list_resources_metadata(folder)]
+
+    def list_resources_metadata(self, folder):
+        """
+        The files in a folder as dicts of name, filename, size, etag and last_modified,
+        read from the listing alone, reusing a listing made in the last
+        storage_listing_cache_ttl seconds when that setting is enabled
+        """
         bucket, s3_key = self.s3_storage_objects(folder)
-        folder = s3_key[1:] if s3_key[:1] == "/" else s3_key
-        bucketlist = bucket.list(prefix=folder + "/")
-        files = []
-        for file in bucketlist:
-            key = bucket.get_key(file.key)
-            filename = key.name.rsplit('/', 1)[1]
-            files.append(filename)
-
-        return files
+        prefix = (s3_key[1:] if s3_key[:1] == "/" else s3_key) + "/"
+        ttl = self.get_listing_cache_ttl()
+        if ttl <= 0:
+            return list(self.iter_resources_metadata(folder))
+
+        cache_key = (bucket.name, prefix)
+        with _listing_lock:
+            cached = _listing_cache.get(cache_key)
+        if cached is not None and cached[0] > time.time():
+            return list(cached[1])
+        resources = list(self.iter_resources_metadata(folder))
+        with _listing_lock:
+            _listing_cache[cache_key] = (time.time() + ttl, resources)
+        return list(resources)
+
+    def iter_resources_metadata(self, folder):
+        "generate the list_resources_metadata of a folder as the listing is paged in"
+        bucket, s3_key = self.s3_storage_objects(folder)
+        prefix = (s3_key[1:] if s3_key[:1] == "/" else s3_key) + "/"
+        for key in bucket.list(prefix=prefix):
+            yield {
+                "name": key.name,
+                "filename": key.name.rsplit('/', 1)[1],
+                "size": key.size,
+                "etag": key.etag,
+                "last_modified": key.last_modified
+            }
+
+    def get_listing_cache_ttl(self):
+        if hasattr(self.settings, 'storage_listing_cache_ttl'):
+            return self.settings.storage_listing_cache_ttl
+        return LISTING_CACHE_TTL
+
+    def invalidate_listings(self, resource):
+        "forget the cached listings of folders containing the resource"
+        bucket, s3_key = self.s3_storage_objects(resource)
+        key_name = s3_key[1:] if s3_key[:1] == "/" else s3_key
+        with _listing_lock:
+            for cache_key in _listing_cache.keys():
+                if cache_key[0] == bucket.name and key_name.startswith(cache_key[1]):
+                    del _listing_cache[cache_key]
 
     def copy_resource(self, orig_resource, dest_resource, additional_dict_metadata=None):
         orig_bucket, orig_s3_key = self.s3_storage_objects(orig_resource)
@@ -120,6 +224,143 @@ class S3StorageContext:
             dest_key.set_contents_from_string('')
 
         dest_bucket.copy_key(dest_key.name[1:], orig_bucket.name, orig_s3_key[1:], metadata=metadata)
+        self.invalidate_listings(dest_resource)
+
+    def set_resources_from_files(self, resources, metadata=None):
+        """
+        Upload many files concurrently over the shared connection
+        resources is a dict of resource to a filename or file object
+        Returns a dict of resource to True, or the exception if the upload failed
+        """
+        def upload(resource, file):
+            if isinstance(file, basestring) and metadata is None:
+                self.set_resource_from_filename(resource, file)
+            elif isinstance(file, basestring):
+                with open(file, 'rb') as open_file:
+                    self.set_resource_from_file(resource, open_file, metadata)
+            else:
+                file.seek(0)
+                self.set_resource_from_file(resource, file, metadata)
+
+        return self.run_transfers(upload, [(resource, (resource, resources[resource]))
+                                           for resource in resources])
+
+    def set_resources_from_zip(self, zip_file_path, resources):
+        """
+        Upload members of a zip file concurrently, streaming each without extracting
+        it to disk. resources is a dict of resource to the zip member name, whose
+        Content-Type is guessed from the member name
+        Returns a dict of resource to True, or the exception if the upload failed
+        """
+        def upload(resource, member_name):
+            metadata = {'Content-Type': guess_content_type(member_name)}
+            # each upload reads from its own handle, ZipFile is not thread safe
+            with ZipFile(zip_file_path) as zip_file:
+                self.set_resource_from_stream(resource, zip_file.open(member_name), metadata)
+
+        return self.run_transfers(upload, [(resource, (resource, resources[resource]))
+                                           for resource in resources])
+
+    def copy_resources(self, resource_pairs):
+        """
+        Copy many resources concurrently over the shared connection, each with
+        copy_resource_direct. resource_pairs is a list of (orig_resource, dest_resource),
+        (orig_resource, dest_resource, additional_dict_metadata) or
+        (orig_resource, dest_resource, additional_dict_metadata, size)
+        Returns a dict of dest_resource to True, or the exception if the copy failed
+        """
+        return self.run_transfers(self.copy_resource_direct, [(pair[1], pair)
+                                                              for pair in resource_pairs])
+
+    def copy_resource_direct(self, orig_resource, dest_resource, additional_dict_metadata=None,
+                             size=None):
+        """
+        Copy a resource with a single server side copy, without the destination
+        lookup and placeholder object of copy_resource. When its size is known to be
+        at least MULTIPART_COPY_THRESHOLD it is copied in parts concurrently
+        """
+        orig_bucket, orig_s3_key = self.s3_storage_objects(orig_resource)
+        dest_bucket, dest_s3_key = self.s3_storage_objects(dest_resource)
+
+        if size is not None and size >= MULTIPART_COPY_THRESHOLD:
+            self.multipart_copy(orig_bucket, orig_s3_key[1:], dest_bucket, dest_s3_key[1:],
+                                size, additional_dict_metadata)
+        else:
+            dest_bucket.copy_key(dest_s3_key[1:], orig_bucket.name, orig_s3_key[1:],
+                                 metadata=additional_dict_metadata)
+        self.invalidate_listings(dest_resource)
+
+    def multipart_copy(self, orig_bucket, orig_key_name, dest_bucket, dest_key_name, size,
+                       metadata=None, part_size=MULTIPART_COPY_PART_SIZE):
+        "server side copy of a large key as a multipart upload of its byte ranges"
+        headers = None
+        if metadata is None:
+            # unlike a copy, a multipart upload does not keep the metadata of the source
+            orig_key = orig_bucket.get_key(orig_key_name)
+            metadata = dict(orig_key.metadata)
+            headers = {'Content-Type': orig_key.content_type}
+
+        parts = []
+        for part_num, start in enumerate(range(0, size, part_size), 1):
+            parts.append((part_num, start, min(start + part_size, size) - 1))
+
+        multipart = dest_bucket.initiate_multipart_upload(dest_key_name, headers=headers,
+                                                          metadata=metadata)
+        pool = ThreadPool(min(COPY_PART_THREADS, len(parts)))
+        try:
+            pool.map(lambda part: multipart.copy_part_from_key(
+                orig_bucket.name, orig_key_name, part[0], part[1], part[2]), parts)
+            multipart.complete_upload()
+        except:
+            multipart.cancel_upload()
+            raise
+        finally:
+            pool.close()
+            pool.join()
+
+    def run_transfers(self, function, transfers):
+        """
+        Call function for each (resource, args) in transfers on a pool of threads,
+        retrying transient errors, and return a dict of resource to the result
+        """
+        # look up the buckets once before the threads share the cache
+        for resource, args in transfers:
+            for arg in args:
+                if isinstance(arg, basestring) and arg.startswith("s3://"):
+                    self.s3_storage_objects(arg)
+
+        results = {}
+        if not transfers:
+            return results
+        pool = ThreadPool(min(self.get_transfer_threads(), len(transfers)))
+        try:
+            async_results = [(resource, pool.apply_async(self.transfer_with_retry,
+                                                         (function, args)))
+                             for resource, args in transfers]
+            for resource, async_result in async_results:
+                results[resource] = async_result.get()
+        finally:
+            pool.close()
+            pool.join()
+        return results
+
+    def transfer_with_retry(self, function, args):
+        "call function, retrying transient errors, and return True or the exception"
+        attempt = 1
+        while True:
+            try:
+                function(*args)
+                return True
+            except Exception as exception:
+                if attempt >= TRANSFER_ATTEMPTS or not is_transient_error(exception):
+                    return exception
+                time.sleep(TRANSFER_RETRY_DELAY * attempt)
+                attempt += 1
+
+    def get_transfer_threads(self):
+        if hasattr(self.settings, 'storage_transfer_threads'):
+            return max(int(self.settings.storage_transfer_threads), 1)
+        return TRANSFER_THREADS
 
     def get_bucket_from_cache(self, bucket_name):
 
@@ -147,9 +388,149 @@ class S3StorageContext:
 
     def get_connection(self):
 
-        conn = S3Connection(self.settings.aws_access_key_id, self.settings.aws_secret_access_key)
+        conn = connections.s3_connection(self.settings)
         return conn
 
+
+def is_transient_error(exception):
+    "whether an error from a transfer is worth retrying"
+    if isinstance(exception, BotoServerError):
+        return exception.status >= 500
+    return isinstance(exception, (socket.error, httplib.HTTPException))
+
+
+def read_part(stream, size):
+    """
+    Read size bytes from a stream, fewer only at its end. A read of a stream such
+    as a decoded HTTP response can return less than asked before its end
+    """
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = stream.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return ''.join(chunks)
+
+
+def guess_content_type(file_name):
+    "the Content-Type of a file from its name, or the S3 default for binary data"
+    content_type, encoding = mimetypes.guess_type(file_name)
+    return content_type or 'application/octet-stream'
+
+
+def failed_transfers(results):
+    "the resources in batch transfer results which failed"
+    return sorted([resource for resource in results if results[resource] is not True])
+
+
+class MultipartUploadWriter(object):
+    """
+    File-like object which uploads what is written to it to an S3 key, for example
+    from a ZipFile. Only the bytes not yet uploaded are kept, in a temporary file;
+    upload_parts() sends every complete part of them, after which earlier
+    positions can no longer be written. close() uploads the rest, as a single
+    object when no part was uploaded, and abort() discards the upload.
+    """
+
+    def __init__(self, bucket, key_name, metadata=None, part_size=MULTIPART_PART_SIZE,
+                 on_close=None):
+        self.bucket = bucket
+        self.key_name = key_name[1:] if key_name[:1] == "/" else key_name
+        self.metadata = metadata
+        self.part_size = part_size
+        self.on_close = on_close
+        self.multipart = None
+        self.part_num = 0
+        # position in the stream of the first byte in the buffer
+        self.offset = 0
+        self.buffer = tempfile.TemporaryFile()
+        self.closed = False
+
+    def write(self, data):
+        self.buffer.write(data)
+
+    def tell(self):
+        return self.offset + self.buffer.tell()
+
+    def seek(self, position, whence=0):
+        if whence == 0:
+            if position < self.offset:
+                raise IOError("cannot seek to %s, the upload has passed %s" %
+                              (position, self.offset))
+            self.buffer.seek(position - self.offset)
+        else:
+            self.buffer.seek(position, whence)
+
+    def flush(self):
+        self.buffer.flush()
+
+    def upload_parts(self):
+        "upload the buffered bytes in part_size parts, keeping any remainder"
+        position = self.tell()
+        self.buffer.seek(0, 2)
+        buffered = self.buffer.tell()
+        if buffered < self.part_size:
+            self.seek(position)
+            return
+        if self.multipart is None:
+            self.multipart = self.bucket.initiate_multipart_upload(
+                self.key_name, metadata=self.metadata)
+        self.buffer.seek(0)
+        uploaded = 0
+        while buffered - uploaded >= self.part_size:
+            self.part_num += 1
+            self.buffer.seek(uploaded)
+            self.multipart.upload_part_from_file(self.buffer, self.part_num,
+                                                 size=self.part_size)
+            uploaded += self.part_size
+        remainder = tempfile.TemporaryFile()
+        self.buffer.seek(uploaded)
+        shutil.copyfileobj(self.buffer, remainder)
+        self.buffer.close()
+        self.buffer = remainder
+        self.offset += uploaded
+        self.seek(max(position, self.offset))
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self.buffer.seek(0, 2)
+            if self.multipart is None:
+                key = Key(self.bucket)
+                key.key = self.key_name
+                if self.metadata is not None:
+                    for mdk in self.metadata:
+                        key.metadata[mdk] = self.metadata[mdk]
+                self.buffer.seek(0)
+                key.set_contents_from_file(self.buffer)
+            else:
+                if self.buffer.tell() > 0:
+                    self.part_num += 1
+                    self.buffer.seek(0)
+                    self.multipart.upload_part_from_file(self.buffer, self.part_num)
+                self.multipart.complete_upload()
+        except:
+            self.abort()
+            raise
+        self.closed = True
+        self.buffer.close()
+        if self.on_close is not None:
+            self.on_close()
+
+    def abort(self):
+        "discard what was written, cancelling any multipart upload"
+        if self.closed:
+            return
+        self.closed = True
+        self.buffer.close()
+        if self.multipart is not None:
+            self.multipart.cancel_upload()
+
+
 class UnsupportedResourceType(Exception): #TODO
     pass
 
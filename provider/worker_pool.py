@@ -0,0 +1,219 @@
+import os
+import time
+import errno
+import signal
+import resource
+import threading
+import multiprocessing
+
+"""
+Pre-forked pool of worker processes. The supervisor forks the children, each
+running the same work, replaces a child when it exits, for example to be
+recycled after a number of tasks or when it used too much memory, and on
+shutdown passes SIGTERM to the children and waits for their tasks to finish
+"""
+
+# seconds between checks of the supervisor for children which exited
+SUPERVISOR_POLL_SECONDS = 1
+# a child exiting with an error sooner than this after it started is replaced
+# only after RESTART_DELAY seconds, so a child failing to start does not fork in a loop
+MIN_CHILD_SECONDS = 10
+RESTART_DELAY = 5
+# seconds between checks of a thread waiting for a free slot of a task list
+SLOT_WAIT_SECONDS = 1
+
+
+def max_rss_mb():
+    "the most resident memory this process used, in megabytes"
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+class TaskListLimits(object):
+    """
+    Limits of how many threads poll a task list at once, by all the children
+    of a supervisor, given as a dict of task list to limit. It is created
+    before forking, so the children share its slots. Each taken slot holds the
+    pid of the process polling the task list, so the supervisor can free the
+    slots of a child which exited without releasing them, for example when it
+    was killed
+    """
+
+    def __init__(self, limits=None):
+        self.limits = dict(limits or {})
+        self.lock = multiprocessing.Lock()
+        # task list to its slots, each the pid polling the task list or 0
+        self.slots = {}
+        for task_list, limit in self.limits.items():
+            self.slots[task_list] = multiprocessing.Array('i', limit, lock=False)
+
+    def acquire(self, task_list):
+        "take a slot to poll the task list, without waiting, returning False when none is free"
+        slots = self.slots.get(task_list)
+        if slots is None:
+            return True
+        with self.lock:
+            for index in range(len(slots)):
+                if slots[index] == 0:
+                    slots[index] = os.getpid()
+                    return True
+        return False
+
+    def release(self, task_list):
+        "free a slot of the task list taken by this process"
+        slots = self.slots.get(task_list)
+        if slots is None:
+            return
+        pid = os.getpid()
+        with self.lock:
+            for index in range(len(slots)):
+                if slots[index] == pid:
+                    slots[index] = 0
+                    return
+
+    def release_process(self, pid):
+        "free the slots taken by a process which exited, returning how many there were"
+        released = 0
+        with self.lock:
+            for slots in self.slots.values():
+                for index in range(len(slots)):
+                    if slots[index] == pid:
+                        slots[index] = 0
+                        released += 1
+        return released
+
+    def run_with_slot(self, task_list, flag, run):
+        """
+        Wait for a free slot of the task list while the flag is green, then
+        call run holding the slot, so only the threads holding one poll it
+        """
+        while flag.green():
+            if self.acquire(task_list):
+                try:
+                    run()
+                finally:
+                    self.release(task_list)
+            else:
+                time.sleep(SLOT_WAIT_SECONDS)
+
+
+class Recycler(object):
+    """
+    Counts the tasks of a child to tell when it should exit, to be replaced by
+    a new one, after max_tasks tasks or once it used max_memory_mb of memory
+    """
+
+    def __init__(self, max_tasks=None, max_memory_mb=None):
+        self.max_tasks = max_tasks
+        self.max_memory_mb = max_memory_mb
+        self.tasks = 0
+        self.lock = threading.Lock()
+
+    def task_done(self):
+        with self.lock:
+            self.tasks += 1
+
+    def should_recycle(self):
+        with self.lock:
+            tasks = self.tasks
+        if self.max_tasks and tasks >= self.max_tasks:
+            return True
+        if self.max_memory_mb and max_rss_mb() >= self.max_memory_mb:
+            return True
+        return False
+
+
+class Supervisor(object):
+
+    def __init__(self, processes, child_main, logger=None, task_list_limits=None):
+        """
+        fork processes children which each call child_main, then exit, freeing
+        the slots of task_list_limits held by a child when it exits
+        """
+        self.processes = processes
+        self.child_main = child_main
+        self.logger = logger
+        self.task_list_limits = task_list_limits
+        # pid of each child to the time it started
+        self.children = {}
+        self.restart_after = 0
+
+    def run(self, flag):
+        "keep processes children running until the flag is stopped"
+        while flag.green():
+            if time.time() >= self.restart_after:
+                while len(self.children) < self.processes:
+                    self.spawn()
+            self.reap(os.WNOHANG)
+            time.sleep(SUPERVISOR_POLL_SECONDS)
+        self.stop()
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                # the child handles its own signals, and has no children to pass them to
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                self.children = {}
+                self.child_main()
+            except:
+                exit_code = 1
+                if self.logger:
+                    self.logger.exception("worker process %s failed" % os.getpid())
+            finally:
+                os._exit(exit_code)
+        self.children[pid] = time.time()
+        if self.logger:
+            self.logger.info("started worker process %s" % pid)
+        return pid
+
+    def reap(self, options=0):
+        "remove the children which exited, waiting for one unless options is os.WNOHANG"
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, options)
+            except OSError as exception:
+                if exception.errno == errno.EINTR:
+                    continue
+                if exception.errno == errno.ECHILD:
+                    for pid in self.children.keys():
+                        self.child_exited(pid)
+                    self.children.clear()
+                    return
+                raise
+            if pid == 0:
+                return
+            started = self.children.pop(pid, None)
+            if self.logger:
+                self.logger.info("worker process %s exited with status %s" % (pid, status))
+            self.child_exited(pid)
+            if status != 0 and started is not None and time.time() - started < MIN_CHILD_SECONDS:
+                self.restart_after = time.time() + RESTART_DELAY
+            if options != os.WNOHANG:
+                return
+
+    def child_exited(self, pid):
+        if self.task_list_limits is None:
+            return
+        released = self.task_list_limits.release_process(pid)
+        if released and self.logger:
+            self.logger.info("released %s task list slots of worker process %s" %
+                             (released, pid))
+
+    def signal_children(self, signum):
+        for pid in self.children.keys():
+            try:
+                os.kill(pid, signum)
+            except OSError:
+                pass
+
+    def stop(self):
+        "SIGTERM the children for a graceful shutdown and wait for them to exit"
+        for pid in self.children.keys():
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                self.children.pop(pid, None)
+        while self.children:
+            self.reap()
@@ -2,6 +2,7 @@ import random
 import time
 import json
 from provider import process
+from provider import connections
 from optparse import OptionParser
 from S3utility.s3_notification_info import S3NotificationInfo
 from S3utility.s3_sqs_message import S3SQSMessage
@@ -33,10 +34,11 @@ def work(ENV, flag):
     # logFile = None
     logger = log.logger(log_file, settings.setLevel, identity)
 
+    # Share AWS connections within this process
+    connections.init()
+
     # Simple connect
-    conn = boto.sqs.connect_to_region(settings.sqs_region,
-                                      aws_access_key_id=settings.aws_access_key_id,
-                                      aws_secret_access_key=settings.aws_secret_access_key)
+    conn = connections.sqs_connection(settings)
     queue = conn.get_queue(settings.S3_monitor_queue)
     queue.set_message_class(S3SQSMessage)
 
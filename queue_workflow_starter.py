@@ -7,6 +7,7 @@ from optparse import OptionParser
 import log
 import boto.sqs
 from provider import process
+from provider import connections
 import json
 import importlib
 import os
@@ -49,6 +50,9 @@ def main(flag):
     identity = "queue_workflow_starter_%s" % os.getpid()
     logger = log.logger(log_file, settings.setLevel, identity=identity)
 
+    # Share AWS connections between the starters run by this process
+    connections.init()
+
     # Simple connect
     queue = get_queue()
 
@@ -65,9 +69,7 @@ def main(flag):
     logger.info("graceful shutdown")
 
 def get_queue():
-    conn = boto.sqs.connect_to_region(settings.sqs_region,
-                                      aws_access_key_id=settings.aws_access_key_id,
-                                      aws_secret_access_key=settings.aws_secret_access_key)
+    conn = connections.sqs_connection(settings)
     queue = conn.get_queue(settings.workflow_starter_queue)
     return queue
 
@@ -70,6 +70,8 @@ class exp():
     # SWF queue settings
     domain = "Publish.dev"
     default_task_list = "DefaultTaskList"
+    # task list of the ResizeImages activities, used when it has worker_task_list_limits
+    resize_images_task_list = "ResizeImagesTaskList"
 
     # SimpleDB settings
     simpledb_region = "eu-west-1"
@@ -204,6 +206,52 @@ class exp():
 
     cloudfront_distribution_id_cdn = "DISTRIBUTIONID"
 
+    # ResizeImages threads to download, resize and upload images with
+    resize_images_threads = 4
+
+    # threads for concurrent uploads and copies through the storage context
+    storage_transfer_threads = 8
+
+    # S3Monitor, sync SimpleDB items in bulk writing only new or changed items
+    s3_monitor_bulk_sync = True
+
+    # S3Monitor, levels of folders to map (None for all) and threads to list them with
+    s3_monitor_crawl_depth = None
+    s3_monitor_crawl_threads = 8
+
+    # file for dashboard messages which could not be sent to the event monitor queue
+    event_monitor_spool_file = 'event_monitor_spool.json'
+
+    # seconds to reuse the Lax versions of an article for
+    lax_versions_cache_ttl = 30
+
+    # seconds to reuse storage context folder listings for, 0 to list every time
+    storage_listing_cache_ttl = 0
+
+    # expanded files ArchiveArticle downloads at once while writing the archive zip
+    archive_threads = 4
+
+    # expanded files ApplyVersionNumber copies to their new names at once
+    rename_threads = 8
+
+    # IIIF endpoints VerifyImageServer checks at once, at most 8, and seconds to keep retrying one
+    iiif_threads = 8
+    iiif_retry_deadline = 60
+
+    # folder of cached values read from article XML, by the hash of the XML, None for no cache
+    article_document_cache_dir = "/tmp/article_document_cache"
+
+    # reload an activity or workflow module when its file changes, or only on SIGHUP if False
+    class_reload_on_change = True
+
+    # task lists besides default_task_list polled by worker.py, by at most this many threads
+    # at once on the machine with --processes
+    worker_task_list_limits = {"ResizeImagesTaskList": 2}
+    # tasks after which a worker process is replaced, None for no limit
+    worker_max_tasks = 500
+    # megabytes of memory after which a worker process is replaced, None for no limit
+    worker_max_memory_mb = 1024
+
 
 class dev():
 
@@ -219,6 +267,8 @@ class dev():
     # SWF queue settings
     domain = "Publish.dev"
     default_task_list = "DefaultTaskList"
+    # task list of the ResizeImages activities, used when it has worker_task_list_limits
+    resize_images_task_list = "ResizeImagesTaskList"
 
     # SimpleDB settings
     simpledb_region = "us-east-1"
@@ -360,6 +410,52 @@ class dev():
     # CloudFront
     cloudfront_distribution_id_cdn = "DISTRIBUTIONID"
 
+    # ResizeImages threads to download, resize and upload images with
+    resize_images_threads = 4
+
+    # threads for concurrent uploads and copies through the storage context
+    storage_transfer_threads = 8
+
+    # S3Monitor, sync SimpleDB items in bulk writing only new or changed items
+    s3_monitor_bulk_sync = True
+
+    # S3Monitor, levels of folders to map (None for all) and threads to list them with
+    s3_monitor_crawl_depth = None
+    s3_monitor_crawl_threads = 8
+
+    # file for dashboard messages which could not be sent to the event monitor queue
+    event_monitor_spool_file = 'event_monitor_spool.json'
+
+    # seconds to reuse the Lax versions of an article for
+    lax_versions_cache_ttl = 30
+
+    # seconds to reuse storage context folder listings for, 0 to list every time
+    storage_listing_cache_ttl = 0
+
+    # expanded files ArchiveArticle downloads at once while writing the archive zip
+    archive_threads = 4
+
+    # expanded files ApplyVersionNumber copies to their new names at once
+    rename_threads = 8
+
+    # IIIF endpoints VerifyImageServer checks at once, at most 8, and seconds to keep retrying one
+    iiif_threads = 8
+    iiif_retry_deadline = 60
+
+    # folder of cached values read from article XML, by the hash of the XML, None for no cache
+    article_document_cache_dir = "/tmp/article_document_cache"
+
+    # reload an activity or workflow module when its file changes, or only on SIGHUP if False
+    class_reload_on_change = True
+
+    # task lists besides default_task_list polled by worker.py, by at most this many threads
+    # at once on the machine with --processes
+    worker_task_list_limits = {"ResizeImagesTaskList": 2}
+    # tasks after which a worker process is replaced, None for no limit
+    worker_max_tasks = 500
+    # megabytes of memory after which a worker process is replaced, None for no limit
+    worker_max_memory_mb = 1024
+
 
 class live():
     # AWS settings
@@ -374,6 +470,8 @@ class live():
     # SWF queue settings
     domain = "Publish"
     default_task_list = "DefaultTaskList"
+    # task list of the ResizeImages activities, used when it has worker_task_list_limits
+    resize_images_task_list = "ResizeImagesTaskList"
 
     # SimpleDB settings
     simpledb_region = "us-east-1"
@@ -515,6 +613,52 @@ class live():
     # CloudFront
     cloudfront_distribution_id_cdn = "DISTRIBUTIONID"
 
+    # ResizeImages threads to download, resize and upload images with
+    resize_images_threads = 4
+
+    # threads for concurrent uploads and copies through the storage context
+    storage_transfer_threads = 8
+
+    # S3Monitor, sync SimpleDB items in bulk writing only new or changed items
+    s3_monitor_bulk_sync = True
+
+    # S3Monitor, levels of folders to map (None for all) and threads to list them with
+    s3_monitor_crawl_depth = None
+    s3_monitor_crawl_threads = 8
+
+    # file for dashboard messages which could not be sent to the event monitor queue
+    event_monitor_spool_file = 'event_monitor_spool.json'
+
+    # seconds to reuse the Lax versions of an article for
+    lax_versions_cache_ttl = 30
+
+    # seconds to reuse storage context folder listings for, 0 to list every time
+    storage_listing_cache_ttl = 0
+
+    # expanded files ArchiveArticle downloads at once while writing the archive zip
+    archive_threads = 4
+
+    # expanded files ApplyVersionNumber copies to their new names at once
+    rename_threads = 8
+
+    # IIIF endpoints VerifyImageServer checks at once, at most 8, and seconds to keep retrying one
+    iiif_threads = 8
+    iiif_retry_deadline = 60
+
+    # folder of cached values read from article XML, by the hash of the XML, None for no cache
+    article_document_cache_dir = "/tmp/article_document_cache"
+
+    # reload an activity or workflow module when its file changes, or only on SIGHUP if False
+    class_reload_on_change = True
+
+    # task lists besides default_task_list polled by worker.py, by at most this many threads
+    # at once on the machine with --processes
+    worker_task_list_limits = {"ResizeImagesTaskList": 2}
+    # tasks after which a worker process is replaced, None for no limit
+    worker_max_tasks = 500
+    # megabytes of memory after which a worker process is replaced, None for no limit
+    worker_max_memory_mb = 1024
+
 
 def get_settings(ENV="dev"):
     """
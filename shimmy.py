@@ -6,6 +6,7 @@ from boto.s3.connection import S3Connection
 import requests
 from requests.auth import HTTPBasicAuth
 from provider import process
+from provider import connections
 from provider import eif as eif_provider
 import log
 import json
@@ -25,9 +26,7 @@ class Shimmy:
 
     def listen(self, flag):
         self.logger.info("started")
-        conn = boto.sqs.connect_to_region(self._settings.sqs_region,
-                                          aws_access_key_id=self._settings.aws_access_key_id,
-                                          aws_secret_access_key=self._settings.aws_secret_access_key)
+        conn = connections.sqs_connection(self._settings)
         input_queue = conn.get_queue(self._settings.website_ingest_queue)
         output_queue = conn.get_queue(self._settings.workflow_starter_queue)
         if input_queue is not None:
@@ -121,8 +120,7 @@ class Shimmy:
 
     def slurp_eif(self, bucketname, filename):
 
-        conn = S3Connection(self._settings.aws_access_key_id,
-                            self._settings.aws_secret_access_key)
+        conn = connections.s3_connection(self._settings)
 
         bucket = conn.get_bucket(bucketname)
         key = Key(bucket)
@@ -143,5 +141,6 @@ if __name__ == "__main__":
     ENV = options.env
     settings_lib = __import__('settings')
     settings = settings_lib.get_settings(ENV)
+    connections.init()
     shimmy = Shimmy(settings, logger)
     process.monitor_interrupt(lambda flag: shimmy.listen(flag))
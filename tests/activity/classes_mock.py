@@ -5,6 +5,7 @@ from shutil import copy
 import shutil
 import re
 import os
+from zipfile import ZipFile
 
 
 class FakeSession:
@@ -107,12 +108,38 @@ class FakeStorageContext:
     def set_resource_from_string(self, resource, data, content_type=None):
         pass
 
+    def set_resource_from_stream(self, resource, stream, metadata=None):
+        pass
+
     def list_resources(self, resource):
         return ["elife-00353-fig1-v1.tif", "elife-00353-v1.pdf", "elife-00353-v1.xml"]
 
+    def list_resources_metadata(self, resource):
+        return [{"name": resource.split("/", 3)[-1] + "/" + filename, "filename": filename,
+                 "size": 1024, "etag": None, "last_modified": None}
+                for filename in self.list_resources(resource)]
+
     def copy_resource(self, origin, destination, additional_dict_metadata=None):
         pass
 
+    def set_resources_from_files(self, resources, metadata=None):
+        for resource in resources:
+            self.set_resource_from_filename(resource, resources[resource])
+        return dict((resource, True) for resource in resources)
+
+    def set_resources_from_zip(self, zip_file_path, resources):
+        with ZipFile(zip_file_path) as zip_file:
+            for resource in resources:
+                member_name = resources[resource]
+                with open(os.path.join(data.ExpandArticle_files_dest_folder, member_name), 'wb') as open_file:
+                    shutil.copyfileobj(zip_file.open(member_name), open_file)
+        return dict((resource, True) for resource in resources)
+
+    def copy_resources(self, resource_pairs):
+        for pair in resource_pairs:
+            self.copy_resource(*pair[:3])
+        return dict((pair[1], True) for pair in resource_pairs)
+
     def get_resource_to_file_pointer(self, resource, file_path):
         return None
 
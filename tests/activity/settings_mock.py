@@ -16,6 +16,7 @@ archive_bucket = "archive_bucket"
 
 aws_access_key_id = ""
 aws_secret_access_key = ""
+s3_hostname = ""
 
 workflow_starter_queue = ""
 website_ingest_queue = ""
@@ -109,3 +110,5 @@ CNPIEC_FTP_URI = "cnpiec.localhost"
 CNPIEC_FTP_USERNAME = ""
 CNPIEC_FTP_PASSWORD = ""
 CNPIEC_FTP_CWD = ""
+
+article_document_cache_dir = None
@@ -2,7 +2,8 @@ import unittest
 from ddt import ddt, data, unpack
 import settings_mock
 from activity.activity_ApplyVersionNumber import activity_ApplyVersionNumber
-from mock import mock, patch
+from mock import mock, patch, MagicMock
+from boto.s3.key import Key
 import test_activity_data as test_data
 from classes_mock import FakeSession
 import shutil
@@ -193,5 +194,69 @@ class MyTestCase(unittest.TestCase):
             expected_file_content = expected_file.read()
         self.assertEqual(result_file_content, expected_file_content)
 
+    def fake_bucket(self):
+        bucket = MagicMock()
+        bucket.copy_key.side_effect = lambda new_key, bucket_name, old_key: Key(bucket, new_key)
+        bucket.delete_keys.return_value.errors = []
+        return bucket
+
+    def test_copy_s3_objects(self):
+        bucket = self.fake_bucket()
+        old_s3_keys = self.applyversionnumber.copy_s3_objects(
+            bucket, 'bucket', 'folder', example_file_name_map)
+        # video files keep their names
+        self.assertEqual(19, bucket.copy_key.call_count)
+        self.assertEqual(19, len(old_s3_keys))
+        self.assertTrue('folder/elife-15224-fig1.tif' in old_s3_keys)
+        bucket.copy_key.assert_any_call('folder/elife-15224-fig1-v1.tif', 'bucket',
+                                        'folder/elife-15224-fig1.tif')
+        self.assertEqual(0, bucket.delete_keys.call_count)
+
+    def test_copy_s3_objects_failure_deletes_nothing(self):
+        bucket = self.fake_bucket()
+        bucket.copy_key.side_effect = IOError("copy failed")
+        self.assertRaises(IOError, self.applyversionnumber.rename_s3_objects,
+                          bucket, 'bucket', 'folder', example_file_name_map)
+        self.assertEqual(0, bucket.delete_keys.call_count)
+
+    @patch('activity.activity_ApplyVersionNumber.DELETE_BATCH_SIZE', 10)
+    def test_rename_s3_objects_deletes_in_batches(self):
+        bucket = self.fake_bucket()
+        self.applyversionnumber.rename_s3_objects(bucket, 'bucket', 'folder', example_file_name_map)
+        self.assertEqual([10, 9], [len(args[0][0]) for args in bucket.delete_keys.call_args_list])
+        self.assertEqual(0, bucket.delete_key.call_count)
+
+    def test_delete_s3_objects_errors(self):
+        bucket = self.fake_bucket()
+        error = MagicMock()
+        error.key = 'folder/elife-15224-fig1.tif'
+        error.message = 'Access Denied'
+        bucket.delete_keys.return_value.errors = [error]
+        self.assertRaises(Exception, self.applyversionnumber.delete_s3_objects,
+                          bucket, ['folder/elife-15224-fig1.tif'])
+
+    @patch('activity.activity_ApplyVersionNumber.s3lib.get_s3_key_names_from_bucket')
+    @patch('activity.activity_ApplyVersionNumber.S3Connection')
+    def test_rename_article_s3_objects(self, fake_connection, fake_key_names):
+        bucket = self.fake_bucket()
+        fake_connection.return_value.lookup.return_value = bucket
+        fake_key_names.return_value = example_key_names
+        self.applyversionnumber.expanded_bucket_name = 'origin_bucket'
+        self.applyversionnumber.download_and_rewrite_xml_file = MagicMock()
+        self.applyversionnumber.upload_file_to_bucket = MagicMock()
+        self.applyversionnumber.rename_article_s3_objects(
+            '15224.1/fec8dcd1-76df-4921-93de-4bf8b8ab70eb', '1')
+        folder = '15224.1/fec8dcd1-76df-4921-93de-4bf8b8ab70eb'
+        # the XML is rewritten from its old name and uploaded instead of copied
+        self.applyversionnumber.download_and_rewrite_xml_file.assert_called_with(
+            bucket, folder, u'elife-15224.xml', u'elife-15224-v1.xml', example_file_name_map)
+        self.applyversionnumber.upload_file_to_bucket.assert_called_with(
+            bucket, folder, u'elife-15224-v1.xml')
+        self.assertEqual(18, bucket.copy_key.call_count)
+        deleted = bucket.delete_keys.call_args[0][0]
+        self.assertEqual(19, len(deleted))
+        self.assertTrue(folder + '/elife-15224.xml' in deleted)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+import os
+import StringIO
+import zipfile
+from mock import patch
+from testfixtures import TempDirectory
+from activity.activity_ArchiveArticle import activity_ArchiveArticle, compress_type
+import activity.activity_ArchiveArticle as activity_module
+import settings_mock
+from classes_mock import FakeLogger
+
+activity_data = {
+    "run": "74e22d8f-6b5d-4fb7-b5bf-179c1aaa7cff",
+    "article_id": "00353",
+    "status": "vor",
+    "version": "1",
+    "expanded_folder": "00353.1/74e22d8f-6b5d-4fb7-b5bf-179c1aaa7cff",
+    "update_date": "2012-12-13T00:00:00Z"
+}
+
+
+class FakeWriter(StringIO.StringIO):
+    def __init__(self):
+        StringIO.StringIO.__init__(self)
+        self.parts_uploaded = 0
+        self.aborted = False
+        self.value = None
+
+    def upload_parts(self):
+        self.parts_uploaded += 1
+
+    def close(self):
+        self.value = self.getvalue()
+        StringIO.StringIO.close(self)
+
+    def abort(self):
+        self.aborted = True
+
+
+class FakeArchiveStorageContext:
+    def __init__(self, files):
+        self.files = files
+        self.writers = {}
+
+    def list_resources_metadata(self, folder):
+        return [{"name": folder.split("/", 3)[-1] + "/" + filename, "filename": filename,
+                 "size": len(self.files[filename]), "etag": None, "last_modified": None}
+                for filename in sorted(self.files)]
+
+    def get_resource_to_file(self, resource, file):
+        file.write(self.files[resource.rsplit("/", 1)[-1]])
+
+    def get_resource_writer(self, resource, metadata=None):
+        self.writers[resource] = FakeWriter()
+        self.writers[resource].metadata = metadata
+        return self.writers[resource]
+
+
+class TestArchiveArticle(unittest.TestCase):
+    def setUp(self):
+        self.directory = TempDirectory()
+        self.archivearticle = activity_ArchiveArticle(settings_mock, FakeLogger())
+        self.archivearticle.tmp_dir = self.directory.path
+        self.files = {
+            "elife-00353-v1.xml": "<article/>" * 100,
+            "elife-00353-fig1-v1.jpg": "jpeg data",
+            "elife-00353-media1.mp4": "video data" * 100
+        }
+
+    def tearDown(self):
+        TempDirectory.cleanup_all()
+
+    @patch.object(activity_ArchiveArticle, 'emit_monitor_event')
+    @patch('activity.activity_ArchiveArticle.StorageContext')
+    def test_do_activity(self, fake_storage_context, fake_emit):
+        storage = FakeArchiveStorageContext(self.files)
+        fake_storage_context.return_value = storage
+        result = self.archivearticle.do_activity(activity_data)
+        self.assertEqual(activity_ArchiveArticle.ACTIVITY_SUCCESS, result)
+
+        writer = storage.writers["s3://archive_bucket/elife-00353-vor-v1-20121213000000.zip"]
+        self.assertEqual(3, writer.parts_uploaded)
+        self.assertEqual({'Content-Type': 'application/zip'}, writer.metadata)
+        with zipfile.ZipFile(StringIO.StringIO(writer.value)) as zip_file:
+            self.assertEqual(sorted(self.files), sorted(zip_file.namelist()))
+            for filename in self.files:
+                self.assertEqual(self.files[filename], zip_file.read(filename))
+            self.assertEqual(zipfile.ZIP_STORED,
+                             zip_file.getinfo("elife-00353-media1.mp4").compress_type)
+            self.assertEqual(zipfile.ZIP_DEFLATED,
+                             zip_file.getinfo("elife-00353-v1.xml").compress_type)
+        # downloaded files are deleted once they are in the archive
+        self.assertFalse(os.path.exists(self.directory.path))
+
+    @patch.object(activity_ArchiveArticle, 'emit_monitor_event')
+    @patch('activity.activity_ArchiveArticle.StorageContext')
+    def test_do_activity_failed_download(self, fake_storage_context, fake_emit):
+        storage = FakeArchiveStorageContext(self.files)
+        fake_storage_context.return_value = storage
+        with patch.object(FakeArchiveStorageContext, 'get_resource_to_file') as fake_get:
+            fake_get.side_effect = IOError("download failed")
+            result = self.archivearticle.do_activity(activity_data)
+        self.assertEqual(activity_ArchiveArticle.ACTIVITY_PERMANENT_FAILURE, result)
+        writer = storage.writers.values()[0]
+        self.assertTrue(writer.aborted)
+        self.assertIsNone(writer.value)
+
+    @patch.object(activity_module, 'ARCHIVE_THREADS', 1)
+    def test_archive_folder_with_one_thread(self):
+        storage = FakeArchiveStorageContext(self.files)
+        with patch('activity.activity_ArchiveArticle.StorageContext') as fake_storage_context:
+            fake_storage_context.return_value = storage
+            self.archivearticle.archive_folder("s3://origin_bucket/00353.1", "s3://archive_bucket/a.zip")
+        with zipfile.ZipFile(StringIO.StringIO(storage.writers["s3://archive_bucket/a.zip"].value)) as zip_file:
+            self.assertEqual(3, len(zip_file.namelist()))
+            self.assertIsNone(zip_file.testzip())
+
+    def test_compress_type(self):
+        self.assertEqual(zipfile.ZIP_STORED, compress_type("elife-00353-fig1-v1.JPG"))
+        self.assertEqual(zipfile.ZIP_STORED, compress_type("elife-00353-v1.pdf"))
+        self.assertEqual(zipfile.ZIP_STORED, compress_type("elife-00353-media1.mp4"))
+        self.assertEqual(zipfile.ZIP_DEFLATED, compress_type("elife-00353-v1.xml"))
+        self.assertEqual(zipfile.ZIP_DEFLATED, compress_type("elife-00353-fig1-v1.tif"))
+        self.assertEqual(zipfile.ZIP_DEFLATED, compress_type("README"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -27,7 +27,7 @@ class TestConvertJATS(unittest.TestCase):
     @patch.object(activity_ConvertJATS, 'add_update_date_to_json')
     @patch.object(activity_ConvertJATS, 'get_article_xml_key')
     @patch('activity.activity_ConvertJATS.Key')
-    @patch('activity.activity_ConvertJATS.S3Connection')
+    @patch('provider.connections.S3Connection')
     @patch('activity.activity_ConvertJATS.Session')
     def test_do_activity(self, fake_session_mock, fake_s3_mock, fake_key_mock, fake_get_article_xml_key, fake_add_update_date_to_json):
         directory = TempDirectory()
@@ -175,7 +175,7 @@ class TestCopyGlencoeStillImages(unittest.TestCase):
         # Then
         self.assertEqual(1, len(result_bad_files))
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     @patch('activity.activity_CopyGlencoeStillImages.StorageContext')
     def test_store_file_according_to_the_current_article_id_whatever_is_the_filename_on_glencoe(self, fake_storage_context, fake_requests_get):
         fake_storage_context.return_value = FakeStorageContext()
@@ -184,5 +184,46 @@ class TestCopyGlencoeStillImages(unittest.TestCase):
         cdn_jpg_filename = self.copyglencoestillimages.store_file("http://glencoe.com/some-dir/elife-00666-media1.jpg", "12345600666")
         self.assertEqual(cdn_jpg_filename, "elife-12345600666-media1.jpg")
 
+    @patch('requests.Session.get')
+    @patch('activity.activity_CopyGlencoeStillImages.StorageContext')
+    def test_store_jpgs(self, fake_storage_context, fake_requests_get):
+        fake_storage_context.return_value = MagicMock()
+        fake_requests_get.return_value = MagicMock()
+        fake_requests_get.return_value.status_code = 200
+        fake_requests_get.return_value.headers = {'content-type': 'image/jpeg'}
+        # create the child mock before the store threads look it up
+        set_resource_from_stream = fake_storage_context.return_value.set_resource_from_stream
+        glencoe_jpgs = ["http://glencoe.com/some-dir/elife-00666-media%s.jpg" % index
+                        for index in range(1, 11)]
+
+        cdn_still_jpgs = self.copyglencoestillimages.store_jpgs(glencoe_jpgs, "00666")
+
+        self.assertEqual(["elife-00666-media%s.jpg" % index for index in range(1, 11)],
+                         cdn_still_jpgs)
+        # one storage context is shared by every still
+        self.assertEqual(1, fake_storage_context.call_count)
+        self.assertEqual(10, set_resource_from_stream.call_count)
+        set_resource_from_stream.assert_any_call(
+            "s3:///00666/elife-00666-media1.jpg",
+            fake_requests_get.return_value.raw, metadata={'Content-Type': 'image/jpeg'})
+        fake_requests_get.assert_any_call(glencoe_jpgs[0], stream=True)
+
+    @patch('requests.Session.get')
+    @patch('activity.activity_CopyGlencoeStillImages.StorageContext')
+    def test_store_jpgs_error_status(self, fake_storage_context, fake_requests_get):
+        fake_storage_context.return_value = FakeStorageContext()
+        fake_requests_get.return_value = MagicMock()
+        fake_requests_get.return_value.status_code = 404
+        self.assertRaises(RuntimeError, self.copyglencoestillimages.store_jpgs,
+                          ["http://glencoe.com/some-dir/elife-00666-media1.jpg"], "00666")
+
+    def test_validate_jpgs_against_cdn_duplicate_names(self):
+        cdn_all_files = ["elife-00666-media1-v1.mp4", "elife-00666-media1-v1.jpg",
+                         "elife-00666-media1-v1.wmv", "elife-00666-media2-v1.jpg"]
+        cdn_still_jpgs = ["elife-00666-media1-v1.jpg", "elife-00666-media2-v1.jpg"]
+        result_bad_files = self.copyglencoestillimages.validate_jpgs_against_cdn(
+            cdn_all_files, cdn_still_jpgs, "00666")
+        self.assertEqual(["elife-00666-media1-v1", "elife-00666-media2-v1"], result_bad_files)
+
 if __name__ == '__main__':
     unittest.main()
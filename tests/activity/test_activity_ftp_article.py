@@ -102,6 +102,21 @@ class TestFTPArticle(unittest.TestCase):
         with zipfile.ZipFile(os.path.join(ftp_outbox_dir, expected_zip_file)) as zip_file:
             self.assertEqual(sorted(zip_file.namelist()), sorted(expected_zip_file_contents))
 
+    def test_move_or_repackage_pmc_zip_xml_pdf_files(self):
+        # create activity directories
+        self.activity.create_activity_directories()
+        input_dir = os.path.join(self.activity.get_tmp_dir(), self.activity.INPUT_DIR)
+        with zipfile.ZipFile(os.path.join(input_dir, 'elife-05-19405.zip'), 'w') as input_zip:
+            for name in ['elife-19405.xml', 'elife-19405.pdf', 'elife-19405-supp1.pdf',
+                         'elife-19405-data1.xml', 'elife-19405-fig1.tif', 'figures/elife-19405-fig1.pdf']:
+                input_zip.writestr(name, name)
+        self.activity.move_or_repackage_pmc_zip(19405, 'Cengage')
+        ftp_outbox_dir = os.path.join(self.activity.get_tmp_dir(), self.activity.FTP_TO_SOMEWHERE_DIR)
+        with zipfile.ZipFile(os.path.join(ftp_outbox_dir, 'elife-19405-xml-pdf.zip')) as zip_file:
+            self.assertEqual(sorted(zip_file.namelist()),
+                             ['elife-19405-data1.xml', 'elife-19405-supp1.pdf',
+                              'elife-19405.pdf', 'elife-19405.xml'])
+            self.assertEqual(zip_file.read('elife-19405.pdf'), 'elife-19405.pdf')
 
     def test_repackage_archive_zip_to_pmc_zip(self):
         input_zip_file_path = 'tests/test_data/pmc/elife-19405-vor-v1-20160802113816.zip'
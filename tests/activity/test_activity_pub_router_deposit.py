@@ -1,7 +1,21 @@
 import unittest
 from activity.activity_PubRouterDeposit import activity_PubRouterDeposit
+import provider.article_processing as article_processing
 import settings_mock
 from ddt import ddt, data, unpack
+from mock import patch
+
+
+class FakeKey(object):
+    def __init__(self, name, last_modified):
+        self.name = name
+        self.last_modified = last_modified
+
+
+class FakeArticle(object):
+    def __init__(self, doi_id):
+        self.doi_id = doi_id
+
 
 @ddt
 class TestPubRouterDeposit(unittest.TestCase):
@@ -20,9 +34,35 @@ class TestPubRouterDeposit(unittest.TestCase):
            "expected": "elife-16747-vor-v2-20160831000000.zip"}
           )
     def test_latest_archive_zip_revision(self, input, expected):
-        output = self.pubrouterdeposit.latest_archive_zip_revision("16747", input, "elife", "vor")
+        output = article_processing.latest_archive_zip_revision_from_index(
+            "16747", article_processing.archive_zip_index(input), "elife", "vor")
         self.assertEqual(output, expected)
 
+    @patch('activity.activity_PubRouterDeposit.connections.s3_connection')
+    @patch('provider.s3lib.get_s3_keys_from_bucket')
+    def test_archive_zip_file_name_lists_bucket_once(self, fake_get_keys, fake_connection):
+        fake_get_keys.return_value = [
+            FakeKey("elife-16747-vor-v1-20160831000000.zip", "2017-05-18T09:04:11.000Z"),
+            FakeKey("elife-16747-vor-v2-20160831000000.zip", "2015-01-05T00:20:50.000Z"),
+            FakeKey("elife-06498-vor-v1-20150101000000.zip", "2015-01-01T00:00:00.000Z")]
+        self.assertEqual(self.pubrouterdeposit.archive_zip_file_name(FakeArticle("16747")),
+                         "elife-16747-vor-v2-20160831000000.zip")
+        self.assertEqual(self.pubrouterdeposit.archive_zip_file_name(FakeArticle("06498")),
+                         "elife-06498-vor-v1-20150101000000.zip")
+        self.assertIsNone(self.pubrouterdeposit.archive_zip_file_name(FakeArticle("08411")))
+        self.assertEqual(fake_get_keys.call_count, 1)
+
+    @patch('activity.activity_PubRouterDeposit.connections.s3_connection')
+    @patch('provider.s3lib.get_s3_key_names_from_bucket')
+    def test_does_source_zip_exist_from_s3_lists_folder_once(self, fake_get_key_names,
+                                                             fake_connection):
+        fake_get_key_names.return_value = ['pmc/zip/elife-05-19405.zip',
+                                           'pmc/zip/elife-06-24052.r1.zip']
+        self.assertTrue(self.pubrouterdeposit.does_source_zip_exist_from_s3(19405))
+        self.assertTrue(self.pubrouterdeposit.does_source_zip_exist_from_s3("24052"))
+        self.assertFalse(self.pubrouterdeposit.does_source_zip_exist_from_s3(8411))
+        self.assertEqual(fake_get_key_names.call_count, 1)
+
 
 if __name__ == '__main__':
     unittest.main()
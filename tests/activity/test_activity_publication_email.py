@@ -363,6 +363,32 @@ class TestPublicationEmail(unittest.TestCase):
             result = self.activity.send_email(None, None, failed_author, None, None)
             self.assertEqual(result, False)
 
+    @patch.object(SimpleDB, 'elife_get_email_queue_items')
+    @patch.object(SimpleDB, 'elife_get_email_queue_items_by_doi_ids')
+    def test_is_duplicate_email_from_queued_emails(self, fake_get_items_by_doi_ids,
+                                                   fake_get_items):
+        fake_get_items_by_doi_ids.return_value = [
+            {"doi_id": "00013", "email_type": "author_publication_email_VOR_no_POA",
+             "recipient_email": "author@example.org"}]
+        self.activity.load_queued_emails(["00013", "03385"])
+        self.assertTrue(self.activity.is_duplicate_email(
+            "00013", "author_publication_email_VOR_no_POA", "author@example.org"))
+        self.assertFalse(self.activity.is_duplicate_email(
+            "00013", "author_publication_email_VOR_no_POA", "other@example.org"))
+        self.assertFalse(self.activity.is_duplicate_email(
+            "03385", "author_publication_email_VOR_no_POA", "author@example.org"))
+        self.assertEqual(fake_get_items.call_count, 0)
+
+    @patch.object(SimpleDB, 'elife_get_email_queue_items')
+    @patch.object(SimpleDB, 'elife_get_email_queue_items_by_doi_ids')
+    def test_is_duplicate_email_load_error(self, fake_get_items_by_doi_ids, fake_get_items):
+        fake_get_items_by_doi_ids.side_effect = Exception("SimpleDB is down")
+        fake_get_items.return_value = [{"Count": "1"}]
+        self.activity.load_queued_emails(["00013"])
+        self.assertTrue(self.activity.is_duplicate_email(
+            "00013", "author_publication_email_VOR_no_POA", "author@example.org"))
+        self.assertEqual(fake_get_items.call_count, 3)
+
 
 if __name__ == '__main__':
     unittest.main()
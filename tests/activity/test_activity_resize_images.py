@@ -63,6 +63,30 @@ class TestResizeImages(unittest.TestCase):
                     real_width, real_height = self.get_image_dimensions(fname)
                     self.assertEqual(width, real_width)
 
+    def test_get_concurrency_defaults(self):
+        self.assertEqual(self.resizeimages.get_concurrency(), 1)
+
+    @patch.object(activity_ResizeImages, 'process_key')
+    def test_process_keys_in_threads(self, mock_process_key):
+        self.resizeimages.get_concurrency = mock.MagicMock(return_value=3)
+        keys = []
+        for key_name in testdata.key_names:
+            key = FakeKey()
+            key.name = key_name
+            keys.append(key)
+        self.resizeimages.process_keys(keys, 'cdn_path')
+        self.assertEqual(mock_process_key.call_count, len(keys))
+        self.resizeimages.clean_tmp_dir()
+
+    @patch.object(activity_ResizeImages, 'process_key')
+    def test_process_keys_raises_error(self, mock_process_key):
+        self.resizeimages.get_concurrency = mock.MagicMock(return_value=2)
+        mock_process_key.side_effect = RuntimeError("error resizing image")
+        key = FakeKey()
+        key.name = testdata.key_names[0]
+        self.assertRaises(RuntimeError, self.resizeimages.process_keys, [key, key], 'cdn_path')
+        self.resizeimages.clean_tmp_dir()
+
     @pytest.mark.skipif('settings' not in sys.modules, reason='settings.py config not available to run the test on a real S3 bucket')
     def test_get_file_pointer_gives_a_local_pointer_to_a_full_copy_of_the_file(self):
         key = self.sample_bucket_key_for_a_tif_file()
@@ -0,0 +1,107 @@
+import unittest
+from mock import patch, MagicMock
+from activity.activity_S3Monitor import activity_S3Monitor
+import settings_mock
+
+
+class FakeKey(object):
+    def __init__(self, name, etag, last_modified):
+        self.name = name
+        self.content_type = 'application/xml'
+        self.etag = etag
+        self.last_modified = last_modified
+        self.owner = None
+        self.storage_class = 'STANDARD'
+        self.size = 100
+
+
+class FakePrefix(object):
+    def __init__(self, name):
+        self.name = name
+
+
+class TestS3Monitor(unittest.TestCase):
+
+    def setUp(self):
+        self.s3monitor = activity_S3Monitor(settings_mock, MagicMock(), None, None, None)
+        self.s3monitor.db = MagicMock()
+        self.s3monitor.db.elife_get_S3_file_items_by_prefix.return_value = {
+            'bucket/unchanged.xml': {'etag': '"1"', 'last_modified': '2017-01-01T00:00:00.000Z'},
+            'bucket/changed.xml': {'etag': '"1"', 'last_modified': '2017-01-01T00:00:00.000Z'},
+            'bucket/folder/': {}
+        }
+
+    def put_items(self, domain_name):
+        for call_args in self.s3monitor.db.batch_put_attributes.call_args_list:
+            if call_args[0][0] == domain_name:
+                return call_args[0][1]
+
+    def test_sync_keys_and_folder_items(self):
+        keys = [
+            FakeKey('unchanged.xml', '"1"', '2017-01-01T00:00:00.000Z'),
+            FakeKey('changed.xml', '"2"', '2017-01-02T00:00:00.000Z'),
+            FakeKey('new.xml', '"3"', '2017-01-03T00:00:00.000Z')
+        ]
+        folders = [FakePrefix('folder/'), FakePrefix('new_folder/')]
+        self.s3monitor.sync_keys_and_folder_items(keys, folders, 'bucket', 1483228800, '', '/')
+
+        items = self.put_items("S3File")
+        self.assertEqual(sorted(items.keys()),
+                         ['bucket/changed.xml', 'bucket/new.xml', 'bucket/new_folder/'])
+        self.assertEqual(items['bucket/changed.xml']['etag'], '"2"')
+        self.assertEqual(items['bucket/changed.xml']['last_modified_timestamp'], 1483315200)
+        self.assertEqual(items['bucket/new_folder/']['_runtime_timestamp'], 1483228800)
+
+        log_items = self.put_items("S3FileLog")
+        self.assertEqual(sorted(log_items.keys()),
+                         ['1483315200_bucket/changed.xml', '1483401600_bucket/new.xml'])
+
+    def test_existing_items_selected_once_per_run(self):
+        self.s3monitor.sync_keys_and_folder_items([], [], 'bucket', None, '', '/')
+        self.s3monitor.sync_keys_and_folder_items([], [], 'bucket', None, 'folder/', '/')
+        self.assertEqual(self.s3monitor.db.elife_get_S3_file_items_by_prefix.call_count, 1)
+        self.assertEqual(self.s3monitor.db.batch_put_attributes.call_count, 0)
+
+    def crawl(self, max_depth):
+        tree = {
+            '': (['root.xml'], ['a/', 'b/']),
+            'a/': (['a/1.xml'], ['a/c/']),
+            'b/': ([], []),
+            'a/c/': (['a/c/2.xml'], ['a/c/d/']),
+            'a/c/d/': (['a/c/d/3.xml'], [])
+        }
+
+        def get_keys_and_folders(bucket, prefix=None, delimiter='/', headers=None):
+            key_names, folder_names = tree[prefix]
+            return ([FakeKey(name, '"1"', None) for name in key_names],
+                    [FakePrefix(name) for name in folder_names])
+
+        self.s3monitor.get_keys_and_folders = get_keys_and_folders
+        return list(self.s3monitor.crawl_keys_and_folders(MagicMock(), '', '/', max_depth))
+
+    def test_crawl_keys_and_folders(self):
+        crawled = self.crawl(None)
+        self.assertEqual(sorted([prefix for (prefix, keys, folders) in crawled]),
+                         ['', 'a/', 'a/c/', 'a/c/d/', 'b/'])
+        key_names = sorted([key.name for (prefix, keys, folders) in crawled for key in keys])
+        self.assertEqual(key_names, ['a/1.xml', 'a/c/2.xml', 'a/c/d/3.xml', 'root.xml'])
+
+    def test_crawl_keys_and_folders_max_depth(self):
+        crawled = self.crawl(2)
+        self.assertEqual(sorted([prefix for (prefix, keys, folders) in crawled]),
+                         ['', 'a/', 'b/'])
+
+    def test_crawl_keys_and_folders_error(self):
+        self.s3monitor.get_keys_and_folders = MagicMock(side_effect=IOError("list failed"))
+        crawl = self.s3monitor.crawl_keys_and_folders(MagicMock(), '', '/')
+        self.assertRaises(IOError, list, crawl)
+
+    def test_crawl_depth_setting(self):
+        self.assertEqual(self.s3monitor.get_crawl_depth(), 2)
+
+    def test_bulk_sync_setting(self):
+        self.assertFalse(self.s3monitor.bulk_sync())
+
+
+if __name__ == '__main__':
+    unittest.main()
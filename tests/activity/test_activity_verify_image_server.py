@@ -21,6 +21,15 @@ class TestVerifyImageServer(unittest.TestCase):
     def setUp(self):
         self.verifyimageserver = activity_VerifyImageServer(settings_mock, None, None, None, None)
 
+    def test_get_iiif_threads(self):
+        settings = MagicMock()
+        settings.iiif_threads = 4
+        self.verifyimageserver.settings = settings
+        self.assertEqual(self.verifyimageserver.get_iiif_threads(), 4)
+        # no more threads than the shared session keeps connections
+        settings.iiif_threads = 32
+        self.assertEqual(self.verifyimageserver.get_iiif_threads(), 8)
+
     @patch('activity.activity_VerifyImageServer.StorageContext')
     @patch('activity.activity_VerifyImageServer.Session')
     @patch.object(activity_VerifyImageServer,'retrieve_endpoints_check')
@@ -53,6 +62,19 @@ class TestVerifyImageServer(unittest.TestCase):
         # Then
         self.assertEqual(result, self.verifyimageserver.ACTIVITY_PERMANENT_FAILURE)
 
+    @patch('provider.iiif.check_endpoint')
+    def test_retrieve_endpoints_check(self, fake_check_endpoint):
+        fake_check_endpoint.side_effect = lambda endpoint, logger, attempts, deadline: {
+            'endpoint': endpoint, 'success': 'fig2' not in endpoint, 'status_code': 200,
+            'attempts': 1, 'seconds': 0.1}
+        self.verifyimageserver.logger = MagicMock()
+        results = self.verifyimageserver.retrieve_endpoints_check(
+            ['elife-00353-fig1-v1.tif', 'elife-00353-fig2-v1.tif'], '00353/{article_fig}/info.json')
+        self.assertEqual([(True, settings_mock.path_to_iiif_server + '00353/elife-00353-fig1-v1.tif/info.json'),
+                          (False, settings_mock.path_to_iiif_server + '00353/elife-00353-fig2-v1.tif/info.json')],
+                         results)
+        self.assertEqual(2, self.verifyimageserver.logger.info.call_count)
+
     @patch('activity.activity_VerifyImageServer.StorageContext')
     @patch('activity.activity_VerifyImageServer.Session')
     @patch.object(activity_VerifyImageServer,'retrieve_endpoints_check')
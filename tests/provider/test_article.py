@@ -1,4 +1,6 @@
 import unittest
+import json
+import time
 from provider.article import article
 import tests.settings_mock as settings_mock
 import tests.test_data as test_data
@@ -68,6 +70,71 @@ class TestProviderArticle(unittest.TestCase):
             tweet_url,
             "http://twitter.com/intent/tweet?text=https%3A%2F%2Fdoi.org%2F10.7554%2FeLife.08411+%40eLife")
 
+    @patch('provider.article.StorageContext')
+    @patch.object(article, 'get_s3_key_names_from_bucket')
+    @patch.object(article, 'get_folder_names_from_bucket')
+    def test_published_folder_index_lists_new_folders(self, mock_folder_names, mock_key_names,
+                                                      mock_storage_context):
+        stored_index = {
+            "last_folder": "pubmed/published/20140923/",
+            "published_dates": {"2104": {"vor": "20140923"}, "3970": {"poa": "20140917"}}}
+        storage = mock_storage_context.return_value
+        storage.get_resource_as_string.return_value = json.dumps(stored_index)
+        mock_folder_names.return_value = ["pubmed/published/20140917/",
+                                          "pubmed/published/20141224/",
+                                          "pubmed/published/20140923/"]
+        folder_key_names = {
+            "pubmed/published/20140923/": ["pubmed/published/20140923/elife02104.xml",
+                                           "pubmed/published/20140923/elife_poa_e04034.xml"],
+            "pubmed/published/20141224/": ["pubmed/published/20141224/elife04034.xml",
+                                           "pubmed/published/20141224/elife02104.xml"]}
+        mock_key_names.side_effect = (
+            lambda bucket_name, prefix, file_extensions: folder_key_names[prefix])
+
+        published_dates = self.articleprovider.published_folder_index(
+            "poa_packaging_bucket", "pubmed/published/", [".xml"])
+
+        self.assertEqual(published_dates, {
+            2104: {"vor": "20140923"},
+            3970: {"poa": "20140917"},
+            4034: {"poa": "20140923", "vor": "20141224"}})
+        self.assertEqual(sorted(call[1]["prefix"] for call in mock_key_names.call_args_list),
+                         ["pubmed/published/20140923/", "pubmed/published/20141224/"])
+        resource, data = storage.set_resource_from_string.call_args[0]
+        self.assertEqual(
+            resource, "s3://poa_packaging_bucket/published_index/pubmed/published/index.json")
+        self.assertEqual(json.loads(data)["last_folder"], "pubmed/published/20141224/")
+
+    @patch('provider.article.StorageContext')
+    @patch.object(article, 'get_s3_key_names_from_bucket')
+    @patch.object(article, 'get_folder_names_from_bucket')
+    def test_check_was_ever_poa_without_stored_index(self, mock_folder_names, mock_key_names,
+                                                     mock_storage_context):
+        storage = mock_storage_context.return_value
+        storage.get_resource_as_string.side_effect = Exception("no index")
+        mock_folder_names.return_value = ["published/20140508/"]
+        mock_key_names.return_value = ["published/20140508/elife_poa_e02419.xml",
+                                       "published/20140508/elife_poa_e02444v2.xml"]
+        self.assertTrue(self.articleprovider.check_was_ever_poa("10.7554/eLife.02444"))
+        self.assertFalse(self.articleprovider.check_was_ever_poa("10.7554/eLife.08411"))
+        self.assertEqual(storage.set_resource_from_string.call_count, 1)
+
+    @patch('provider.article.StorageContext')
+    @patch.object(article, 'get_s3_key_names_from_bucket')
+    @patch.object(article, 'get_folder_names_from_bucket')
+    def test_get_article_bucket_pub_date_from_index(self, mock_folder_names, mock_key_names,
+                                                    mock_storage_context):
+        storage = mock_storage_context.return_value
+        storage.get_resource_as_string.return_value = json.dumps({
+            "last_folder": "pubmed/published/20140917/",
+            "published_dates": {"3970": {"poa": "20140917"}}})
+        mock_folder_names.return_value = ["pubmed/published/20140917/"]
+        mock_key_names.return_value = []
+        pub_date = self.articleprovider.get_article_bucket_pub_date("10.7554/eLife.03970", "POA")
+        self.assertEqual(time.strftime("%Y-%m-%d", pub_date), "2014-09-17")
+        self.assertEqual(storage.set_resource_from_string.call_count, 1)
+
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import os
+import time
+from mock import patch
+from testfixtures import TempDirectory
+from elifetools import xmlio
+import provider.article_document as article_document
+from provider.article_document import ArticleDocument
+
+
+class TestArticleDocument(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = TempDirectory()
+
+    def tearDown(self):
+        TempDirectory.cleanup_all()
+
+    def test_fields(self):
+        document = article_document.load('tests/test_data/pmc/elife-19405-v1.xml', None)
+        self.assertEqual(document.doi, '10.7554/eLife.19405')
+        self.assertEqual(document.doi_id, '19405')
+        self.assertEqual(document.volume, '5')
+        self.assertEqual(document.article_type, 'article-commentary')
+        self.assertFalse(document.is_poa)
+        self.assertEqual(time.strftime('%Y-%m-%d', document.pub_date), '2016-08-09')
+        self.assertEqual(document.pub_date_timestamp, 1470700800)
+        self.assertEqual(document.authors[0], {
+            'surname': 'Yamashita', 'given-names': 'Yukiko M', 'corresponding': True})
+        self.assertTrue('elife-19405-fig1-v1' in document.xlink_hrefs)
+
+    def test_is_poa(self):
+        document = article_document.load('tests/test_data/elife_poa_e03977.xml', None)
+        self.assertTrue(document.is_poa)
+
+    def test_fields_read_from_article_meta(self):
+        xml = ('<article><front><article-meta>'
+               '<article-id pub-id-type="doi">10.7554/eLife.03977</article-id>'
+               '<title-group><article-title>Article title</article-title></title-group>'
+               '</article-meta></front><back><ref-list><ref><element-citation>'
+               '<article-title>Reference title</article-title><volume>12</volume>'
+               '<pub-date date-type="pub"><year>2010</year></pub-date>'
+               '</element-citation></ref></ref-list></back></article>')
+        document = ArticleDocument(xml, None)
+        self.assertEqual(document.volume, None)
+        self.assertEqual(document.title, 'Article title')
+        self.assertEqual(document.pub_date, None)
+        self.assertTrue(document.is_poa)
+
+    def test_convert_xlink_href(self):
+        xml_file = 'tests/files_source/ApplyVersionNumber/elife-15224-v1.xml'
+        file_name_map = {'elife-15224-fig1-figsupp1.tif': 'elife-15224-fig1-figsupp1-v1.tif'}
+        document = article_document.load(xml_file, None)
+
+        self.assertEqual(document.convert_xlink_href(file_name_map), 1)
+
+        # output is the same as converting with xmlio
+        xmlio.register_xmlns()
+        root, doctype_dict = xmlio.parse(xml_file, return_doctype_dict=True)
+        xmlio.convert_xlink_href(root, file_name_map)
+        self.assertEqual(document.to_xml(), xmlio.output(root, type=None, doctype_dict=doctype_dict))
+        self.assertTrue('elife-15224-fig1-figsupp1-v1' in document.xlink_hrefs)
+
+    def test_unchanged_xml_is_not_output_again(self):
+        xml = '<article><front/><!-- comment --></article>'
+        document = ArticleDocument(xml, None)
+        self.assertEqual(document.convert_xlink_href({'a.tif': 'b.tif'}), 0)
+        self.assertEqual(document.to_xml(), xml)
+
+    def test_fields_cached_by_content(self):
+        with open('tests/test_data/pmc/elife-19405-v1.xml', 'rb') as open_file:
+            xml = open_file.read()
+        document = ArticleDocument(xml, self.directory.path)
+        self.assertEqual(document.doi, '10.7554/eLife.19405')
+        self.assertEqual(os.listdir(self.directory.path),
+                         ['%s-v%s.json' % (document.content_hash, article_document.CACHE_VERSION)])
+
+        with patch.object(ArticleDocument, 'parse_fields') as fake_parse_fields:
+            cached_document = ArticleDocument(xml, self.directory.path)
+            self.assertEqual(cached_document.doi, '10.7554/eLife.19405')
+            self.assertEqual(cached_document.authors, document.authors)
+            self.assertEqual(fake_parse_fields.call_count, 0)
+            # the XML is not parsed to read cached values
+            self.assertEqual(cached_document._root, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
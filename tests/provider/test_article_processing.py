@@ -1,6 +1,8 @@
 import unittest
 import os
+import struct
 import zipfile
+from mock import patch
 from ddt import ddt, data, unpack
 from testfixtures import tempdir
 from testfixtures import TempDirectory
@@ -46,6 +48,28 @@ class TestArticleProcessing(unittest.TestCase):
         output = article_processing.latest_archive_zip_revision("16747", input, "elife", "vor")
         self.assertRaises(ValueError)
 
+    def test_archive_zip_index(self):
+        s3_keys = [
+            {"name": "elife-16747-vor-v1-20160831000000.zip", "last_modified": "2017-05-18T09:04:11.000Z"},
+            {"name": "elife-16747-vor-v2-20160831000000.zip", "last_modified": "2015-01-05T00:20:50.000Z"},
+            {"name": "elife-16747-poa-v1-20160801000000.zip", "last_modified": "2016-08-01T00:00:00.000Z"},
+            {"name": "elife-06498-vor-v3-20150101000000.zip", "last_modified": "this_is_junk_for_testing"},
+            {"name": "elife-06498-vor-v1-20150101000000.zip", "last_modified": "2015-01-01T00:00:00.000Z"},
+            {"name": "not-an-archive-zip.txt", "last_modified": "2015-01-01T00:00:00.000Z"}]
+        index = article_processing.archive_zip_index(s3_keys)
+        self.assertEqual(article_processing.latest_archive_zip_revision_from_index(
+            "16747", index, "elife", "vor"), "elife-16747-vor-v2-20160831000000.zip")
+        self.assertEqual(article_processing.latest_archive_zip_revision_from_index(
+            16747, index, "elife", "poa"), "elife-16747-poa-v1-20160801000000.zip")
+        self.assertEqual(article_processing.latest_archive_zip_revision_from_index(
+            "6498", index, "elife", "vor"), "elife-06498-vor-v1-20150101000000.zip")
+        self.assertIsNone(article_processing.latest_archive_zip_revision_from_index(
+            "8411", index, "elife", "vor"))
+        for doi_id in ["16747", "06498", "08411"]:
+            self.assertEqual(
+                article_processing.latest_archive_zip_revision_from_index(doi_id, index, "elife", "vor"),
+                article_processing.latest_archive_zip_revision(doi_id, s3_keys, "elife", "vor"))
+
 
     def test_convert_xml(self):
         xml_file = 'elife-19405-v1.xml'
@@ -100,6 +124,77 @@ class TestArticleProcessing(unittest.TestCase):
         article_processing.rename_files_remove_version_number(files_dir_path, output_dir_path)
 
 
+    def test_zip_member_names_top_level_only(self):
+        zip_file_path = os.path.join(self.directory.path, 'elife-00353.zip')
+        with zipfile.ZipFile(zip_file_path, 'w') as zip_file:
+            zip_file.writestr('elife-00353-v1.xml', '<article/>')
+            zip_file.writestr('figures/', '')
+            zip_file.writestr('figures/elife-00353-fig1-v1.tif', 'tif')
+        self.assertEqual(article_processing.zip_member_names(zip_file_path),
+                         ['elife-00353-v1.xml'])
+
+    def test_copy_zip_members(self):
+        zip_file_path = 'tests/test_data/pmc/elife-19405-vor-v1-20160802113816.zip'
+        new_zip_file_path = os.path.join(self.directory.path, 'elife-05-19405.zip')
+        member_names = article_processing.zip_member_names(zip_file_path)
+        self.assertEqual(sorted(member_names), [
+            'elife-19405-fig1-v1.tif', 'elife-19405-inf1-v1.tif',
+            'elife-19405-v1.pdf', 'elife-19405-v1.xml'])
+        member_map = article_processing.file_name_map_remove_version_number(
+            article_processing.filter_member_names(member_names, ['*.pdf', '*-fig1-*.tif']))
+        self.assertEqual(member_map, {'elife-19405-fig1-v1.tif': 'elife-19405-fig1.tif',
+                                      'elife-19405-v1.pdf': 'elife-19405.pdf'})
+
+        with article_processing.new_zip(new_zip_file_path) as new_zipfile:
+            article_processing.copy_zip_members(zip_file_path, new_zipfile, member_map)
+            new_zipfile.writestr('elife-19405.xml', '<article/>')
+
+        with zipfile.ZipFile(zip_file_path) as zip_file:
+            with zipfile.ZipFile(new_zip_file_path) as new_zip_file:
+                self.assertEqual(new_zip_file.testzip(), None)
+                self.assertEqual(sorted(new_zip_file.namelist()), [
+                    'elife-19405-fig1.tif', 'elife-19405.pdf', 'elife-19405.xml'])
+                for old_name, new_name in member_map.items():
+                    old_info = zip_file.getinfo(old_name)
+                    new_info = new_zip_file.getinfo(new_name)
+                    self.assertEqual(new_info.compress_type, old_info.compress_type)
+                    self.assertEqual(new_info.compress_size, old_info.compress_size)
+                    self.assertEqual(new_info.CRC, old_info.CRC)
+                    self.assertEqual(new_zip_file.read(new_name), zip_file.read(old_name))
+
+    def test_copy_zip_members_zip64(self):
+        zip_file_path = os.path.join(self.directory.path, 'zip64.zip')
+        new_zip_file_path = os.path.join(self.directory.path, 'new.zip')
+        content = 'elife-00353-fig1-v1.tif ' * 100
+        # members larger than ZIP64_LIMIT have zip64 extra fields for their sizes
+        with patch('zipfile.ZIP64_LIMIT', 100):
+            with zipfile.ZipFile(zip_file_path, 'w', zipfile.ZIP_STORED, allowZip64=True) as zip_file:
+                zip_file.writestr('elife-00353-fig1-v1.tif', content)
+            with article_processing.new_zip(new_zip_file_path) as new_zipfile:
+                article_processing.copy_zip_members(
+                    zip_file_path, new_zipfile, {'elife-00353-fig1-v1.tif': 'elife-00353-fig1.tif'})
+
+        with zipfile.ZipFile(new_zip_file_path) as new_zip_file:
+            self.assertEqual(new_zip_file.testzip(), None)
+            self.assertEqual(new_zip_file.read('elife-00353-fig1.tif'), content)
+            new_info = new_zip_file.getinfo('elife-00353-fig1.tif')
+            self.assertEqual(new_info.file_size, len(content))
+            # the local header has its sizes in a zip64 extra field
+            new_zip_file.fp.seek(new_info.header_offset)
+            file_header = struct.unpack(zipfile.structFileHeader,
+                                        new_zip_file.fp.read(zipfile.sizeFileHeader))
+            self.assertEqual(file_header[article_processing.FILE_HEADER_EXTRA_FIELD_LENGTH], 20)
+
+    def test_extract_zip_member(self):
+        zip_file_path = 'tests/test_data/pmc/elife-19405-vor-v1-20160802113816.zip'
+        file_path = article_processing.extract_zip_member(
+            zip_file_path, 'elife-19405-v1.xml', self.directory.path, 'elife-19405.xml')
+        self.assertEqual(file_path, os.path.join(self.directory.path, 'elife-19405.xml'))
+        with zipfile.ZipFile(zip_file_path) as zip_file:
+            with open(file_path, 'rb') as open_file:
+                self.assertEqual(open_file.read(), zip_file.read('elife-19405-v1.xml'))
+
+
     @unpack
     @data(
         ('elife', '1', '7', None, 'elife-01-00007.zip'),
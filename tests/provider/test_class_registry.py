@@ -0,0 +1,117 @@
+import unittest
+import os
+import sys
+import time
+import __builtin__
+from multiprocessing.pool import ThreadPool
+from mock import patch
+from testfixtures import TempDirectory
+from provider.class_registry import ClassRegistry, get_class_reload_on_change
+
+MODULE_SOURCE = """
+import sys
+sys.modules['%(package)s'].loads.append('%(name)s')
+
+class %(name)s(object):
+    version = %(version)s
+"""
+
+
+class TestClassRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = TempDirectory()
+        self.package = 'registry_test_package'
+        self.directory.write(self.package + '/__init__.py', 'loads = []\n')
+        sys.path.insert(0, self.directory.path)
+        self.write_module('activity_PingWorker', 1)
+
+    def tearDown(self):
+        sys.path.remove(self.directory.path)
+        for name in list(sys.modules):
+            if name.startswith(self.package):
+                del sys.modules[name]
+        TempDirectory.cleanup_all()
+
+    def write_module(self, name, version, mtime=1000000000):
+        path = self.directory.write(
+            self.package + '/' + name + '.py',
+            MODULE_SOURCE % {'package': self.package, 'name': name, 'version': version})
+        os.utime(path, (mtime, mtime))
+        # only the source file is read, so a new version is not missed within a second
+        if os.path.exists(path + 'c'):
+            os.remove(path + 'c')
+
+    def loads(self):
+        return sys.modules[self.package].loads
+
+    def test_get_class_imports_once(self):
+        registry = ClassRegistry(self.package)
+        first = registry.get_class('activity_PingWorker')
+        second = registry.get_class('activity_PingWorker')
+        self.assertTrue(first is second)
+        self.assertEqual(first.version, 1)
+        self.assertEqual(self.loads(), ['activity_PingWorker'])
+
+    def test_get_class_timed(self):
+        registry = ClassRegistry(self.package)
+        class_object, seconds = registry.get_class_timed('activity_PingWorker')
+        self.assertEqual(class_object.version, 1)
+        self.assertTrue(seconds >= 0)
+
+    def test_get_class_from_threads(self):
+        registry = ClassRegistry(self.package)
+        registry.get_class('activity_PingWorker')
+        self.write_module('activity_PingWorker', 2, mtime=1000000060)
+
+        def slow_reload(module):
+            # the other threads ask for the class while it is reloaded
+            time.sleep(0.05)
+            return __builtin__.reload(module)
+        pool = ThreadPool(8)
+        try:
+            with patch('provider.class_registry.reload', slow_reload, create=True):
+                versions = pool.map(lambda _: registry.get_class('activity_PingWorker').version,
+                                    range(40))
+        finally:
+            pool.close()
+            pool.join()
+        self.assertEqual(versions, [2] * 40)
+        # the changed module is reloaded by one thread only
+        self.assertEqual(self.loads(), ['activity_PingWorker'] * 2)
+
+    def test_get_class_reloads_changed_file(self):
+        registry = ClassRegistry(self.package)
+        self.assertEqual(registry.get_class('activity_PingWorker').version, 1)
+        self.write_module('activity_PingWorker', 2, mtime=1000000060)
+        self.assertEqual(registry.get_class('activity_PingWorker').version, 2)
+        self.assertEqual(self.loads(), ['activity_PingWorker'] * 2)
+
+    def test_reload_on_change_disabled(self):
+        registry = ClassRegistry(self.package, reload_on_change=False)
+        registry.get_class('activity_PingWorker')
+        self.write_module('activity_PingWorker', 2, mtime=1000000060)
+        self.assertEqual(registry.get_class('activity_PingWorker').version, 1)
+        # until a reload is requested
+        registry.request_reload()
+        self.assertEqual(registry.get_class('activity_PingWorker').version, 2)
+        self.assertEqual(registry.get_class('activity_PingWorker').version, 2)
+        self.assertEqual(self.loads(), ['activity_PingWorker'] * 2)
+
+    def test_get_class_not_found(self):
+        registry = ClassRegistry(self.package)
+        self.assertEqual(registry.get_class('activity_DoesNotExist'), None)
+
+
+class TestGetClassReloadOnChange(unittest.TestCase):
+
+    def test_get_class_reload_on_change(self):
+        class settings(object):
+            pass
+        self.assertTrue(get_class_reload_on_change(settings))
+        settings.class_reload_on_change = False
+        self.assertFalse(get_class_reload_on_change(settings))
+
+
+if __name__ == '__main__':
+    unittest.main()
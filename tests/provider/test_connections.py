@@ -0,0 +1,69 @@
+import unittest
+from mock import patch
+import provider.connections as connections
+import tests.settings_mock as settings_mock
+
+
+class TestConnections(unittest.TestCase):
+
+    def setUp(self):
+        connections._registry = None
+
+    def tearDown(self):
+        connections._registry = None
+
+    @patch('provider.connections.S3Connection')
+    def test_s3_connection_not_shared_before_init(self, fake_connection):
+        fake_connection.side_effect = lambda *args, **kwargs: object()
+        first = connections.s3_connection(settings_mock)
+        second = connections.s3_connection(settings_mock)
+        self.assertFalse(connections.is_shared())
+        self.assertIsNot(first, second)
+        self.assertEqual(fake_connection.call_count, 2)
+
+    @patch('provider.connections.S3Connection')
+    def test_s3_connection_shared_after_init(self, fake_connection):
+        fake_connection.side_effect = lambda *args, **kwargs: object()
+        connections.init()
+        first = connections.s3_connection(settings_mock)
+        second = connections.s3_connection(settings_mock)
+        self.assertIs(first, second)
+        self.assertEqual(fake_connection.call_count, 1)
+
+    @patch('provider.connections.S3Connection')
+    def test_s3_connection_keyed_by_host(self, fake_connection):
+        fake_connection.side_effect = lambda *args, **kwargs: object()
+        connections.init()
+        first = connections.s3_connection(settings_mock)
+        second = connections.s3_connection(settings_mock, host='s3.example.org')
+        self.assertIsNot(first, second)
+
+    @patch('boto.sqs.connect_to_region')
+    def test_sqs_connection_keyed_by_region(self, fake_connect):
+        fake_connect.side_effect = lambda *args, **kwargs: object()
+        connections.init()
+        first = connections.sqs_connection(settings_mock)
+        self.assertIs(first, connections.sqs_connection(settings_mock))
+        self.assertIsNot(first, connections.sqs_connection(settings_mock, region='eu-west-1'))
+
+    @patch('provider.connections.S3Connection')
+    def test_reset(self, fake_connection):
+        fake_connection.side_effect = lambda *args, **kwargs: object()
+        connections.init()
+        first = connections.s3_connection(settings_mock)
+        connections.reset()
+        self.assertTrue(connections.is_shared())
+        self.assertIsNot(first, connections.s3_connection(settings_mock))
+
+    def test_get_requests_session(self):
+        session = connections.get_requests_session('iiif', 4)
+        self.assertIs(session, connections.get_requests_session('iiif', 4))
+        self.assertIsNot(session, connections.get_requests_session('lax', 4))
+        self.assertEqual(session.get_adapter('https://example.org')._pool_maxsize, 4)
+        # sessions are forgotten after a fork whether or not connections are shared
+        connections.reset()
+        self.assertIsNot(session, connections.get_requests_session('iiif', 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
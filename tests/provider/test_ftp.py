@@ -0,0 +1,196 @@
+import unittest
+import os
+import socket
+import ftplib
+from mock import MagicMock, patch
+from testfixtures import TempDirectory
+import provider.ftp as ftp_provider
+from provider.ftp import FTPSessionManager
+
+
+class TestFTPSessionManager(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = TempDirectory()
+        self.files = []
+        for index in range(4):
+            path = self.directory.write("elife-0035%s.zip" % index, "zip data %s" % index)
+            self.files.append(path)
+        ftp_provider.reset()
+
+    def tearDown(self):
+        TempDirectory.cleanup_all()
+        ftp_provider.reset()
+
+    def fake_ftp(self):
+        ftp = MagicMock()
+        # create the child mocks before the upload threads look them up
+        ftp.voidcmd, ftp.storbinary, ftp.storlines, ftp.cwd, ftp.mkd, ftp.size, ftp.close
+        return ftp
+
+    @patch('provider.ftp.FTP')
+    def test_upload_files_reuses_sessions_and_directories(self, fake_ftp_class):
+        sessions = []
+
+        def new_session(timeout=None):
+            sessions.append(self.fake_ftp())
+            return sessions[-1]
+        fake_ftp_class.side_effect = new_session
+        manager = ftp_provider.get_session_manager("ftp.localhost", "user", "password")
+
+        manager.upload_files(self.files, ftp_provider.remote_dir("cwd", ["00353"]))
+        manager.upload_files(self.files[:1], ftp_provider.remote_dir("cwd", ["00353"]))
+
+        self.assertTrue(1 <= len(sessions) <= ftp_provider.FTP_SESSIONS)
+        for session in sessions:
+            session.login.assert_called_once_with("user", "password")
+        # the directories are looked up once for both calls
+        self.assertEqual(2, sum(session.cwd.call_count for session in sessions))
+        stored = sorted(args[0][0] for session in sessions
+                        for args in session.storbinary.call_args_list)
+        self.assertEqual(["STOR /cwd/00353/elife-00350.zip"] * 2 +
+                         ["STOR /cwd/00353/elife-00351.zip", "STOR /cwd/00353/elife-00352.zip",
+                          "STOR /cwd/00353/elife-00353.zip"], stored)
+        for session in sessions:
+            for args in session.storbinary.call_args_list:
+                self.assertEqual(ftp_provider.FTP_BLOCKSIZE, args[0][2])
+        self.assertTrue(manager is ftp_provider.get_session_manager("ftp.localhost", "user", "password"))
+
+    def test_ensure_directory_creates_missing(self):
+        manager = FTPSessionManager("ftp.localhost", "user", "password")
+        ftp = self.fake_ftp()
+        ftp.cwd.side_effect = [None, ftplib.error_perm("550 not found")]
+        manager.ensure_directory(ftp, "/cwd/00353")
+        ftp.mkd.assert_called_once_with("/cwd/00353")
+        manager.ensure_directory(ftp, "/cwd/00353")
+        self.assertEqual(2, ftp.cwd.call_count)
+
+    def test_upload_resumes_interrupted_transfer(self):
+        manager = FTPSessionManager("ftp.localhost", "user", "password")
+        first, second = self.fake_ftp(), self.fake_ftp()
+        manager.connect = MagicMock(side_effect=[first, second])
+
+        def interrupted(cmd, fp, blocksize, callback):
+            callback(fp.read(4))
+            raise socket.error("connection reset")
+        first.storbinary.side_effect = interrupted
+        second.size.return_value = 4
+        sent = []
+        second.storbinary.side_effect = (
+            lambda cmd, fp, blocksize, callback: sent.append((cmd, fp.read())))
+
+        manager.upload(self.files[0], "/cwd")
+
+        first.close.assert_called_once_with()
+        self.assertEqual([("APPE /cwd/elife-00350.zip", "data 0")], sent)
+        self.assertEqual([second], manager.idle)
+
+    def test_upload_replaces_stale_file_when_nothing_was_sent(self):
+        manager = FTPSessionManager("ftp.localhost", "user", "password")
+        first, second = self.fake_ftp(), self.fake_ftp()
+        manager.connect = MagicMock(side_effect=[first, second])
+        first.storbinary.side_effect = ftplib.error_temp("425 can't open data connection")
+        # a file of the same size from an earlier delivery
+        second.size.return_value = len("zip data 0")
+        sent = []
+        second.storbinary.side_effect = (
+            lambda cmd, fp, blocksize, callback: sent.append((cmd, fp.read())))
+
+        manager.upload(self.files[0], "/cwd")
+
+        self.assertEqual([("STOR /cwd/elife-00350.zip", "zip data 0")], sent)
+        self.assertEqual([second], manager.idle)
+
+    def test_upload_sends_whole_file_when_remote_size_differs(self):
+        manager = FTPSessionManager("ftp.localhost", "user", "password")
+        first, second = self.fake_ftp(), self.fake_ftp()
+        manager.connect = MagicMock(side_effect=[first, second])
+
+        def interrupted(cmd, fp, blocksize, callback):
+            callback(fp.read(4))
+            raise socket.error("connection reset")
+        first.storbinary.side_effect = interrupted
+        second.size.return_value = 2
+        sent = []
+        second.storbinary.side_effect = (
+            lambda cmd, fp, blocksize, callback: sent.append((cmd, fp.read())))
+
+        manager.upload(self.files[0], "/cwd")
+
+        self.assertEqual([("STOR /cwd/elife-00350.zip", "zip data 0")], sent)
+
+    def test_upload_retries_failed_connection(self):
+        manager = FTPSessionManager("ftp.localhost", "user", "password")
+        ftp = self.fake_ftp()
+        manager.connect = MagicMock(side_effect=[socket.error("connection refused"), ftp])
+
+        manager.upload(self.files[0], "/cwd")
+
+        self.assertEqual(1, ftp.storbinary.call_count)
+        self.assertEqual([ftp], manager.idle)
+
+    def test_upload_gives_up(self):
+        manager = FTPSessionManager("ftp.localhost", "user", "password")
+        ftp = self.fake_ftp()
+        ftp.storbinary.side_effect = socket.error("connection reset")
+        ftp.size.return_value = 0
+        manager.connect = MagicMock(return_value=ftp)
+        self.assertRaises(socket.error, manager.upload, self.files[0], "/cwd")
+        self.assertEqual(ftp_provider.TRANSFER_ATTEMPTS, ftp.storbinary.call_count)
+        self.assertEqual([], manager.idle)
+
+    def test_upload_creates_removed_directory(self):
+        manager = FTPSessionManager("ftp.localhost", "user", "password")
+        manager.directories.update(["/cwd", "/cwd/00353"])
+        ftp = self.fake_ftp()
+        # the directory was removed after it was found
+        ftp.storbinary.side_effect = [ftplib.error_perm("553 could not create file"), None]
+        ftp.cwd.side_effect = [None, ftplib.error_perm("550 not found")]
+        manager.connect = MagicMock(return_value=ftp)
+
+        manager.upload(self.files[0], "/cwd/00353")
+
+        ftp.mkd.assert_called_once_with("/cwd/00353")
+        self.assertEqual(2, ftp.storbinary.call_count)
+        self.assertEqual(set(["/", "/cwd", "/cwd/00353"]), manager.directories)
+        self.assertEqual([ftp], manager.idle)
+
+    def test_upload_refused_twice(self):
+        manager = FTPSessionManager("ftp.localhost", "user", "password")
+        ftp = self.fake_ftp()
+        ftp.storbinary.side_effect = ftplib.error_perm("553 permission denied")
+        manager.connect = MagicMock(return_value=ftp)
+        self.assertRaises(ftplib.error_perm, manager.upload, self.files[0], "/cwd")
+        self.assertEqual(2, ftp.storbinary.call_count)
+        self.assertEqual([], manager.idle)
+
+    def test_forget_directory(self):
+        manager = FTPSessionManager("ftp.localhost", "user", "password")
+        manager.directories.update(["/cwd", "/cwd/00353", "/other"])
+        manager.forget_directory("/cwd/00353/")
+        self.assertEqual(set(["/", "/other"]), manager.directories)
+
+    def test_get_session_replaces_closed_session(self):
+        manager = FTPSessionManager("ftp.localhost", "user", "password")
+        stale, fresh = self.fake_ftp(), self.fake_ftp()
+        stale.voidcmd.side_effect = EOFError()
+        manager.idle.append(stale)
+        manager.connect = MagicMock(return_value=fresh)
+        self.assertTrue(manager.get_session() is fresh)
+        stale.close.assert_called_once_with()
+
+    def test_text_files_sent_as_lines(self):
+        manager = FTPSessionManager("ftp.localhost", "user", "password")
+        ftp = self.fake_ftp()
+        path = self.directory.write("readme.txt", "text")
+        manager.send(ftp, path, "/cwd/readme.txt")
+        self.assertEqual("STOR /cwd/readme.txt", ftp.storlines.call_args[0][0])
+
+    def test_remote_dir(self):
+        self.assertEqual("/", ftp_provider.remote_dir(""))
+        self.assertEqual("/cwd/00353", ftp_provider.remote_dir("cwd", ["00353"]))
+        self.assertEqual("/cwd/a/b", ftp_provider.remote_dir("/cwd", ["a", "b"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
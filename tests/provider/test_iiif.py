@@ -1,6 +1,5 @@
 import unittest
 from mock import mock, patch
-from provider.iiif import ShortRetryException
 import provider.iiif as iiif
 
 class ObjectView(object):
@@ -22,25 +21,26 @@ class FakeLogger:
     def error(self, msg, *args, **kwargs):
         self.logerror = msg
 
+@patch('provider.iiif.RETRY_DELAY', 0)
 class TestIiif(unittest.TestCase):
 
     def setUp(self):
         self.fake_logger = FakeLogger()
 
-    @patch('requests.head')
+    @patch('requests.Session.head')
     def test_try_endpoint_ok(self, request_mock):
         self._given_responses(request_mock, 200)
         success, test_endpoint = iiif.try_endpoint("test_endpoint", self.fake_logger)
         self.assertEqual(success, True)
         self.assertEqual(test_endpoint, "test_endpoint")
 
-    @patch('requests.head')
+    @patch('requests.Session.head')
     def test_try_endpoint_error(self, request_mock):
         self._given_responses(request_mock, 500)
         success, test_endpoint = iiif.try_endpoint("test_endpoint", self.fake_logger)
         self.assertEqual(success, False)
 
-    @patch('requests.head')
+    @patch('requests.Session.head')
     def test_try_endpoint_retry_of_generic_timeout(self, request_mock):
         self._given_responses(request_mock, 504, 200)
         success, test_endpoint = iiif.try_endpoint("test_endpoint", self.fake_logger)
@@ -48,20 +48,69 @@ class TestIiif(unittest.TestCase):
 
     # Loris exposes 404 on unretrievable images, at this time
     # even if the original error is a 500
-    @patch('requests.head')
+    @patch('requests.Session.head')
     def test_try_endpoint_retry_of_not_retrievable_image_source(self, request_mock):
         self._given_responses(request_mock, 404, 200)
         success, test_endpoint = iiif.try_endpoint("test_endpoint", self.fake_logger)
         self.assertEqual(success, True)
 
-    @patch('requests.head')
+    @patch('requests.Session.head')
     def test_try_endpoint_error_on_only_retry(self, request_mock):
         self._given_responses(request_mock, 504, 500)
         success, test_endpoint = iiif.try_endpoint("test_endpoint", self.fake_logger)
         self.assertEqual(success, False)
 
+    @patch('requests.Session.head')
+    def test_try_endpoint_gives_up_after_attempts(self, request_mock):
+        self._given_responses(request_mock, 404, 404, 404)
+        success, test_endpoint = iiif.try_endpoint("test_endpoint", self.fake_logger, attempts=3)
+        self.assertEqual(success, False)
+        self.assertEqual(3, request_mock.call_count)
+
+    @patch('provider.iiif.time.sleep')
+    @patch('requests.Session.head')
+    def test_check_endpoint_backs_off_within_deadline(self, request_mock, fake_sleep):
+        with patch('provider.iiif.RETRY_DELAY', 1):
+            self._given_responses(request_mock, 504, 504, 504, 504, 200)
+            report = iiif.check_endpoint("test_endpoint", self.fake_logger, deadline=3)
+        # a third wait, of 4 seconds, would pass the deadline
+        self.assertEqual([1, 2], [args[0][0] for args in fake_sleep.call_args_list])
+        self.assertEqual(False, report['success'])
+        self.assertEqual(504, report['status_code'])
+        self.assertEqual(3, report['attempts'])
+
+    @patch('provider.iiif.time.time')
+    @patch('requests.Session.head')
+    def test_check_endpoint_timeout_within_deadline(self, request_mock, fake_time):
+        fake_time.side_effect = [100, 100, 100, 158, 158, 158]
+        self._given_responses(request_mock, 504, 200)
+        report = iiif.check_endpoint("test_endpoint", self.fake_logger, deadline=60)
+        self.assertEqual(True, report['success'])
+        self.assertEqual([60, 2],
+                         [args[1]['timeout'] for args in request_mock.call_args_list])
+
+    @patch('requests.Session.head')
+    def test_check_endpoint_exception(self, request_mock):
+        request_mock.side_effect = IOError("connection refused")
+        report = iiif.check_endpoint("test_endpoint", self.fake_logger)
+        self.assertEqual(False, report['success'])
+        self.assertIsNone(report['status_code'])
+        self.assertEqual(1, report['attempts'])
+
+    @patch('requests.Session.head')
+    def test_check_endpoints(self, request_mock):
+        request_mock.side_effect = lambda endpoint, timeout: ObjectView(
+            {'status_code': 500 if endpoint == "endpoint_3" else 200, 'content': ''})
+        endpoints = ["endpoint_%s" % index for index in range(10)]
+        reports = iiif.check_endpoints(endpoints, self.fake_logger, threads=4)
+        self.assertEqual(endpoints, [report['endpoint'] for report in reports])
+        self.assertEqual(["endpoint_3"], [report['endpoint'] for report in reports
+                                          if not report['success']])
+        self.assertTrue(all('seconds' in report for report in reports))
+
     def _given_responses(self, request_mock, *status_codes):
-        request_mock.side_effect = [ObjectView({'status_code': code}) for code in status_codes]
+        request_mock.side_effect = [ObjectView({'status_code': code, 'content': ''})
+                                    for code in status_codes]
 
 
 if __name__ == '__main__':
@@ -0,0 +1,92 @@
+import unittest
+import yaml
+from mock import MagicMock, patch
+import provider.imageresize as resizer
+from provider.article_structure import ArticleInfo
+
+
+class FakeImage(object):
+    "stands in for a decoded wand Image"
+    decoded = 0
+
+    def __init__(self, file=None, resolution=None, width=2000, height=1000, format='tiff'):
+        if file is not None:
+            FakeImage.decoded += 1
+        self.width = width
+        self.height = height
+        self.format = format
+        self.resolution = resolution
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        pass
+
+    def clone(self):
+        return FakeImage(width=self.width, height=self.height, format=self.format)
+
+    def convert(self, format):
+        image = self.clone()
+        image.format = format
+        return image
+
+    def resize(self, width, height):
+        self.width = width
+        self.height = height
+
+    def save(self, file):
+        file.write("%s %sx%s" % (self.format, self.width, self.height))
+
+
+class TestProviderImageResize(unittest.TestCase):
+
+    def setUp(self):
+        with open('formats.yaml') as open_file:
+            self.formats = yaml.load(open_file)
+        self.info = ArticleInfo('elife-00353-fig1-v1.tif')
+        FakeImage.decoded = 0
+
+    def test_source_formats(self):
+        self.assertEqual(len(resizer.source_formats(self.formats['Figure'], self.info)), 11)
+        pdf_info = ArticleInfo('elife-00353-v1.pdf')
+        self.assertEqual(resizer.source_formats(self.formats['Figure'], pdf_info), [])
+
+    def test_target_size(self):
+        source = FakeImage()
+        self.assertEqual(resizer.target_size({'width': 300}, source), (300, 150))
+        self.assertEqual(resizer.target_size({'height': 100}, source), (200, 100))
+        self.assertEqual(resizer.target_size({}, source), (2000, 1000))
+
+    @patch('provider.imageresize.Image', FakeImage)
+    def test_resize_all_decodes_once(self):
+        formats = resizer.source_formats(self.formats['Figure'], self.info)
+        renditions = list(resizer.resize_all(formats, MagicMock(), self.info, MagicMock()))
+        self.assertEqual(FakeImage.decoded, 1)
+        self.assertEqual(len(renditions), len(formats))
+        # largest first
+        self.assertEqual(renditions[0][1], 'elife-00353-fig1-v1-1484w.jpg')
+        self.assertEqual(renditions[0][2].getvalue(), 'jpg 1484x742')
+        self.assertEqual(renditions[-1][1], 'elife-00353-fig1-v1-80w.gif')
+        self.assertEqual(renditions[-1][2].getvalue(), 'gif 80x40')
+
+    @patch('provider.imageresize.Image', FakeImage)
+    def test_resize_all_original_size(self):
+        formats = resizer.source_formats(self.formats['Inline'], self.info)
+        renditions = list(resizer.resize_all(formats, MagicMock(), self.info, MagicMock()))
+        self.assertEqual(renditions[0][1], 'elife-00353-fig1-v1.jpg')
+        self.assertEqual(renditions[0][2].getvalue(), 'jpg 2000x1000')
+
+    def test_render_resolution_leaves_source_unchanged(self):
+        source = FakeImage(resolution=(96, 96))
+        image = resizer.render({'resolution': 300}, source)
+        self.assertTrue(image is not source)
+        self.assertEqual(image.resolution, (300, 300))
+        self.assertEqual(source.resolution, (96, 96))
+
+
+if __name__ == '__main__':
+    unittest.main()
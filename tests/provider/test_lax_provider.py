@@ -12,6 +12,9 @@ from ddt import ddt, data, unpack
 @ddt
 class TestLaxProvider(unittest.TestCase):
 
+    def setUp(self):
+        lax_provider.invalidate_article_versions()
+
     @patch('provider.lax_provider.article_versions')
     def test_article_highest_version_200(self, mock_lax_provider_article_versions):
         mock_lax_provider_article_versions.return_value = 200, test_data.lax_article_versions_response_data
@@ -66,7 +69,7 @@ class TestLaxProvider(unittest.TestCase):
         result = lax_provider.article_version_date_by_version('08411', "2", settings_mock)
         self.assertEqual("2015-11-30T00:00:00Z", result)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_article_version_200(self, mock_requests_get):
         response = MagicMock()
         response.status_code = 200
@@ -76,7 +79,7 @@ class TestLaxProvider(unittest.TestCase):
         self.assertEqual(status_code, 200)
         self.assertEqual(versions, [{'version': 1}])
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_article_version_404(self, mock_requests_get):
         response = MagicMock()
         response.status_code = 404
@@ -85,7 +88,7 @@ class TestLaxProvider(unittest.TestCase):
         self.assertEqual(status_code, 404)
         self.assertIsNone(versions)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_article_version_500(self, mock_requests_get):
         response = MagicMock()
         response.status_code = 500
@@ -215,6 +218,43 @@ class TestLaxProvider(unittest.TestCase):
                                                                   is_poa, was_ever_poa)
         self.assertEqual(published, expected_return_value)
 
+    @patch('requests.Session.get')
+    def test_article_versions_cached(self, mock_requests_get):
+        response = MagicMock()
+        response.status_code = 200
+        response.json.return_value = {'versions': [{'version': 1}]}
+        mock_requests_get.return_value = response
+        lax_provider.article_versions('08411', settings_mock)
+        status_code, versions = lax_provider.article_versions('08411', settings_mock)
+        self.assertEqual(versions, [{'version': 1}])
+        self.assertEqual(mock_requests_get.call_count, 1)
+        lax_provider.invalidate_article_versions(8411)
+        lax_provider.article_versions('08411', settings_mock)
+        self.assertEqual(mock_requests_get.call_count, 2)
+
+    @patch('requests.Session.get')
+    def test_article_versions_error_not_cached(self, mock_requests_get):
+        response = MagicMock()
+        response.status_code = 500
+        mock_requests_get.return_value = response
+        for _ in range(2):
+            self.assertRaises(ErrorCallingLaxException, lax_provider.article_versions,
+                              '08411', settings_mock)
+        self.assertEqual(mock_requests_get.call_count, 2)
+
+    @patch('requests.Session.get')
+    def test_article_versions_many(self, mock_requests_get):
+        def get(url, verify):
+            response = MagicMock()
+            response.status_code = 200
+            response.json.return_value = {'versions': [{'version': 1, 'url': url}]}
+            return response
+        mock_requests_get.side_effect = get
+        results = lax_provider.article_versions_many(['08411', '04132', '08411'], settings_mock)
+        self.assertEqual(sorted(results.keys()), ['04132', '08411'])
+        self.assertEqual(results['04132'][1][0]['url'], 'https://test/eLife.04132/version/')
+        self.assertEqual(mock_requests_get.call_count, 2)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -67,6 +67,23 @@ class TestProviderS3Lib(unittest.TestCase):
     def test_latest_pmc_zip_revision(self, doi_id, s3_key_names, expected_s3_key_name):
         self.assertEqual(s3lib.latest_pmc_zip_revision(doi_id, s3_key_names), expected_s3_key_name)
 
+    def test_pmc_zip_index(self):
+        s3_key_names = [
+            'pmc/zip/elife-05-19405.zip',
+            'pmc/zip/elife-06-24052.zip',
+            'pmc/zip/elife-06-24052.r1.zip',
+            'pmc/zip/elife-06-24052.r2.zip',
+            'pmc/zip/elife-04-02419.zip',
+        ]
+        index = s3lib.pmc_zip_index(s3_key_names)
+        self.assertEqual(index, {
+            19405: 'pmc/zip/elife-05-19405.zip',
+            24052: 'pmc/zip/elife-06-24052.r2.zip',
+            2419: 'pmc/zip/elife-04-02419.zip'})
+        for doi_id in [19405, 24052, 2419, 99999]:
+            self.assertEqual(index.get(doi_id),
+                             s3lib.latest_pmc_zip_revision(doi_id, s3_key_names))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+import StringIO
+from mock import MagicMock, patch
+from testfixtures import TempDirectory
+import provider.sftp as sftplib
+
+
+class TestSFTP(unittest.TestCase):
+
+    @patch('paramiko.util.log_to_file')
+    def setUp(self, fake_log_to_file):
+        self.directory = TempDirectory()
+        self.uploadfile = self.directory.write("elife-00353.zip", "zip data")
+        self.sftp = sftplib.SFTP()
+        sftplib.reset()
+
+    def tearDown(self):
+        TempDirectory.cleanup_all()
+        sftplib.reset()
+
+    def fake_client(self, remote_files):
+        client = MagicMock()
+
+        def open_remote(remote_file, mode):
+            remote = MagicMock()
+            buffer = remote_files.setdefault(remote_file, StringIO.StringIO())
+            if 'w' in mode:
+                buffer.truncate(0)
+            remote.__enter__.return_value = remote
+            remote.__exit__.return_value = False
+            remote.seek.side_effect = buffer.seek
+            remote.write.side_effect = buffer.write
+            return remote
+        client.open.side_effect = open_remote
+
+        def stat(remote_file):
+            if remote_file not in remote_files:
+                raise IOError("no such file")
+            return MagicMock(st_size=len(remote_files[remote_file].getvalue()))
+        client.stat.side_effect = stat
+        return client
+
+    def test_sftp_to_endpoint_makes_directory_once(self):
+        remote_files = {}
+        client = self.fake_client(remote_files)
+        self.sftp.sftp_to_endpoint(client, [self.uploadfile], "cwd", "00353")
+        self.sftp.sftp_to_endpoint(client, [self.uploadfile], "cwd", "00353")
+        client.mkdir.assert_called_once_with("cwd/00353")
+        self.assertEqual("zip data", remote_files["cwd/00353/elife-00353.zip"].getvalue())
+
+    def test_sftp_upload_resumes(self):
+        remote_files = {}
+        client = self.fake_client(remote_files)
+        open_remote = client.open.side_effect
+
+        def interrupted_open(remote_file, mode):
+            remote = open_remote(remote_file, mode)
+            if mode == 'wb':
+                # the connection is lost after the first four bytes arrive
+                remote.write.side_effect = self.raise_after_write(remote_files[remote_file])
+            return remote
+        client.open.side_effect = interrupted_open
+
+        self.sftp.sftp_upload(client, self.uploadfile, "elife-00353.zip")
+
+        self.assertEqual(["elife-00353.zip"] * 2, [args[0][0] for args in client.open.call_args_list])
+        self.assertEqual(['wb', 'r+b'], [args[0][1] for args in client.open.call_args_list])
+        self.assertEqual("zip data", remote_files["elife-00353.zip"].getvalue())
+
+    @patch('paramiko.SFTPClient.from_transport')
+    @patch('paramiko.Transport')
+    def test_sftp_upload_replaces_stale_file(self, fake_transport, fake_from_transport):
+        # a file of the same size from an earlier delivery
+        remote_files = {"elife-00353.zip": StringIO.StringIO("old data")}
+        failed_client = self.fake_client(remote_files)
+        failed_client.get_channel.return_value.get_transport.return_value.is_active.return_value = True
+        # the channel is lost before the remote file is opened
+        failed_client.open.side_effect = IOError("connection lost")
+        new_client = self.fake_client(remote_files)
+        fake_from_transport.side_effect = [failed_client, new_client]
+
+        client = self.sftp.sftp_connect("sftp.localhost", "user", "password")
+        self.sftp.sftp_upload(client, self.uploadfile, "elife-00353.zip")
+
+        self.assertEqual(['wb'], [args[0][1] for args in new_client.open.call_args_list])
+        self.assertEqual("zip data", remote_files["elife-00353.zip"].getvalue())
+
+    @patch('paramiko.SFTPClient.from_transport')
+    @patch('paramiko.Transport')
+    def test_sftp_upload_reconnects(self, fake_transport, fake_from_transport):
+        remote_files = {}
+        failed_client = self.fake_client(remote_files)
+        failed_client.get_channel.return_value.get_transport.return_value.is_active.return_value = True
+        failed_client.open.side_effect = IOError("connection lost")
+        new_client = self.fake_client(remote_files)
+        fake_from_transport.side_effect = [failed_client, new_client]
+
+        client = self.sftp.sftp_connect("sftp.localhost", "user", "password")
+        self.assertTrue(self.sftp.sftp_upload(client, self.uploadfile, "elife-00353.zip")
+                        is new_client)
+
+        failed_client.close.assert_called_once_with()
+        self.assertEqual("zip data", remote_files["elife-00353.zip"].getvalue())
+        # later connections get the new client
+        new_client.get_channel.return_value.get_transport.return_value.is_active.return_value = True
+        self.assertTrue(self.sftp.sftp_connect("sftp.localhost", "user", "password") is new_client)
+        self.assertEqual(2, fake_transport.call_count)
+
+    def raise_after_write(self, buffer):
+        def write(data):
+            buffer.write(data[:4])
+            raise IOError("connection lost")
+        return write
+
+    @patch('paramiko.SFTPClient.from_transport')
+    @patch('paramiko.Transport')
+    def test_sftp_connect_reuses_active_client(self, fake_transport, fake_from_transport):
+        client = MagicMock()
+        client.get_channel.return_value.get_transport.return_value.is_active.return_value = True
+        fake_from_transport.return_value = client
+        self.assertTrue(self.sftp.sftp_connect("sftp.localhost", "user", "password") is client)
+        self.assertTrue(self.sftp.sftp_connect("sftp.localhost", "user", "password") is client)
+        self.assertEqual(1, fake_transport.call_count)
+
+        client.get_channel.return_value.get_transport.return_value.is_active.return_value = False
+        self.sftp.sftp_connect("sftp.localhost", "user", "password")
+        self.assertEqual(2, fake_transport.call_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+from mock import MagicMock
+from provider.simpleDB import SimpleDB
+import tests.settings_mock as settings_mock
+
+
+class TestProviderSimpleDB(unittest.TestCase):
+
+    def setUp(self):
+        self.db = SimpleDB(settings_mock)
+        self.domain = MagicMock()
+        self.db.domains['S3File'] = self.domain
+
+    def test_batch_put_attributes_chunks(self):
+        items = {}
+        for i in range(0, 60):
+            items['item_%02d' % i] = {'item_name': 'item_%02d' % i}
+        self.db.batch_put_attributes("S3File", items)
+        batch_sizes = [len(args[0][0]) for args in self.domain.batch_put_attributes.call_args_list]
+        self.assertEqual(batch_sizes, [25, 25, 10])
+
+    def test_get_S3_file_items_by_prefix(self):
+        item = MagicMock()
+        item.name = 'bucket/folder/file.xml'
+        self.domain.select.return_value = [item]
+        items = self.db.elife_get_S3_file_items_by_prefix('bucket', "folder/")
+        self.assertEqual(items, {'bucket/folder/file.xml': item})
+        self.domain.select.assert_called_with(
+            "select * from S3File_test where item_name like 'bucket/folder/%'",
+            consistent_read=True)
+
+    def test_S3_file_prefix_query_escape(self):
+        query = self.db.elife_get_S3_file_prefix_query("S3File_test", "bucket", "it's/")
+        self.assertEqual(query, "select * from S3File_test where item_name like 'bucket/it''s/%'")
+
+    def test_get_email_queue_items_by_doi_ids_chunks(self):
+        self.db.domains['EmailQueue'] = self.domain
+        self.domain.select.return_value = [{'doi_id': '00001'}]
+        doi_ids = ['%05d' % i for i in range(1, 26)] + ['00001']
+        items = self.db.elife_get_email_queue_items_by_doi_ids(doi_ids)
+        self.assertEqual(len(items), 2)
+        queries = [args[0][0] for args in self.domain.select.call_args_list]
+        self.assertEqual(queries[1],
+                         "select doi_id, email_type, recipient_email from EmailQueue_test"
+                         " where doi_id in ('00021', '00022', '00023', '00024', '00025')")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,11 @@
 import unittest
-from mock import MagicMock, call
-from provider.storage_provider import S3StorageContext
+import socket
+import StringIO
+from zipfile import ZipFile
+from mock import MagicMock, call, patch
+from boto.exception import S3ResponseError
+from provider.storage_provider import S3StorageContext, failed_transfers, guess_content_type, \
+    read_part
 
 class TestProviderStorage(unittest.TestCase):
     def setUp(self):
@@ -8,6 +13,8 @@ class TestProviderStorage(unittest.TestCase):
         self.storage.context['buckets']['a'] = MagicMock()
         self.storage.context['buckets']['b'] = MagicMock()
         self.storage.context['connection'] = MagicMock()
+        # create the child mock before the transfer threads look it up
+        self.storage.context['buckets']['b'].copy_key
 
     def test_copy_without_any_metadata_to_override(self):
         original = "s3://a/1"
@@ -22,3 +29,256 @@ class TestProviderStorage(unittest.TestCase):
         self.assertEqual({'metadata': {'Content-Type': 'application/json'}}, self.storage.context['buckets']['b'].copy_key.mock_calls[0][2])
 
         
+
+    @patch('provider.storage_provider.Key')
+    def test_set_resources_from_files(self, fake_key):
+        set_contents_from_filename = fake_key.return_value.set_contents_from_filename
+        results = self.storage.set_resources_from_files({"s3://a/1": "1.xml", "s3://b/2": "2.tif"})
+        self.assertEqual({"s3://a/1": True, "s3://b/2": True}, results)
+        self.assertEqual(2, set_contents_from_filename.call_count)
+
+    def test_copy_resources(self):
+        results = self.storage.copy_resources([
+            ("s3://a/1", "s3://b/1"),
+            ("s3://a/1", "s3://b/1-download", {'Content-Type': 'application/json'})])
+        self.assertEqual({"s3://b/1": True, "s3://b/1-download": True}, results)
+        self.assertEqual(2, self.storage.context['buckets']['b'].copy_key.call_count)
+
+    def test_copy_resources_without_destination_lookup(self):
+        self.storage.copy_resources([("s3://a/folder/1.tif", "s3://b/1.tif", None, 1024)])
+        dest_bucket = self.storage.context['buckets']['b']
+        self.assertEqual(0, dest_bucket.get_key.call_count)
+        self.assertEqual(0, dest_bucket.new_key.call_count)
+        dest_bucket.copy_key.assert_called_with(
+            "1.tif", self.storage.context['buckets']['a'].name, "folder/1.tif", metadata=None)
+
+    @patch('provider.storage_provider.MULTIPART_COPY_THRESHOLD', 100)
+    def test_copy_resources_multipart(self):
+        orig_bucket = self.storage.context['buckets']['a']
+        orig_bucket.name = 'a'
+        dest_bucket = self.storage.context['buckets']['b']
+        multipart = dest_bucket.initiate_multipart_upload.return_value
+        metadata = {'Content-Type': 'video/mp4'}
+        results = self.storage.copy_resources([("s3://a/1.mp4", "s3://b/1.mp4", metadata, 250)])
+        self.assertEqual({"s3://b/1.mp4": True}, results)
+        self.assertEqual(0, dest_bucket.copy_key.call_count)
+        dest_bucket.initiate_multipart_upload.assert_called_with("1.mp4", headers=None,
+                                                                 metadata=metadata)
+        self.assertEqual(1, multipart.complete_upload.call_count)
+
+    def test_multipart_copy_parts(self):
+        orig_bucket = self.storage.context['buckets']['a']
+        orig_bucket.name = 'a'
+        orig_bucket.get_key.return_value.metadata = {}
+        orig_bucket.get_key.return_value.content_type = 'video/mp4'
+        dest_bucket = self.storage.context['buckets']['b']
+        multipart = dest_bucket.initiate_multipart_upload.return_value
+        # create the child mock before the copy threads look it up
+        copy_part_from_key = multipart.copy_part_from_key
+        self.storage.multipart_copy(orig_bucket, "1.mp4", dest_bucket, "1.mp4", 250, part_size=100)
+        self.assertEqual(sorted(copy_part_from_key.call_args_list), [
+            call('a', '1.mp4', 1, 0, 99), call('a', '1.mp4', 2, 100, 199),
+            call('a', '1.mp4', 3, 200, 249)])
+        dest_bucket.initiate_multipart_upload.assert_called_with(
+            "1.mp4", headers={'Content-Type': 'video/mp4'}, metadata={})
+
+    def test_multipart_copy_cancels_failed_copy(self):
+        dest_bucket = self.storage.context['buckets']['b']
+        multipart = dest_bucket.initiate_multipart_upload.return_value
+        multipart.copy_part_from_key.side_effect = S3ResponseError(403, "Forbidden")
+        self.assertRaises(S3ResponseError, self.storage.multipart_copy,
+                          self.storage.context['buckets']['a'], "1.mp4", dest_bucket, "1.mp4",
+                          250, {}, 100)
+        self.assertEqual(1, multipart.cancel_upload.call_count)
+        self.assertEqual(0, multipart.complete_upload.call_count)
+
+    @patch('provider.storage_provider.TRANSFER_RETRY_DELAY', 0)
+    def test_copy_resources_retries_transient_errors(self):
+        self.storage.context['buckets']['b'].copy_key.side_effect = [socket.error(), None]
+        results = self.storage.copy_resources([("s3://a/1", "s3://b/1")])
+        self.assertEqual({"s3://b/1": True}, results)
+        self.assertEqual(2, self.storage.context['buckets']['b'].copy_key.call_count)
+
+    def test_copy_resources_reports_failures(self):
+        error = S3ResponseError(403, "Forbidden")
+        self.storage.context['buckets']['b'].copy_key.side_effect = error
+        results = self.storage.copy_resources([("s3://a/1", "s3://b/1")])
+        self.assertEqual({"s3://b/1": error}, results)
+        self.assertEqual(["s3://b/1"], failed_transfers(results))
+        self.assertEqual(1, self.storage.context['buckets']['b'].copy_key.call_count)
+
+    def fake_listing(self):
+        keys = []
+        for name, size in [("folder/elife-00353-v1.xml", 10), ("folder/sub/elife-00353-v1.pdf", 20)]:
+            key = MagicMock()
+            key.name = name
+            key.size = size
+            key.etag = '"%s"' % size
+            key.last_modified = "2017-05-18T09:04:11.000Z"
+            keys.append(key)
+        return keys
+
+    def test_list_resources_from_listing_alone(self):
+        bucket = self.storage.context['buckets']['a']
+        bucket.list.return_value = self.fake_listing()
+        self.assertEqual(["elife-00353-v1.xml", "elife-00353-v1.pdf"],
+                         self.storage.list_resources("s3://a/folder"))
+        bucket.list.assert_called_with(prefix="folder/")
+        self.assertEqual(0, bucket.get_key.call_count)
+
+    def test_list_resources_metadata(self):
+        self.storage.context['buckets']['a'].list.return_value = self.fake_listing()
+        resources = self.storage.list_resources_metadata("s3://a/folder")
+        self.assertEqual({"name": "folder/sub/elife-00353-v1.pdf",
+                          "filename": "elife-00353-v1.pdf",
+                          "size": 20, "etag": '"20"',
+                          "last_modified": "2017-05-18T09:04:11.000Z"}, resources[1])
+
+    @patch('provider.storage_provider.Key')
+    def test_list_resources_cached_until_written(self, fake_key):
+        settings = MagicMock()
+        settings.storage_listing_cache_ttl = 60
+        self.storage.settings = settings
+        bucket = self.storage.context['buckets']['a']
+        bucket.name = 'a'
+        bucket.list.return_value = self.fake_listing()
+        self.storage.list_resources("s3://a/folder")
+        self.storage.list_resources("s3://a/folder")
+        self.assertEqual(1, bucket.list.call_count)
+        self.storage.set_resource_from_string("s3://a/other/file.txt", "data")
+        self.storage.list_resources("s3://a/folder")
+        self.assertEqual(1, bucket.list.call_count)
+        self.storage.set_resource_from_string("s3://a/folder/file.txt", "data")
+        self.storage.list_resources("s3://a/folder")
+        self.assertEqual(2, bucket.list.call_count)
+        self.storage.invalidate_listings("s3://a/folder/file.txt")
+
+    @patch('provider.storage_provider.Key')
+    def test_set_resource_from_stream_small(self, fake_key):
+        stream = StringIO.StringIO("content")
+        self.storage.set_resource_from_stream("s3://a/1", stream, part_size=10)
+        self.assertEqual(1, fake_key.return_value.set_contents_from_file.call_count)
+        self.assertEqual(0, self.storage.context['buckets']['a'].initiate_multipart_upload.call_count)
+
+    def test_set_resource_from_stream_multipart(self):
+        stream = StringIO.StringIO("0123456789" * 2 + "012")
+        self.storage.set_resource_from_stream("s3://a/1", stream, part_size=10)
+        multipart = self.storage.context['buckets']['a'].initiate_multipart_upload.return_value
+        self.assertEqual([1, 2, 3], [args[0][1] for args in multipart.upload_part_from_file.call_args_list])
+        self.assertEqual(1, multipart.complete_upload.call_count)
+
+    def test_set_resource_from_stream_short_reads(self):
+        # a stream which returns fewer bytes than asked before its end
+        stream = MagicMock()
+        stream.read.side_effect = ["0123", "456789", "0123456789", "01", "2", "", ""]
+        multipart = self.storage.context['buckets']['a'].initiate_multipart_upload.return_value
+        parts = {}
+
+        def upload_part(fp, part_num):
+            parts[part_num] = fp.read()
+        multipart.upload_part_from_file.side_effect = upload_part
+
+        self.storage.set_resource_from_stream("s3://a/1", stream, part_size=10)
+        self.assertEqual({1: "0123456789", 2: "0123456789", 3: "012"}, parts)
+        self.assertEqual(1, multipart.complete_upload.call_count)
+
+    def test_read_part(self):
+        stream = MagicMock()
+        stream.read.side_effect = ["01", "234", ""]
+        self.assertEqual("01234", read_part(stream, 10))
+        self.assertEqual([call(10), call(8), call(5)], stream.read.call_args_list)
+
+    def test_set_resource_from_stream_cancels_failed_upload(self):
+        stream = StringIO.StringIO("0123456789" * 2)
+        multipart = self.storage.context['buckets']['a'].initiate_multipart_upload.return_value
+        multipart.upload_part_from_file.side_effect = [None, socket.error()]
+        self.assertRaises(socket.error, self.storage.set_resource_from_stream, "s3://a/1", stream,
+                          part_size=10)
+        self.assertEqual(1, multipart.cancel_upload.call_count)
+        self.assertEqual(0, multipart.complete_upload.call_count)
+
+    def test_resource_writer_uploads_zip_in_parts(self):
+        multipart = self.storage.context['buckets']['a'].initiate_multipart_upload.return_value
+        parts = {}
+
+        def upload_part(fp, part_num, size=None):
+            parts[part_num] = fp.read(size) if size is not None else fp.read()
+        multipart.upload_part_from_file.side_effect = upload_part
+
+        writer = self.storage.get_resource_writer("s3://a/archive.zip", part_size=100)
+        zip_file = ZipFile(writer, 'w')
+        for index in range(5):
+            zip_file.writestr("file%s.txt" % index, str(index) * 80)
+            writer.upload_parts()
+            # the bytes of each member are uploaded once a whole part is written
+            self.assertLess(writer.tell() - writer.offset, 100)
+        zip_file.close()
+        writer.close()
+
+        self.storage.context['buckets']['a'].initiate_multipart_upload.assert_called_with(
+            "archive.zip", metadata=None)
+        self.assertEqual(1, multipart.complete_upload.call_count)
+        uploaded = "".join(parts[part_num] for part_num in sorted(parts))
+        self.assertTrue(all(len(parts[part_num]) == 100 for part_num in sorted(parts)[:-1]))
+        with ZipFile(StringIO.StringIO(uploaded)) as zip_file:
+            self.assertEqual("4" * 80, zip_file.read("file4.txt"))
+            self.assertEqual(5, len(zip_file.namelist()))
+
+    def test_resource_writer_metadata(self):
+        writer = self.storage.get_resource_writer("s3://a/archive.zip", part_size=10,
+                                                  metadata={'Content-Type': 'application/zip'})
+        writer.write("0123456789" * 2)
+        writer.upload_parts()
+        writer.close()
+        self.storage.context['buckets']['a'].initiate_multipart_upload.assert_called_with(
+            "archive.zip", metadata={'Content-Type': 'application/zip'})
+
+    @patch('provider.storage_provider.Key')
+    def test_resource_writer_small_upload(self, fake_key):
+        writer = self.storage.get_resource_writer("s3://a/small.txt", part_size=100)
+        writer.write("content")
+        writer.upload_parts()
+        writer.close()
+        self.assertEqual(1, fake_key.return_value.set_contents_from_file.call_count)
+        self.assertEqual(0, self.storage.context['buckets']['a'].initiate_multipart_upload.call_count)
+
+    def test_resource_writer_cannot_seek_into_uploaded_part(self):
+        writer = self.storage.get_resource_writer("s3://a/1", part_size=10)
+        writer.write("0123456789" * 2 + "012")
+        writer.upload_parts()
+        self.assertEqual(20, writer.offset)
+        self.assertEqual(23, writer.tell())
+        self.assertRaises(IOError, writer.seek, 5)
+        writer.abort()
+        multipart = self.storage.context['buckets']['a'].initiate_multipart_upload.return_value
+        self.assertEqual(1, multipart.cancel_upload.call_count)
+
+    @patch('provider.storage_provider.Key')
+    def test_set_resources_from_zip(self, fake_key):
+        results = self.storage.set_resources_from_zip(
+            "tests/test_data/multiple_files.zip", {"s3://a/1": self.first_zip_member()})
+        self.assertEqual({"s3://a/1": True}, results)
+        self.assertEqual(1, fake_key.return_value.set_contents_from_file.call_count)
+
+    @patch('provider.storage_provider.Key')
+    def test_set_resources_from_zip_content_type(self, fake_key):
+        zip_file_name = self.first_zip_member()
+        self.storage.set_resources_from_zip("tests/test_data/multiple_files.zip",
+                                            {"s3://a/1.jpg": zip_file_name})
+        self.assertEqual(fake_key.return_value.metadata.__setitem__.call_args_list,
+                         [call('Content-Type', 'text/plain')])
+
+    def test_set_resource_from_stream_multipart_content_type(self):
+        stream = StringIO.StringIO("0123456789" * 2)
+        self.storage.set_resource_from_stream("s3://a/1.jpg", stream, {'Content-Type': 'image/jpeg'},
+                                              part_size=10)
+        self.storage.context['buckets']['a'].initiate_multipart_upload.assert_called_with(
+            "/1.jpg", metadata={'Content-Type': 'image/jpeg'})
+
+    def test_guess_content_type(self):
+        self.assertEqual('image/jpeg', guess_content_type('elife-00353-fig1-v1.jpg'))
+        self.assertEqual('application/octet-stream', guess_content_type('elife-00353-v1'))
+
+    def first_zip_member(self):
+        with ZipFile("tests/test_data/multiple_files.zip") as zip_file:
+            return zip_file.namelist()[0]
@@ -0,0 +1,167 @@
+import unittest
+import os
+import signal
+import time
+from mock import patch
+from testfixtures import TempDirectory
+from provider import worker_pool
+from provider.process import Flag
+
+
+class StopAfterFlag(Flag):
+    "a Flag which stops itself once the supervisor checked it a number of times"
+
+    def __init__(self, checks):
+        Flag.__init__(self)
+        self.checks = checks
+
+    def green(self):
+        self.checks -= 1
+        if self.checks < 0:
+            self.stop_process()
+        return Flag.green(self)
+
+
+class TestTaskListLimits(unittest.TestCase):
+
+    def test_acquire(self):
+        limits = worker_pool.TaskListLimits({"ResizeImagesTaskList": 2})
+        self.assertTrue(limits.acquire("ResizeImagesTaskList"))
+        self.assertTrue(limits.acquire("ResizeImagesTaskList"))
+        # a full limit does not wait
+        self.assertFalse(limits.acquire("ResizeImagesTaskList"))
+        limits.release("ResizeImagesTaskList")
+        self.assertTrue(limits.acquire("ResizeImagesTaskList"))
+        self.assertEqual(list(limits.slots["ResizeImagesTaskList"]), [os.getpid()] * 2)
+
+    def test_no_limit(self):
+        limits = worker_pool.TaskListLimits({"ResizeImagesTaskList": 1})
+        self.assertTrue(limits.acquire("ResizeImagesTaskList"))
+        self.assertTrue(limits.acquire("DefaultTaskList"))
+        self.assertTrue(limits.acquire("DefaultTaskList"))
+        limits.release("DefaultTaskList")
+
+    def test_release_process(self):
+        limits = worker_pool.TaskListLimits({"ResizeImagesTaskList": 2, "CrossrefTaskList": 1})
+        limits.acquire("ResizeImagesTaskList")
+        limits.acquire("CrossrefTaskList")
+        self.assertEqual(limits.release_process(os.getpid() + 1), 0)
+        self.assertEqual(limits.release_process(os.getpid()), 2)
+        self.assertEqual(list(limits.slots["ResizeImagesTaskList"]), [0, 0])
+        self.assertEqual(list(limits.slots["CrossrefTaskList"]), [0])
+
+    @patch('provider.worker_pool.SLOT_WAIT_SECONDS', 0.01)
+    def test_run_with_slot(self):
+        limits = worker_pool.TaskListLimits({"ResizeImagesTaskList": 1})
+        runs = []
+
+        def run():
+            runs.append(list(limits.slots["ResizeImagesTaskList"]))
+            flag.stop_process()
+
+        # only runs once the slot taken by another poller is free
+        limits.acquire("ResizeImagesTaskList")
+        flag = StopAfterFlag(5)
+        limits.run_with_slot("ResizeImagesTaskList", flag, run)
+        self.assertEqual(runs, [])
+
+        limits.release("ResizeImagesTaskList")
+        flag = Flag()
+        limits.run_with_slot("ResizeImagesTaskList", flag, run)
+        self.assertEqual(runs, [[os.getpid()]])
+        self.assertEqual(list(limits.slots["ResizeImagesTaskList"]), [0])
+
+
+class TestRecycler(unittest.TestCase):
+
+    def test_max_tasks(self):
+        recycler = worker_pool.Recycler(max_tasks=2)
+        recycler.task_done()
+        self.assertFalse(recycler.should_recycle())
+        recycler.task_done()
+        self.assertTrue(recycler.should_recycle())
+
+    @patch('provider.worker_pool.max_rss_mb')
+    def test_max_memory(self, fake_max_rss_mb):
+        recycler = worker_pool.Recycler(max_memory_mb=512)
+        fake_max_rss_mb.return_value = 100
+        self.assertFalse(recycler.should_recycle())
+        fake_max_rss_mb.return_value = 600
+        self.assertTrue(recycler.should_recycle())
+
+    def test_no_limits(self):
+        recycler = worker_pool.Recycler()
+        recycler.task_done()
+        self.assertFalse(recycler.should_recycle())
+
+
+class TestSupervisor(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = TempDirectory()
+
+    def tearDown(self):
+        TempDirectory.cleanup_all()
+
+    @patch('provider.worker_pool.SUPERVISOR_POLL_SECONDS', 0.05)
+    def test_replaces_children_which_exit(self):
+        log_file = os.path.join(self.directory.path, 'children.log')
+
+        def child_main():
+            with open(log_file, 'a') as open_file:
+                open_file.write('%s\n' % os.getpid())
+
+        supervisor = worker_pool.Supervisor(2, child_main)
+        supervisor.run(StopAfterFlag(10))
+
+        self.assertEqual(supervisor.children, {})
+        with open(log_file) as open_file:
+            pids = open_file.read().split()
+        # children exit straight away so more than the first two were started
+        self.assertTrue(len(pids) > 2)
+        self.assertEqual(len(set(pids)), len(pids))
+
+    @patch('provider.worker_pool.SUPERVISOR_POLL_SECONDS', 0.05)
+    def test_releases_task_list_slots_of_exited_children(self):
+        log_file = os.path.join(self.directory.path, 'children.log')
+        limits = worker_pool.TaskListLimits({"ResizeImagesTaskList": 1})
+
+        def child_main():
+            # the child exits without releasing the slot, as when it is killed
+            acquired = limits.acquire("ResizeImagesTaskList")
+            with open(log_file, 'a') as open_file:
+                open_file.write('%s\n' % acquired)
+
+        supervisor = worker_pool.Supervisor(1, child_main, task_list_limits=limits)
+        supervisor.run(StopAfterFlag(10))
+
+        with open(log_file) as open_file:
+            acquired = open_file.read().split()
+        self.assertTrue(len(acquired) > 1)
+        self.assertEqual(set(acquired), set(['True']))
+        self.assertEqual(list(limits.slots["ResizeImagesTaskList"]), [0])
+
+    @patch('provider.worker_pool.SUPERVISOR_POLL_SECONDS', 0.05)
+    def test_stop_waits_for_children(self):
+        log_file = os.path.join(self.directory.path, 'children.log')
+
+        def child_main():
+            flag = Flag()
+            signal.signal(signal.SIGTERM, lambda signum, frame: flag.stop_process())
+            while flag.green():
+                time.sleep(0.01)
+            with open(log_file, 'a') as open_file:
+                open_file.write('graceful shutdown %s\n' % os.getpid())
+
+        supervisor = worker_pool.Supervisor(2, child_main)
+        supervisor.run(StopAfterFlag(5))
+
+        self.assertEqual(supervisor.children, {})
+        with open(log_file) as open_file:
+            lines = open_file.read().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(all(line.startswith('graceful shutdown') for line in lines))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,6 +14,7 @@ aws_access_key_id = ""
 aws_secret_access_key = ""
 
 workflow_starter_queue = ""
+event_monitor_queue = ""
 sqs_region = ""
 
 
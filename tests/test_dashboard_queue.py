@@ -0,0 +1,107 @@
+import unittest
+import json
+import os
+import time
+import tempfile
+from mock import patch, MagicMock
+import dashboard_queue
+from dashboard_queue import DashboardEmitter
+import tests.settings_mock as settings_mock
+
+
+class FakeBatchResults(object):
+    def __init__(self, errors=None):
+        self.errors = errors or []
+
+
+class TestDashboardEmitter(unittest.TestCase):
+
+    def setUp(self):
+        spool_handle, self.spool_file = tempfile.mkstemp()
+        os.close(spool_handle)
+        self.emitter = DashboardEmitter(settings_mock, MagicMock(), spool_file=self.spool_file)
+        self.queue = MagicMock()
+        self.queue.write_batch.return_value = FakeBatchResults()
+        self.emitter.queue = self.queue
+
+    def tearDown(self):
+        os.remove(self.spool_file)
+
+    def spooled(self):
+        with open(self.spool_file) as open_file:
+            return [json.loads(line) for line in open_file]
+
+    def test_flush_writes_batches_of_ten(self):
+        for index in range(23):
+            self.emitter.send({'message_id': index})
+        self.emitter.flush()
+        self.assertEqual([len(call[0][0]) for call in self.queue.write_batch.call_args_list],
+                         [10, 10, 3])
+        self.assertEqual(self.emitter.buffer, [])
+
+    def test_flush_spools_on_error(self):
+        self.queue.write_batch.side_effect = Exception('SQS is down')
+        self.emitter.send({'message_id': 1})
+        self.emitter.flush()
+        self.assertEqual(self.spooled(), [{'message_id': 1}])
+
+    def test_flush_spools_rejected_messages(self):
+        self.queue.write_batch.return_value = FakeBatchResults([{'id': '1'}])
+        self.emitter.send({'message_id': 1})
+        self.emitter.send({'message_id': 2})
+        self.emitter.flush()
+        self.assertEqual(self.spooled(), [{'message_id': 2}])
+
+    def test_start_resends_spooled_messages(self):
+        self.emitter.spool([{'message_id': 1}])
+        self.emitter.start()
+        self.emitter.stop()
+        self.assertEqual(len(self.queue.write_batch.call_args[0][0]), 1)
+        self.assertEqual(self.spooled(), [])
+
+    def test_run_resends_spooled_messages(self):
+        emitter = DashboardEmitter(settings_mock, MagicMock(), spool_file=self.spool_file,
+                                   flush_interval=0.01, spool_retry_interval=0)
+        emitter.queue = self.queue
+        emitter.start()
+        try:
+            # spooled by another process after the emitter started
+            emitter.spool([{'message_id': 1}])
+            for _ in range(100):
+                if self.queue.write_batch.call_count:
+                    break
+                time.sleep(0.01)
+        finally:
+            emitter.stop()
+        self.assertEqual(len(self.queue.write_batch.call_args_list[0][0][0]), 1)
+        self.assertEqual(self.spooled(), [])
+
+    def test_spool_is_locked(self):
+        with patch('dashboard_queue.fcntl') as fake_fcntl:
+            self.emitter.spool([{'message_id': 1}])
+            self.assertEqual(self.emitter.read_spool(), [{'message_id': 1}])
+        self.assertEqual([call[0][1] for call in fake_fcntl.flock.call_args_list],
+                         [fake_fcntl.LOCK_EX, fake_fcntl.LOCK_EX])
+
+
+class TestSendMessage(unittest.TestCase):
+
+    def tearDown(self):
+        dashboard_queue._emitter = None
+
+    @patch('dashboard_queue.connections.sqs_connection')
+    def test_send_message_without_emitter(self, fake_connection):
+        dashboard_queue.send_message({'message_id': 1}, settings_mock)
+        queue = fake_connection.return_value.get_queue.return_value
+        self.assertEqual(queue.write.call_count, 1)
+
+    @patch('dashboard_queue.connections.sqs_connection')
+    def test_send_message_buffers_with_emitter(self, fake_connection):
+        dashboard_queue._emitter = MagicMock()
+        dashboard_queue.send_message({'message_id': 1}, settings_mock)
+        dashboard_queue._emitter.send.assert_called_with({'message_id': 1})
+        self.assertEqual(fake_connection.call_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
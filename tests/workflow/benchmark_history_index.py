@@ -0,0 +1,119 @@
+"""
+Micro-benchmark of a whole decision, is_workflow_complete and
+get_next_activities, over synthetic SWF event histories, comparing a full
+rescan of the events per activity status query, as before the index, with
+the event_history_index built once per decision. It is not collected by
+the test suite.
+
+Run from the project root:
+    python tests/workflow/benchmark_history_index.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from mock import MagicMock
+from workflow.workflow import workflow
+
+HISTORY_SIZES = [100, 1000, 5000]
+REPEAT = 5
+
+
+def synthetic_decision(event_count, step_count):
+    "a history of scheduled, failed and completed activity tasks"
+    events = [{"eventId": 1, "eventType": "WorkflowExecutionStarted"}]
+    event_id = 1
+    step = 0
+    while event_id < event_count:
+        activity = "Activity%s" % (step % step_count)
+        event_id += 1
+        scheduled_id = event_id
+        events.append({
+            "eventId": scheduled_id,
+            "eventType": "ActivityTaskScheduled",
+            "activityTaskScheduledEventAttributes": {
+                "activityType": {"name": activity, "version": "1"},
+                "activityId": activity}})
+        event_id += 1
+        if step % 7 == 3:
+            events.append({
+                "eventId": event_id, "eventType": "ActivityTaskFailed",
+                "activityTaskFailedEventAttributes": {"scheduledEventId": scheduled_id}})
+        else:
+            events.append({
+                "eventId": event_id, "eventType": "ActivityTaskCompleted",
+                "activityTaskCompletedEventAttributes": {"scheduledEventId": scheduled_id}})
+        step += 1
+    return {"events": events}
+
+
+def synthetic_definition(step_count):
+    "steps of single activities with every fourth step run in parallel"
+    steps = []
+    for i in range(0, step_count, 2):
+        first = {"activity_type": "Activity%s" % i, "activity_id": "Activity%s" % i}
+        second = {"activity_type": "Activity%s" % (i + 1), "activity_id": "Activity%s" % (i + 1)}
+        if i % 4 == 0:
+            steps.append([first, second])
+        else:
+            steps += [first, second]
+    return {"steps": steps}
+
+
+def rescan_activity_status(decision, activityType=None, activityID=None):
+    "activity status by scanning every event, as before the index"
+    eventId_list = []
+    for event in decision["events"]:
+        try:
+            attributes = event["activityTaskScheduledEventAttributes"]
+            if (attributes["activityType"]["name"] == activityType
+                    and attributes["activityId"] == activityID):
+                eventId_list.append(event["eventId"])
+        except KeyError:
+            pass
+    for event in decision["events"]:
+        for eventId in eventId_list:
+            try:
+                if event["activityTaskCompletedEventAttributes"]["scheduledEventId"] == eventId:
+                    if event["eventType"] == "ActivityTaskCompleted":
+                        return True
+                    break
+            except KeyError:
+                pass
+    return False
+
+
+def decide(workflow_object):
+    "the activity status queries made for one decision task"
+    workflow_object.is_workflow_complete()
+    workflow_object.get_next_activities()
+
+
+def run(event_count, step_count=40):
+    decision = synthetic_decision(event_count, step_count)
+    definition = synthetic_definition(step_count)
+
+    def indexed():
+        workflow_object = workflow(MagicMock(), MagicMock(), decision=decision)
+        workflow_object.load_definition(definition)
+        decide(workflow_object)
+
+    def rescan():
+        workflow_object = workflow(MagicMock(), MagicMock(), decision=decision)
+        workflow_object.load_definition(definition)
+        workflow_object.activity_status = rescan_activity_status
+        decide(workflow_object)
+
+    indexed_time = min(timeit.repeat(indexed, number=1, repeat=REPEAT))
+    rescan_time = min(timeit.repeat(rescan, number=1, repeat=REPEAT))
+    return rescan_time, indexed_time
+
+
+if __name__ == "__main__":
+    print("%8s %12s %12s %8s" % ("events", "rescan (ms)", "indexed (ms)", "speedup"))
+    for size in HISTORY_SIZES:
+        rescan_time, indexed_time = run(size)
+        print("%8d %12.2f %12.2f %7.1fx" % (
+            size, rescan_time * 1000, indexed_time * 1000, rescan_time / indexed_time))
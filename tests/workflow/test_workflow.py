@@ -0,0 +1,176 @@
+import unittest
+import json
+from mock import MagicMock, patch
+from workflow.workflow import workflow, event_history_index, get_resize_images_task_list
+
+
+def scheduled_event(event_id, activity_type, activity_id):
+    return {
+        "eventId": event_id,
+        "eventType": "ActivityTaskScheduled",
+        "activityTaskScheduledEventAttributes": {
+            "activityType": {"name": activity_type, "version": "1"},
+            "activityId": activity_id
+        }
+    }
+
+
+def completed_event(event_id, scheduled_event_id):
+    return {
+        "eventId": event_id,
+        "eventType": "ActivityTaskCompleted",
+        "activityTaskCompletedEventAttributes": {"scheduledEventId": scheduled_event_id}
+    }
+
+
+def failed_event(event_id, scheduled_event_id):
+    return {
+        "eventId": event_id,
+        "eventType": "ActivityTaskFailed",
+        "activityTaskFailedEventAttributes": {"scheduledEventId": scheduled_event_id}
+    }
+
+
+def step(activity_type, activity_id=None):
+    return {"activity_type": activity_type, "activity_id": activity_id or activity_type}
+
+
+class TestEventHistoryIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.decision = {"events": [
+            {"eventId": 1, "eventType": "WorkflowExecutionStarted"},
+            scheduled_event(2, "PingWorker", "PingWorker"),
+            completed_event(3, 2),
+            scheduled_event(4, "ExpandArticle", "ExpandArticle"),
+            failed_event(5, 4),
+            scheduled_event(6, "ExpandArticle", "ExpandArticle"),
+        ]}
+
+    def test_scheduled_event_ids(self):
+        index = event_history_index(self.decision)
+        self.assertEqual(index.scheduled_event_ids("ExpandArticle", "ExpandArticle"), [4, 6])
+        self.assertEqual(index.scheduled_event_ids("ExpandArticle"), [4, 6])
+        self.assertEqual(index.scheduled_event_ids(activity_id="PingWorker"), [2])
+        self.assertEqual(index.scheduled_event_ids("Missing"), [])
+        self.assertEqual(index.scheduled_event_ids(), [])
+
+    def test_status(self):
+        index = event_history_index(self.decision)
+        self.assertTrue(index.is_completed("PingWorker", "PingWorker"))
+        self.assertTrue(index.is_completed("PingWorker"))
+        self.assertTrue(index.is_completed(activity_id="PingWorker"))
+        self.assertFalse(index.is_completed("ExpandArticle", "ExpandArticle"))
+        self.assertTrue(index.is_failed("ExpandArticle", "ExpandArticle"))
+        self.assertFalse(index.is_completed())
+        self.assertEqual(index.last_activity_status, "ActivityTaskFailed")
+
+    def test_decision_data(self):
+        with open("tests/test_data/decision.json") as open_file:
+            decision = json.loads(open_file.read())
+        index = event_history_index(decision)
+        self.assertTrue(index.is_completed("PingWorker", "PingWorker"))
+        self.assertEqual(index.last_activity_status, "ActivityTaskCompleted")
+
+
+class TestWorkflowActivityStatus(unittest.TestCase):
+
+    def setUp(self):
+        self.decision = {"events": [
+            {"eventId": 1, "eventType": "WorkflowExecutionStarted"},
+            scheduled_event(2, "PingWorker", "PingWorker"),
+            completed_event(3, 2),
+            scheduled_event(4, "ResizeImages", "ResizeImages"),
+            scheduled_event(5, "DepositAssets", "DepositAssets"),
+            completed_event(6, 5),
+        ]}
+        self.workflow = workflow(MagicMock(), MagicMock(), decision=self.decision)
+        self.workflow.load_definition({"steps": [
+            step("PingWorker"),
+            [step("ResizeImages"), step("DepositAssets")],
+            step("ApplyVersionNumber")
+        ]})
+
+    def test_activity_status(self):
+        self.assertTrue(self.workflow.activity_status(self.decision, "PingWorker", "PingWorker"))
+        self.assertFalse(self.workflow.activity_status(self.decision, "ResizeImages"))
+        self.assertFalse(self.workflow.activity_status(self.decision))
+
+    def test_index_is_built_once_per_decision(self):
+        index = self.workflow.history_index(self.decision)
+        self.assertIs(self.workflow.history_index(self.decision), index)
+        self.decision["events"].append(completed_event(7, 4))
+        self.assertIsNot(self.workflow.history_index(self.decision), index)
+
+    @patch('workflow.workflow.event_history_index', wraps=event_history_index)
+    def test_decision_builds_index_once(self, fake_event_history_index):
+        # a longer history, each step run after a failed attempt
+        steps = [step("Activity%s" % number) for number in range(20)]
+        events = [{"eventId": 1, "eventType": "WorkflowExecutionStarted"}]
+        for activity_step in steps[:15]:
+            for event in [failed_event, completed_event]:
+                events.append(scheduled_event(len(events) + 1, activity_step["activity_type"],
+                                              activity_step["activity_id"]))
+                events.append(event(len(events) + 1, len(events)))
+        decision = {"events": events}
+        workflow_object = workflow(MagicMock(), MagicMock(), decision=decision)
+        workflow_object.load_definition({"steps": steps})
+
+        self.assertFalse(workflow_object.is_workflow_complete())
+        self.assertEqual(workflow_object.get_next_activities(), [steps[15]])
+        self.assertEqual(workflow_object.last_activity_status(decision), "ActivityTaskCompleted")
+        self.assertEqual(fake_event_history_index.call_count, 1)
+
+    def test_next_activities_parallel_step_not_started(self):
+        del self.decision["events"][3:]
+        self.assertFalse(self.workflow.is_workflow_complete())
+        self.assertEqual(self.workflow.get_next_activities(),
+                         [step("ResizeImages"), step("DepositAssets")])
+
+    def test_next_activities_after_parallel_step(self):
+        self.decision["events"].append(completed_event(7, 4))
+        self.assertEqual(self.workflow.get_next_activities(), [step("ApplyVersionNumber")])
+        self.decision["events"].append(scheduled_event(8, "ApplyVersionNumber", "ApplyVersionNumber"))
+        self.decision["events"].append(completed_event(9, 8))
+        self.assertTrue(self.workflow.is_workflow_complete())
+        self.assertEqual(self.workflow.last_activity_status(self.decision),
+                         "ActivityTaskCompleted")
+
+
+class FakeSettings(object):
+    domain = "Publish.test"
+    default_task_list = "DefaultTaskList"
+
+
+class TestScheduleActivity(unittest.TestCase):
+
+    def schedule(self, activity_step):
+        activity_step = dict(activity_step, version="1", input={}, heartbeat_timeout=300,
+                             schedule_to_close_timeout=300, schedule_to_start_timeout=300,
+                             start_to_close_timeout=300)
+        workflow_object = workflow(FakeSettings(), MagicMock())
+        workflow_object.load_definition({"task_list": "DefaultTaskList", "steps": []})
+        decisions = workflow_object.schedule_activity(activity_step)._data
+        return decisions[0]["scheduleActivityTaskDecisionAttributes"]["taskList"]["name"]
+
+    def test_workflow_task_list(self):
+        self.assertEqual(self.schedule(step("PingWorker")), "DefaultTaskList")
+
+    def test_activity_task_list(self):
+        activity_step = dict(step("ResizeImages"), task_list="ResizeImagesTaskList")
+        self.assertEqual(self.schedule(activity_step), "ResizeImagesTaskList")
+
+    def test_resize_images_task_list(self):
+        settings = FakeSettings()
+        self.assertEqual(get_resize_images_task_list(settings), "DefaultTaskList")
+        settings.resize_images_task_list = "ResizeImagesTaskList"
+        # no worker polls a task list without a limit
+        self.assertEqual(get_resize_images_task_list(settings), "DefaultTaskList")
+        settings.worker_task_list_limits = {"ResizeImagesTaskList": 0}
+        self.assertEqual(get_resize_images_task_list(settings), "DefaultTaskList")
+        settings.worker_task_list_limits = {"ResizeImagesTaskList": 2}
+        self.assertEqual(get_resize_images_task_list(settings), "ResizeImagesTaskList")
+
+
+if __name__ == '__main__':
+    unittest.main()
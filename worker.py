@@ -4,10 +4,18 @@ import log
 import json
 import random
 import os
-import importlib
+import signal
 import time
+import threading
 import newrelic.agent
 from provider import process
+from provider import connections
+from provider import class_registry
+from provider import worker_pool
+from provider.class_registry import ClassRegistry, get_class_reload_on_change
+import provider.ftp as ftp_provider
+import provider.sftp as sftp_provider
+import dashboard_queue
 from optparse import OptionParser
 
 import activity
@@ -20,7 +28,7 @@ os.sys.path.insert(0, parentdir)
 Amazon SWF worker
 """
 
-def work(ENV, flag):
+def work(ENV, flag, activity_classes=None, threads=1, task_list_limits=None, recycler=None):
     # Specify run environment settings
     settings = settingsLib.get_settings(ENV)
 
@@ -28,9 +36,58 @@ def work(ENV, flag):
     identity = "worker_%s" % os.getpid()
     logger = log.logger("worker.log", settings.setLevel, identity)
 
+    # Share AWS connections between the activities run by this process
+    connections.init()
+
+    # Send dashboard messages in batches from a background thread
+    dashboard_queue.start_emitter(settings, logger)
+
+    # Activity classes are imported once, and reloaded when their files change or on SIGHUP
+    if activity_classes is None:
+        activity_classes = ClassRegistry("activity", get_class_reload_on_change(settings))
+    signal.signal(signal.SIGHUP, activity_classes.request_reload)
+
+    # Task lists besides the default one are polled by at most their limit of threads
+    if task_list_limits is None:
+        task_list_limits = worker_pool.TaskListLimits(get_task_list_limits(settings))
+
     # Simple connect
-    conn = boto.swf.layer1.Layer1(settings.aws_access_key_id, settings.aws_secret_access_key)
+    conn = connections.swf_connection(settings)
+
+    def poll(task_list):
+        poll_for_activities(settings, logger, identity, conn, flag, activity_classes,
+                            task_list, recycler)
+
+    def poll_limited(task_list):
+        task_list_limits.run_with_slot(task_list, flag, lambda: poll(task_list))
+
+    pollers = [(poll, settings.default_task_list)] * threads
+    for task_list, limit in sorted(task_list_limits.limits.items()):
+        pollers += [(poll_limited, task_list)] * limit
+
+    if len(pollers) > 1:
+        # Each thread polls for and does its own activity tasks
+        poll_threads = [threading.Thread(target=target, args=(task_list,),
+                                         name="poll_%s_%s" % (task_list, number))
+                        for number, (target, task_list) in enumerate(pollers)]
+        for thread in poll_threads:
+            thread.start()
+        for thread in poll_threads:
+            # join with a timeout so signals are still handled by this thread
+            while thread.is_alive():
+                thread.join(1)
+    else:
+        poll(settings.default_task_list)
+
+    dashboard_queue.stop_emitter()
+    logger.info("graceful shutdown")
 
+def poll_for_activities(settings, logger, identity, conn, flag, activity_classes,
+                        task_list, recycler=None):
+    """
+    Poll the task_list for activity tasks and do them until the flag is
+    stopped, or until the recycler says the worker process has done enough
+    """
     token = None
     application = newrelic.agent.application()
 
@@ -38,8 +95,7 @@ def work(ENV, flag):
     while flag.green():
         if token is None:
             logger.info('polling for activity...')
-            activity_task = conn.poll_for_activity_task(settings.domain,
-                                                        settings.default_task_list, identity)
+            activity_task = conn.poll_for_activity_task(settings.domain, task_list, identity)
 
             token = get_taskToken(activity_task)
 
@@ -58,10 +114,11 @@ def work(ENV, flag):
 
                     with newrelic.agent.BackgroundTask(application, name=activity_name, group='worker.py'):
                         # Attempt to import the module for the activity
-                        if import_activity_class(activity_name):
+                        activity_class = get_activity_class(activity_classes, activity_name, logger)
+                        if activity_class is not None:
                             # Instantiate the activity object
-                            activity_object = get_activity_object(activity_name, settings,
-                                                                  logger, conn, token, activity_task)
+                            activity_object = activity_class(settings, logger, conn, token,
+                                                             activity_task)
 
                             # Get the data to pass
                             data = get_input(activity_task)
@@ -73,6 +130,9 @@ def work(ENV, flag):
                                 logger.error('error executing activity %s' %
                                              activity_name, exc_info=True)
 
+                            # Send the dashboard messages of the activity before completing it
+                            dashboard_queue.flush()
+
                             # Print the result to the log
                             logger.info('got result: \n%s' %
                                         json.dumps(activity_object.result, sort_keys=True, indent=4))
@@ -112,9 +172,55 @@ def work(ENV, flag):
                             respond_failed(conn, logger, token, detail, reason)
                             logger.info('error: could not load object %s\n' % activity_name)
 
+            # Exit after the task to be replaced by a new worker process if it is time
+            if token is not None and recycler is not None:
+                recycler.task_done()
+                if recycler.should_recycle():
+                    logger.info('recycling worker process after %s tasks' % recycler.tasks)
+                    flag.stop_process()
+
         # Reset and loop
         token = None
 
+
+def supervise(ENV, flag, processes, threads=1):
+    """
+    Import the activity classes, then fork processes worker processes which
+    share them, each polling with threads threads, and replace each worker
+    process when it exits, until the flag is stopped
+    """
+    settings = settingsLib.get_settings(ENV)
+
+    identity = "worker_supervisor_%s" % os.getpid()
+    logger = log.logger("worker.log", settings.setLevel, identity)
+
+    activity_classes = ClassRegistry("activity", get_class_reload_on_change(settings))
+    loaded = activity_classes.preload(class_registry.package_class_names(activity, "activity_"))
+    logger.info("imported %s activity classes" % len(loaded))
+
+    # Shared by the worker processes so the limits are for all of them
+    task_list_limits = worker_pool.TaskListLimits(get_task_list_limits(settings))
+    max_tasks = get_max_tasks(settings)
+    max_memory_mb = get_max_memory_mb(settings)
+
+    def child_main():
+        # A worker process must not use the connections and sessions of the supervisor
+        connections.reset()
+        ftp_provider.reset()
+        sftp_provider.reset()
+        log.reset()
+        recycler = worker_pool.Recycler(max_tasks, max_memory_mb)
+        process.monitor_interrupt(lambda child_flag: work(
+            ENV, child_flag, activity_classes, threads, task_list_limits, recycler))
+
+    supervisor = worker_pool.Supervisor(processes, child_main, logger, task_list_limits)
+
+    def reload_classes(signum, frame):
+        activity_classes.request_reload()
+        supervisor.signal_children(signum)
+    signal.signal(signal.SIGHUP, reload_classes)
+
+    supervisor.run(flag)
     logger.info("graceful shutdown")
 
 def get_input(activity_task):
@@ -157,40 +263,42 @@ def get_activity_name(activityType):
     """
     return "activity_" + activityType
 
-def import_activity_class(activity_name):
+def get_task_list_limits(settings):
     """
-    Given an activity subclass name as activity_name,
-    attempt to lazy load the class when needed
+    dict of task list, besides the default one, to how many threads poll it at once,
+    raising ValueError when resize_images_task_list is set without a limit
     """
-    try:
-        module_name = "activity." + activity_name
-        importlib.import_module(module_name)
-        # Reload the module, in case it was imported before
-        reload_module(module_name)
-        return True
-    except ImportError as e:
-        return False
-
-def reload_module(module_name):
+    limits = {}
+    if hasattr(settings, 'worker_task_list_limits'):
+        limits = settings.worker_task_list_limits or {}
+    resize_images_task_list = getattr(settings, 'resize_images_task_list', None)
+    if (resize_images_task_list and resize_images_task_list != settings.default_task_list
+            and not limits.get(resize_images_task_list)):
+        raise ValueError("resize_images_task_list %s has no limit in worker_task_list_limits"
+                         % resize_images_task_list)
+    return limits
+
+def get_max_tasks(settings):
+    "tasks after which a worker process is replaced, None for no limit"
+    if hasattr(settings, 'worker_max_tasks'):
+        return settings.worker_max_tasks
+    return None
+
+def get_max_memory_mb(settings):
+    "megabytes of memory after which a worker process is replaced, None for no limit"
+    if hasattr(settings, 'worker_max_memory_mb'):
+        return settings.worker_max_memory_mb
+    return None
+
+def get_activity_class(activity_classes, activity_name, logger):
     """
-    Given an module name,
-    attempt to reload the module
+    Given an activity subclass name as activity_name, get the class from the
+    registry, recording the seconds it took as a metric
     """
-    try:
-        reload(eval(module_name))
-    except NameError:
-        pass
-
-def get_activity_object(activity_name, settings, logger, conn, token, activity_task):
-    """
-    Given an activity_name, and if the module class is already
-    imported, create an object an return it
-    """
-    full_path = "activity." + activity_name + "." + activity_name
-    f = eval(full_path)
-    # Create the object
-    activity_object = f(settings, logger, conn, token, activity_task)
-    return activity_object
+    activity_class, seconds = activity_classes.get_class_timed(activity_name)
+    logger.info('resolved class %s in %.4f seconds' % (activity_name, seconds))
+    newrelic.agent.record_custom_metric('Custom/ClassResolution/' + activity_name, seconds)
+    return activity_class
 
 def _log_swf_response_error(logger, e):
     logger.exception('SWFResponseError: status %s, reason %s, body %s', e.status, e.reason, e.body)
@@ -237,9 +345,14 @@ if __name__ == "__main__":
     ENV = None
     parser = OptionParser()
     parser.add_option("-e", "--env", default="dev", action="store", type="string", dest="env", help="set the environment to run, either dev or live")
+    parser.add_option("-p", "--processes", default=None, action="store", type="int", dest="processes", help="fork this many worker processes and replace them when they exit")
+    parser.add_option("-t", "--threads", default=1, action="store", type="int", dest="threads", help="threads polling for activity tasks in each worker process")
     (options, args) = parser.parse_args()
     if options.env:
         ENV = options.env
-        
-    process.monitor_interrupt(lambda flag: work(ENV, flag))
+
+    if options.processes:
+        process.monitor_interrupt(lambda flag: supervise(ENV, flag, options.processes, options.threads))
+    else:
+        process.monitor_interrupt(lambda flag: work(ENV, flag, threads=options.threads))
 
@@ -8,6 +8,107 @@ import time
 Amazon SWF workflow base class
 """
 
+
+def get_resize_images_task_list(settings):
+    """
+    Task list of the ResizeImages activities, which worker.py polls with the
+    number of threads in worker_task_list_limits, or the default task list if
+    it is not set or has no limit there, as then no worker polls it
+    """
+    task_list = getattr(settings, 'resize_images_task_list', None)
+    limits = getattr(settings, 'worker_task_list_limits', None) or {}
+    if task_list and limits.get(task_list):
+        return task_list
+    return settings.default_task_list
+
+
+class event_history_index(object):
+    """
+    Index of a decision response event history, built in one pass so
+    activity status queries do not rescan the events for every step
+    """
+    def __init__(self, decision):
+        self.decision = decision
+        self.event_count = len(decision["events"])
+        # scheduled eventIds keyed by (activityType, activityId), activityType and activityId
+        self.scheduled = {}
+        self.scheduled_by_type = {}
+        self.scheduled_by_id = {}
+        # scheduledEventIds of completed and failed activity tasks
+        self.completed_event_ids = set()
+        self.failed_event_ids = set()
+        self.last_activity_status = None
+        self._completed = set()
+        self._failed = set()
+        self.build(decision["events"])
+
+    def build(self, events):
+        scheduled_keys = {}
+        for event in events:
+            event_type = event.get("eventType")
+            if "activityTaskScheduledEventAttributes" in event:
+                try:
+                    attributes = event["activityTaskScheduledEventAttributes"]
+                    activity_type = attributes["activityType"]["name"]
+                    activity_id = attributes["activityId"]
+                    event_id = event["eventId"]
+                except KeyError:
+                    continue
+                self.scheduled.setdefault((activity_type, activity_id), []).append(event_id)
+                self.scheduled_by_type.setdefault(activity_type, []).append(event_id)
+                self.scheduled_by_id.setdefault(activity_id, []).append(event_id)
+                scheduled_keys[event_id] = (activity_type, activity_id)
+            elif event_type == "ActivityTaskCompleted":
+                self.last_activity_status = event_type
+                try:
+                    self.completed_event_ids.add(
+                        event["activityTaskCompletedEventAttributes"]["scheduledEventId"])
+                except KeyError:
+                    pass
+            elif event_type == "ActivityTaskFailed":
+                self.last_activity_status = event_type
+                try:
+                    self.failed_event_ids.add(
+                        event["activityTaskFailedEventAttributes"]["scheduledEventId"])
+                except KeyError:
+                    pass
+
+        # Resolve the outcomes to every key the scheduled event is queryable by
+        for event_ids, outcomes in ((self.completed_event_ids, self._completed),
+                                    (self.failed_event_ids, self._failed)):
+            for event_id in event_ids:
+                if event_id in scheduled_keys:
+                    activity_type, activity_id = scheduled_keys[event_id]
+                    outcomes.add((activity_type, activity_id))
+                    outcomes.add((activity_type, None))
+                    outcomes.add((None, activity_id))
+
+    def scheduled_event_ids(self, activity_type=None, activity_id=None):
+        """
+        Return the eventIds of scheduled activity tasks matching
+        the activity_type and/or activity_id
+        """
+        if activity_type is not None and activity_id is not None:
+            return self.scheduled.get((activity_type, activity_id), [])
+        elif activity_type is not None:
+            return self.scheduled_by_type.get(activity_type, [])
+        elif activity_id is not None:
+            return self.scheduled_by_id.get(activity_id, [])
+        return []
+
+    def is_completed(self, activity_type=None, activity_id=None):
+        "whether a matching scheduled activity task completed successfully"
+        if activity_type is None and activity_id is None:
+            return False
+        return (activity_type, activity_id) in self._completed
+
+    def is_failed(self, activity_type=None, activity_id=None):
+        "whether a matching scheduled activity task failed"
+        if activity_type is None and activity_id is None:
+            return False
+        return (activity_type, activity_id) in self._failed
+
+
 class workflow(object):
     # Base class for extending
     def __init__(self, settings, logger, conn=None, token=None, decision=None,
@@ -19,6 +120,7 @@ class workflow(object):
         self.decision = decision
         self.maximum_page_size = maximum_page_size
         self.definition = None
+        self._history_index = None
         if definition is not None:
             self.load_definition(definition)
 
@@ -115,9 +217,10 @@ class workflow(object):
                 for p_activity in step:
                     activityType = p_activity["activity_type"]
                     activityID = p_activity["activity_id"]
-                    if self.activity_status(self.decision, activityType, activityID) is False:
+                    status = self.activity_status(self.decision, activityType, activityID)
+                    if status is False:
                         all_completed = False
-                    if self.activity_status(self.decision, activityType, activityID) is True:
+                    if status is True:
                         none_started = False
                 if all_completed == False and none_started is True:
                     # A fresh step not started yet, add the activities
@@ -144,11 +247,12 @@ class workflow(object):
         """
         Given a JSON representation for an activity,
         schedule an activity task into the Layer1Decisions
-        object, then return it
+        object, then return it, on the task list of the activity
+        if it has one or else of the workflow
         """
 
         # Cast all values to string
-        task_list = str(self.definition["task_list"])
+        task_list = str(activity.get("task_list", self.definition["task_list"]))
 
         activity_id = str(activity["activity_id"])
         #activity_id = activity_id + '.' + self.get_time() + '.%s' % int(random.random() * 10000)
@@ -181,6 +285,17 @@ class workflow(object):
         """
         return datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
 
+    def history_index(self, decision):
+        """
+        Return the event_history_index for a decision response, building it
+        in a single pass over the events the first time it is requested
+        """
+        if (self._history_index is None
+                or self._history_index.decision is not decision
+                or self._history_index.event_count != len(decision["events"])):
+            self._history_index = event_history_index(decision)
+        return self._history_index
+
     def activity_status(self, decision, activityType=None, activityID=None):
         """
         Given an activityType and/or activityID as the activity details, and
@@ -191,69 +306,14 @@ class workflow(object):
         if activityType is None and activityID is None:
             return False
 
-        eventId_list = []
-
-        for event in decision["events"]:
-            eventId = None
-            # Find the all matching eventID for the activityType and/or activityID
-            if activityType is not None and activityID is not None:
-                try:
-                    if(event["activityTaskScheduledEventAttributes"]["activityType"]["name"]
-                       == activityType
-                       and event["activityTaskScheduledEventAttributes"]["activityId"]
-                       == activityID):
-                        eventId_list.append(event["eventId"])
-                except KeyError:
-                    pass
-            elif activityType is not None and activityID is None:
-                try:
-                    if(event["activityTaskScheduledEventAttributes"]["activityType"]["name"]
-                       == activityType):
-                        eventId_list.append(event["eventId"])
-                except KeyError:
-                    pass
-            elif activityID is not None and activityType is None:
-                try:
-                    if event["activityTaskScheduledEventAttributes"]["activityId"] == activityID:
-                        eventId_list.append(event["eventId"])
-                except KeyError:
-                    pass
-
-        # Now if we have an eventId, find if in the decision history is was
-        #  successfully completed
-        if len(eventId_list) <= 0:
-            return False
-        for event in decision["events"]:
-            for eventId in eventId_list:
-                # Find the first matching eventID for the activityType
-                try:
-                    if event["activityTaskCompletedEventAttributes"]["scheduledEventId"] == eventId:
-                        # Found matching data, now check completion
-                        if event["eventType"] == "ActivityTaskCompleted":
-                            # Good!
-                            return True
-                        break
-                except KeyError:
-                    pass
-        # Default
-        return False
+        return self.history_index(decision).is_completed(activityType, activityID)
 
     def last_activity_status(self, decision):
         """
         Given a decision response from SWF, determine whether the
         last run activity Failed or Completed
         """
-        status = None
-        # Traverse the array in reverse order
-        for event in decision["events"][::-1]:
-            if event["eventType"] == "ActivityTaskCompleted":
-                status = "ActivityTaskCompleted"
-                break
-            elif event["eventType"] == "ActivityTaskFailed":
-                status = "ActivityTaskFailed"
-                break
-
-        return status
+        return self.history_index(decision).last_activity_status
 
     def handle_nextPageToken(self):
         # Quick test for nextPageToken
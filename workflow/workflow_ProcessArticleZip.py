@@ -93,6 +93,7 @@ class workflow_ProcessArticleZip(workflow.workflow):
                         "activity_type": "ResizeImages",
                         "activity_id": "ResizeImages",
                         "version": "1",
+                        "task_list": workflow.get_resize_images_task_list(self.settings),
                         "input": data,
                         "control": None,
                         "heartbeat_timeout": 60 * 30,